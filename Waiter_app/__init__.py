@@ -0,0 +1,3 @@
+# Waiter_app: the order-taking service (FastAPI).
+# Run from the repository root so the shared storage layer is importable:
+#   uvicorn Waiter_app.main:app
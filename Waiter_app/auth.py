@@ -1,17 +1,146 @@
-from fastapi import APIRouter, HTTPException
-from db import get_db
-from models import LoginRequest
+# auth.py
+# Login checks a salted scrypt hash (tunable with AUTH_SCRYPT_N/R/P) in a
+# small dedicated thread pool, so the KDF never blocks the event loop or the
+# request threads. A successful login returns a signed token; routes verify
+# it with current_user / require_role (an HMAC check, no database query).
+# AUTH_SECRET (the token signing key) must be set, the same on every worker.
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
+from .db import get_db
+from .models import LoginRequest
 
 router = APIRouter()
 
-@router.post("/login")
-def login(data: LoginRequest):
+SCRYPT_N = int(os.getenv("AUTH_SCRYPT_N", "16384"))
+SCRYPT_R = int(os.getenv("AUTH_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("AUTH_SCRYPT_P", "1"))
+TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", "43200"))  # Seconds, one shift
+TOKEN_SECRET = os.getenv("AUTH_SECRET", "").encode()
+if not TOKEN_SECRET:
+    # A per-process random secret would log everyone out on restart and reject
+    # tokens issued by the other workers
+    raise RuntimeError("AUTH_SECRET is not set; set it to the same long random value on every worker")
+
+kdf_pool = ThreadPoolExecutor(max_workers=int(os.getenv("AUTH_KDF_WORKERS", "4")), thread_name_prefix="kdf")
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+# --- Password hashing ---
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 2 ** 20)
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = secrets.token_bytes(16)
+    key = _scrypt(password, salt, n, r, p)
+    return f"scrypt${n}${r}${p}${b64encode(salt)}${b64encode(key)}"
+
+def verify_password(password, stored):
+    """
+    True if `password` matches `stored` (a hash_password() string, or a legacy
+    plaintext password); False for a missing or malformed stored value. The KDF
+    runs on every call, so timing does not reveal which kind of value it was.
+    """
+    if stored and stored.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, key = stored.split("$")
+            candidate = _scrypt(password, b64decode(salt), int(n), int(r), int(p))
+            return hmac.compare_digest(candidate, b64decode(key))
+        except ValueError:  # Wrong field count, bad base64 or invalid scrypt parameters
+            stored = None
+    _, n, r, p, salt, key = DUMMY_HASH.split("$")
+    _scrypt(password, b64decode(salt), int(n), int(r), int(p))
+    return bool(stored) and hmac.compare_digest(password.encode(), stored.encode())
+
+def needs_rehash(stored):
+    return not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+# Unknown usernames and non-hash stored values cost this KDF run, so they take as long as wrong passwords
+DUMMY_HASH = hash_password(secrets.token_hex(16))
+
+# --- Tokens ---
+
+def issue_token(user_id, role):
+    payload = b64encode(json.dumps({"sub": user_id, "role": role, "exp": int(time.time()) + TOKEN_TTL}).encode())
+    signature = b64encode(hmac.new(TOKEN_SECRET, payload.encode(), hashlib.sha256).digest())
+    return f"{payload}.{signature}"
+
+def verify_token(token):
+    """Returns the token's claims, or None if it is malformed, forged or expired."""
+    payload, _, signature = token.partition(".")
+    expected = b64encode(hmac.new(TOKEN_SECRET, payload.encode(), hashlib.sha256).digest())
+    # Bytes: compare_digest raises TypeError on non-ASCII str, and headers arrive decoded as latin-1
+    if not signature or not hmac.compare_digest(signature.encode("latin-1"), expected.encode()):
+        return None
+    try:
+        claims = json.loads(b64decode(payload))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+def current_user(authorization: Optional[str] = Header(None)):
+    scheme, _, token = (authorization or "").partition(" ")
+    claims = verify_token(token) if scheme.lower() == "bearer" else None
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Missing or invalid token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+def require_role(*roles):
+    def check(user=Depends(current_user)):
+        if user["role"] not in roles:
+            raise HTTPException(status_code=403, detail=f"Requires role: {', '.join(roles)}")
+        return user
+    return check
+
+# --- Login ---
+
+def load_user(username):
+    conn = get_db()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id, role, password FROM users WHERE username=%s", (username,))
+        user = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+    return user
+
+def upgrade_password(user_id, password):
+    # Legacy plaintext (or outdated parameters) are replaced by a current hash on login
     conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE username=%s AND password=%s", (data.username, data.password))
-    user = cursor.fetchone()
-    conn.close()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE users SET password=%s WHERE id=%s", (hash_password(password), user_id))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+@router.post("/login")
+async def login(data: LoginRequest):
+    loop = asyncio.get_running_loop()
+    user = await asyncio.to_thread(load_user, data.username)
+    stored = user["password"] if user else DUMMY_HASH
+    valid = await loop.run_in_executor(kdf_pool, verify_password, data.password, stored)
 
-    if not user:
+    if not user or not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    return {"user_id": user['id'], "role": user['role']}
+    if needs_rehash(stored):
+        await loop.run_in_executor(kdf_pool, upgrade_password, user['id'], data.password)
+    return {"user_id": user['id'], "role": user['role'], "token": issue_token(user['id'], user['role'])}
@@ -1,9 +1,15 @@
-import mysql.connector
+# db.py
+# Connections come from the shared storage layer (../storage.py): pooled,
+# instrumented, returned to the pool by conn.close(). Importable because the
+# app runs from the repository root (uvicorn Waiter_app.main:app).
+from storage import ConnectionPool
+
+pool = ConnectionPool("mysql", {
+    "host": "localhost",
+    "user": "orderuser",
+    "password": "orderpass",
+    "database": "restaurant",
+}, size=10, name="waiter")
 
 def get_db():
-    return mysql.connector.connect(
-        host="localhost",
-        user="orderuser",
-        password="orderpass",
-        database="restaurant"
-    )
+    return pool.acquire()
@@ -0,0 +1,68 @@
+# events.py
+# In-process order event feed for the kitchen/waiter screens (GET /events).
+# The order routes publish after each committed write; subscribers get the
+# events pushed instead of polling list_orders. The last EVENT_BUFFER events
+# are kept so a reconnecting screen can resume from its Last-Event-ID.
+# Events are per worker process: run one worker, or put a shared broker
+# (e.g. Redis pub/sub) behind publish() when running several.
+# Event ids are "<epoch>-<sequence>", the epoch being random per process, so
+# an id from before a restart (or from another worker) always means "reset"
+# rather than matching an unrelated event of the new sequence.
+import asyncio
+import os
+import secrets
+import threading
+from collections import deque
+
+EVENT_BUFFER = int(os.getenv("EVENT_BUFFER", "1000"))
+SUBSCRIBER_QUEUE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE", "256"))
+
+class OrderEvents:
+    def __init__(self, buffer_size):
+        self._events = deque(maxlen=buffer_size)  # (sequence, (id, type, order))
+        self._last_id = 0
+        self.epoch = secrets.token_hex(6)
+        self._subscribers = set()  # (loop, asyncio.Queue)
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, order):
+        # Called from the threadpool the sync routes run in
+        with self._lock:
+            self._last_id += 1
+            event = (f"{self.epoch}-{self._last_id}", event_type, order)
+            self._events.append((self._last_id, event))
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, event)
+
+    @staticmethod
+    def _deliver(queue, event):
+        if queue.full():
+            # Slow screen: drop its backlog rather than grow without bound, and tell it to reload
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        else:
+            queue.put_nowait(event)
+
+    def subscribe(self, last_event_id=None):
+        """Returns (queue, backlog). backlog is None when the screen has to reload the order list."""
+        queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+            if last_event_id is None:
+                return queue, []
+            epoch, _, sequence = last_event_id.partition("-")
+            if epoch != self.epoch or not sequence.isdigit():
+                return queue, None  # Restarted server, another worker or a malformed id
+            sequence = int(sequence)
+            oldest = self._events[0][0] if self._events else self._last_id + 1
+            if sequence > self._last_id or sequence < oldest - 1:
+                return queue, None  # Too far behind
+            return queue, [event for seq, event in self._events if seq > sequence]
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {s for s in self._subscribers if s[1] is not queue}
+
+order_events = OrderEvents(EVENT_BUFFER)
@@ -0,0 +1,84 @@
+# idempotency.py
+# Idempotency-Key support for create_order: a retried POST returns the order
+# the first attempt created instead of inserting another one. Recent keys are
+# kept in memory; the idempotency_keys table (migrations/004) covers other
+# workers and restarts, and its primary key serializes concurrent retries.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))  # Seconds a key is remembered
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))  # In-memory keys per process
+PURGE_INTERVAL = 300  # Seconds between deletes of expired key rows
+
+def digest(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+def key_digest(user_id, key):
+    # Keys are scoped per user, so two clients picking the same key never see each other's orders
+    return digest(f"{user_id}:{key}")
+
+def request_hash(payload):
+    return digest(json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str))
+
+class IdempotencyStore:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key hash -> (expires_at, request hash, response)
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def get(self, key_hash):
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key_hash]
+                return None
+            return entry[1], entry[2]
+
+    def put(self, key_hash, body_hash, response):
+        with self._lock:
+            self._entries[key_hash] = (time.monotonic() + self.ttl, body_hash, response)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # Oldest first; the table still has it
+
+    def lookup(self, cursor, key_hash):
+        """(request hash, order_id, total) stored for the key, or None.
+
+        order_id and total are None if the order was deleted since.
+        """
+        cursor.execute(
+            "SELECT k.request_hash, o.id, o.total FROM idempotency_keys k "
+            "LEFT JOIN orders o ON o.id = k.order_id WHERE k.key_hash = %s", (key_hash,))
+        return cursor.fetchone()
+
+    def remember(self, cursor, key_hash, body_hash, order_id):
+        # Raises IntegrityError (duplicate key) if another attempt already stored it
+        cursor.execute("INSERT INTO idempotency_keys (key_hash, request_hash, order_id) VALUES (%s, %s, %s)",
+                       (key_hash, body_hash, order_id))
+
+    def purge_expired(self, conn):
+        """Deletes a batch of expired key rows, at most every PURGE_INTERVAL seconds per process.
+
+        Runs in its own transaction on `conn`, after the order's has committed.
+        """
+        with self._lock:
+            if time.monotonic() < self._next_purge:
+                return
+            self._next_purge = time.monotonic() + PURGE_INTERVAL
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM idempotency_keys WHERE created_at < NOW() - INTERVAL %s SECOND LIMIT 1000",
+                           (int(self.ttl),))
+            conn.commit()
+        finally:
+            cursor.close()
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_ENTRIES)
@@ -0,0 +1,129 @@
+# kitchen_stats.py
+# Live kitchen numbers for GET /stats, kept in memory: orders per active
+# status, the oldest pending order and the average time orders spend in the
+# kitchen. create_order and the status updates keep them current; a
+# background thread reloads the active orders every STATS_RECONCILE_SECONDS
+# to pick up other workers' writes and correct any drift.
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from fastapi import APIRouter
+from .db import get_db
+from .serializer import JSONResponse
+
+router = APIRouter()
+
+ACTIVE_STATUSES = ["pending", "kitchen", "in_delivery"]
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "60"))
+KITCHEN_SAMPLES = 200  # Kitchen stays averaged over
+
+class KitchenStats:
+    def __init__(self):
+        # status -> OrderedDict(order_id -> entered_at epoch seconds), oldest first
+        self._active = {status: OrderedDict() for status in ACTIVE_STATUSES}
+        self._kitchen_times = deque(maxlen=KITCHEN_SAMPLES)
+        self._reconciled_at = None
+        self._reloading = None  # Changes seen while reconcile() runs, applied again to its snapshot
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def order_created(self, order_id, at=None):
+        self._record(order_id, None, "pending", at or time.time())
+
+    def status_changed(self, order_id, from_status, to_status, at=None):
+        self._record(order_id, from_status, to_status, at or time.time())
+
+    def _record(self, order_id, from_status, to_status, at):
+        with self._lock:
+            entered_at = self._active.get(from_status, {}).pop(order_id, None)
+            if from_status == "kitchen" and entered_at is not None:
+                self._kitchen_times.append(at - entered_at)
+            if to_status in self._active:
+                self._active[to_status][order_id] = at
+            if self._reloading is not None:
+                self._reloading.append((order_id, from_status, to_status, at))
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            depth = {status: len(orders) for status, orders in self._active.items()}
+            oldest = next(iter(self._active["pending"].items()), None)
+            kitchen_times = list(self._kitchen_times)
+            reconciled_at = self._reconciled_at
+        return {
+            "queue_depth": depth,
+            "oldest_pending": {"order_id": oldest[0], "age_seconds": round(now - oldest[1], 1)} if oldest else None,
+            "kitchen_time": {
+                "average_seconds": round(sum(kitchen_times) / len(kitchen_times), 1) if kitchen_times else None,
+                "samples": len(kitchen_times),
+            },
+            "reconciled_at": datetime.fromtimestamp(reconciled_at).isoformat(timespec="seconds")
+            if reconciled_at else None,
+        }
+
+    def reconcile(self):
+        """Replaces the active orders with what the database has (one query)."""
+        placeholders = ", ".join(["%s"] * len(ACTIVE_STATUSES))
+        with self._lock:
+            self._reloading = []
+        try:
+            conn = get_db()
+            try:
+                cursor = conn.cursor()
+                # How long ago an order entered its current status (its last history row, else its
+                # creation), computed by MySQL so the session time zone never meets the app's clock
+                cursor.execute(
+                    "SELECT o.id, o.status, TIMESTAMPDIFF(MICROSECOND, COALESCE(MAX(h.changed_at), o.created_at), "
+                    "NOW()) AS age FROM orders o "
+                    "LEFT JOIN order_status_history h ON h.order_id = o.id AND h.to_status = o.status "
+                    f"WHERE o.status IN ({placeholders}) GROUP BY o.id, o.status, o.created_at",
+                    ACTIVE_STATUSES)
+                rows = cursor.fetchall()
+                queried_at = time.time()
+                cursor.close()
+            finally:
+                conn.close()
+            active = {status: OrderedDict() for status in ACTIVE_STATUSES}
+            for order_id, status, age in sorted(rows, key=lambda row: row[2], reverse=True):
+                active[status][order_id] = queried_at - age / 1000000
+            with self._lock:
+                for change in self._reloading:
+                    replay_change(active, *change)
+                self._active = active
+                self._reconciled_at = time.time()
+        finally:
+            with self._lock:
+                self._reloading = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="kitchen-stats", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.reconcile()
+            except Exception as err:
+                print(f"Kitchen stats reconcile failed: {err}")
+            time.sleep(STATS_RECONCILE_SECONDS)
+
+def replay_change(active, order_id, from_status, to_status, at):
+    # Applies a local change to a fresh snapshot only if the snapshot predates it,
+    # i.e. still shows the order where the change found it
+    current = next((status for status, orders in active.items() if order_id in orders), None)
+    if current != (from_status if from_status in active else None):
+        return
+    if current is not None:
+        del active[current][order_id]
+    if to_status in active:
+        active[to_status][order_id] = at
+
+kitchen_stats = KitchenStats()
+
+@router.get("/stats")
+def get_stats():
+    # Served from memory, never touches the database
+    return JSONResponse(kitchen_stats.snapshot())
@@ -1,8 +1,22 @@
+import contextlib
 from fastapi import FastAPI
-from auth import router as auth_router
-from orders import router as orders_router
+from fastapi.middleware.gzip import GZipMiddleware
+from .auth import router as auth_router
+from .kitchen_stats import kitchen_stats, router as stats_router
+from .orders import router as orders_router
+from .settings import router as settings_router
 
-app = FastAPI()
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    kitchen_stats.start()  # Loads the active orders, then reconciles periodically
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+# gzip JSON responses (order lists) when the client accepts it; small bodies are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 app.include_router(auth_router)
+app.include_router(settings_router)  # Before orders: /{order_id} would also match /settings
+app.include_router(stats_router)
 app.include_router(orders_router)
@@ -0,0 +1,9 @@
+-- Lease columns for the print queue (POST /orders/print-queue/claim and /ack).
+-- A claimed order is invisible to other print stations until print_lease_until;
+-- if it is not acknowledged by then, another station can claim it again.
+ALTER TABLE orders
+    ADD COLUMN print_claim CHAR(32) NULL,
+    ADD COLUMN print_station VARCHAR(64) NULL,
+    ADD COLUMN print_lease_until DATETIME NULL,
+    ADD COLUMN print_attempts INT NOT NULL DEFAULT 0,
+    ADD INDEX idx_orders_print_queue (printed, created_at);
@@ -0,0 +1,7 @@
+-- Indexes for GET / (list_orders): newest first, optionally filtered by status
+-- or order_type and a created_at range. InnoDB appends the primary key to every
+-- secondary index, so each one is ordered by (..., created_at, id) and a page
+-- is read as one short index range, whatever the table size.
+CREATE INDEX idx_orders_created_at ON orders (created_at);
+CREATE INDEX idx_orders_status_created_at ON orders (status, created_at);
+CREATE INDEX idx_orders_order_type_created_at ON orders (order_type, created_at);
@@ -0,0 +1,20 @@
+-- Structured order lines (POST / with line_items). Written with the order in
+-- one transaction; orders.total and orders.item_count are computed at insert
+-- time so lists and reports don't have to join or parse anything.
+CREATE TABLE order_line_items (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    menu_item_id INT NOT NULL,
+    quantity INT NOT NULL,
+    unit_price DECIMAL(10, 2) NOT NULL,  -- Price when ordered, menu prices change
+    modifiers JSON NULL,                 -- e.g. ["no onions", "extra cheese"]
+    line_total DECIMAL(10, 2) NOT NULL,
+    KEY idx_order_line_items_order (order_id),
+    KEY idx_order_line_items_menu_item (menu_item_id),
+    FOREIGN KEY (order_id) REFERENCES orders (id),
+    FOREIGN KEY (menu_item_id) REFERENCES menu_items (id)
+);
+
+ALTER TABLE orders
+    ADD COLUMN total DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    ADD COLUMN item_count INT NOT NULL DEFAULT 0;
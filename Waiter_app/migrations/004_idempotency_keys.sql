@@ -0,0 +1,11 @@
+-- Idempotency-Key header of POST / (create_order). A key is stored in the same
+-- transaction as the order it created, so a retry either finds it or blocks on
+-- the primary key until the first attempt commits. Rows older than
+-- IDEMPOTENCY_TTL are purged by the app.
+CREATE TABLE idempotency_keys (
+    key_hash CHAR(64) PRIMARY KEY,      -- sha256 of the user id and the header value
+    request_hash CHAR(64) NOT NULL,     -- sha256 of the request body, a reused key must match
+    order_id INT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_idempotency_keys_created_at (created_at)
+);
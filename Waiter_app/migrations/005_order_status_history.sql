@@ -0,0 +1,13 @@
+-- One row per status change (PATCH /{order_id} and PATCH /status), written in
+-- the same transaction as the change. Time spent in a status is the gap
+-- between consecutive rows of an order.
+CREATE TABLE order_status_history (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    from_status VARCHAR(16) NOT NULL,
+    to_status VARCHAR(16) NOT NULL,
+    changed_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    KEY idx_order_status_history_order (order_id, changed_at),
+    KEY idx_order_status_history_status (to_status, changed_at),
+    FOREIGN KEY (order_id) REFERENCES orders (id)
+);
@@ -0,0 +1,4 @@
+-- users.password holds scrypt hashes ("scrypt$n$r$p$salt$key", about 130
+-- characters). Existing plaintext passwords keep working and are replaced by a
+-- hash on the user's next successful login (auth.py).
+ALTER TABLE users MODIFY password VARCHAR(255) NOT NULL;
@@ -1,83 +1,286 @@
 # routers/orders.py
-from fastapi import APIRouter, HTTPException
+import asyncio
+import base64
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
-from db import get_db
+from .auth import require_role
+from .db import get_db
+from .events import order_events
+from .idempotency import idempotency_store, key_digest, request_hash
+from .kitchen_stats import kitchen_stats
+from mysql.connector import Error, IntegrityError
+from .serializer import JSONResponse, dumps, page_response, rows_response
+from .settings import get_max_tables
+from .status import STATUSES, apply_status_updates, status_batcher
 
 router = APIRouter()
 
+class OrderLineItem(BaseModel):
+    menu_item_id: int
+    quantity: int = 1
+    modifiers: Optional[List[str]] = None  # e.g. ["no onions"]
+
 class OrderRequest(BaseModel):
     order_type: str  # 'dine-in', 'delivery', 'takeout'
     table_number: Optional[int] = None
     address: Optional[str] = None
-    items: str
-    role: Optional[str] = None  # added for frontend auth
+    items: Optional[str] = None  # Free-text order (legacy clients)
+    line_items: Optional[List[OrderLineItem]] = None
 
 class OrderStatusUpdate(BaseModel):
-    status: str  # 'pending', 'kitchen', 'ready', 'complete'
-    role: Optional[str] = None  # added for frontend auth
+    status: str  # One of status.STATUSES
 
-def get_max_tables():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE name = 'max_tables'")
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return int(result[0]) if result else 20
+def replay_order(body_hash, stored_hash, response):
+    # Same key with a different body is a client bug, not a retry
+    if stored_hash != body_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different order")
+    return JSONResponse(response, status_code=201, headers={"Idempotent-Replayed": "true"})
+
+def replay_stored_order(cursor, key_hash, body_hash):
+    # Replays the order stored for the key in idempotency_keys, or returns None if there is none
+    stored = idempotency_store.lookup(cursor, key_hash)
+    if stored is None:
+        return None
+    stored_hash, order_id, total = stored
+    if order_id is None:
+        raise HTTPException(status_code=409, detail="The order placed with this Idempotency-Key was deleted")
+    response = {"order_id": order_id, "total": total, "message": "Order placed successfully"}
+    idempotency_store.put(key_hash, stored_hash, response)
+    return replay_order(body_hash, stored_hash, response)
 
 @router.post("/", status_code=201)
-def create_order(order: OrderRequest):
+def create_order(order: OrderRequest, idempotency_key: Optional[str] = Header(None),
+                 user=Depends(require_role("admin", "waiter", "customer"))):
+    key_hash = body_hash = None
+    if idempotency_key is not None:
+        if not 1 <= len(idempotency_key) <= 255:
+            raise HTTPException(status_code=400, detail="Idempotency-Key must be 1-255 characters")
+        key_hash = key_digest(user["sub"], idempotency_key)
+        body_hash = request_hash(jsonable_encoder(order))
+        cached = idempotency_store.get(key_hash)
+        if cached is not None:
+            return replay_order(body_hash, *cached)  # No connection, no INSERT
+
     if order.order_type not in ["dine-in", "delivery", "takeout"]:
         raise HTTPException(status_code=400, detail="Invalid order type")
 
-    if order.role not in ["admin", "waiter", "customer"]:
-        raise HTTPException(status_code=403, detail="Only admin, waiter, or customer can place an order")
+    if order.order_type == "dine-in" and order.table_number is None:
+        raise HTTPException(status_code=400, detail="Table number is required for dine-in")
 
-    if order.order_type == "dine-in":
-        if order.table_number is None:
-            raise HTTPException(status_code=400, detail="Table number is required for dine-in")
-        max_tables = get_max_tables()
-        if order.table_number < 1 or order.table_number > max_tables:
-            raise HTTPException(status_code=400, detail=f"Table number must be between 1 and {max_tables}")
+    if not order.items and not order.line_items:
+        raise HTTPException(status_code=400, detail="Order needs items or line_items")
+    for line in order.line_items or []:
+        if not 1 <= line.quantity <= 99:
+            raise HTTPException(status_code=400, detail="Quantity must be between 1 and 99")
 
     conn = get_db()
-    cursor = conn.cursor()
+    try:
+        cursor = conn.cursor()
+        if key_hash is not None:
+            # Not in this process's memory: another worker or an earlier run may have stored it
+            replayed = replay_stored_order(cursor, key_hash, body_hash)
+            if replayed is not None:
+                return replayed
+
+        if order.order_type == "dine-in":
+            max_tables = get_max_tables(conn)  # Cached; a reload uses this same connection
+            if order.table_number < 1 or order.table_number > max_tables:
+                raise HTTPException(status_code=400, detail=f"Table number must be between 1 and {max_tables}")
+
+        items, total, item_count, lines = order.items, 0, 0, []
+        if order.line_items:
+            menu_ids = sorted({line.menu_item_id for line in order.line_items})
+            placeholders = ", ".join(["%s"] * len(menu_ids))
+            cursor.execute(f"SELECT id, price FROM menu_items WHERE id IN ({placeholders})", menu_ids)
+            prices = dict(cursor.fetchall())
+            missing = [menu_id for menu_id in menu_ids if menu_id not in prices]
+            if missing:
+                raise HTTPException(status_code=400, detail=f"Unknown menu items: {missing}")
+            for line in order.line_items:
+                price = prices[line.menu_item_id]
+                modifiers = json.dumps(line.modifiers) if line.modifiers else None
+                lines.append((line.menu_item_id, line.quantity, price, modifiers, price * line.quantity))
+            total = sum(line[4] for line in lines)
+            item_count = sum(line.quantity for line in order.line_items)
+            if not items:
+                # Keeps the text column readable for screens that still show it
+                items = ", ".join(f"{line.quantity}x #{line.menu_item_id}" for line in order.line_items)
+
+        query = """
+            INSERT INTO orders (order_type, table_number, address, items, status, total, item_count)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """
+        cursor.execute(query, (
+            order.order_type,
+            order.table_number,
+            order.address,
+            items,
+            "pending",
+            total,
+            item_count
+        ))
+        order_id = cursor.lastrowid
+        if lines:
+            # executemany sends all lines as one multi-row INSERT
+            cursor.executemany(
+                "INSERT INTO order_line_items (order_id, menu_item_id, quantity, unit_price, modifiers, line_total) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [(order_id,) + line for line in lines])
+        if key_hash is not None:
+            try:
+                idempotency_store.remember(cursor, key_hash, body_hash, order_id)
+            except IntegrityError:
+                # Another attempt with this key got there first (other worker, or it was
+                # still running): drop our insert and answer with its order
+                conn.rollback()
+                replayed = replay_stored_order(cursor, key_hash, body_hash)
+                if replayed is None:  # Purged in between
+                    raise HTTPException(status_code=409, detail="Idempotency-Key conflict, retry the request")
+                return replayed
+        conn.commit()
+        cursor.close()
+        if key_hash is not None:
+            # After the commit, so the order never waits on (or shares locks with) the batch delete
+            try:
+                idempotency_store.purge_expired(conn)
+            except Error as err:
+                print(f"Purging expired idempotency keys failed: {err}")
+    finally:
+        conn.close()  # Rolls back if anything above failed
+
+    response = {"order_id": order_id, "total": total, "message": "Order placed successfully"}
+    if key_hash is not None:
+        idempotency_store.put(key_hash, body_hash, response)
+
+    kitchen_stats.order_created(order_id)
+    order_events.publish("order_created", {
+        "id": order_id,
+        "order_type": order.order_type,
+        "table_number": order.table_number,
+        "address": order.address,
+        "items": items,
+        "line_items": [
+            {"menu_item_id": line[0], "quantity": line[1], "unit_price": line[2],
+             "modifiers": order.line_items[i].modifiers, "line_total": line[4]}
+            for i, line in enumerate(lines)],
+        "total": total,
+        "item_count": item_count,
+        "status": "pending",
+    })
+    return JSONResponse(response, status_code=201)
 
-    query = """
-        INSERT INTO orders (order_type, table_number, address, items, status)
-        VALUES (%s, %s, %s, %s, %s)
+HEARTBEAT_SECONDS = 15  # Keeps proxies from closing idle event streams
+
+def format_event(event_id, event_type, data):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return head + f"event: {event_type}\ndata: " + dumps(data).decode() + "\n\n"
+
+@router.get("/events")
+async def order_event_stream(request: Request, order_type: Optional[str] = None, status: Optional[str] = None,
+                             last_event_id: Optional[str] = None):
     """
-    cursor.execute(query, (
-        order.order_type,
-        order.table_number,
-        order.address,
-        order.items,
-        "pending"
-    ))
-    conn.commit()
-    order_id = cursor.lastrowid
-    cursor.close()
-    conn.close()
-
-    return {"order_id": order_id, "message": "Order placed successfully"}
+    Server-Sent Events feed of order_created and order_status_changed events.
+    Optional order_type/status filters; resumes after the Last-Event-ID header
+    (or ?last_event_id=). A "reset" event means events were missed and the
+    screen should reload the order list once.
+    """
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+    queue, backlog = order_events.subscribe(last_event_id)
+
+    def matches(order):
+        return ((order_type is None or order.get("order_type") == order_type)
+                and (status is None or order.get("status") == status))
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if backlog is None:
+                yield format_event(None, "reset", {})
+            else:
+                for event_id, event_type, order in backlog:
+                    if matches(order):
+                        yield format_event(event_id, event_type, order)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    yield format_event(None, "reset", {})
+                elif matches(event[2]):
+                    yield format_event(*event)
+        finally:
+            order_events.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.get("/{order_id}")
 def get_order_by_id(order_id: int):
     conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM orders WHERE id = %s", (order_id,))
-    order = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM orders WHERE id = %s", (order_id,))
+        order = cursor.fetchone()
+        columns = cursor.column_names
+        line_items = []
+        if order:
+            cursor.execute(
+                "SELECT menu_item_id, quantity, unit_price, modifiers, line_total FROM order_line_items "
+                "WHERE order_id = %s ORDER BY id", (order_id,))
+            line_columns = cursor.column_names
+            for row in cursor.fetchall():
+                line = dict(zip(line_columns, row))
+                if line["modifiers"] is not None:
+                    line["modifiers"] = json.loads(line["modifiers"])
+                line_items.append(line)
+        cursor.close()
+    finally:
+        conn.close()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return JSONResponse(dict(zip(columns, order), line_items=line_items))
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(created_at, order_id):
+    # Opaque keyset token: position of the last order on the page
+    raw = json.dumps([created_at.isoformat(), order_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token):
+    try:
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/")
-def list_orders(order_type: Optional[str] = None, status: Optional[str] = None):
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
+def list_orders(order_type: Optional[str] = None, status: Optional[str] = None,
+                created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    Newest orders first. Without limit or cursor this is the plain array of
+    every matching order, as existing screens expect. With either, one page
+    at a time as {"data", "next_cursor"} (limit defaults to DEFAULT_PAGE_SIZE):
+    pass the returned next_cursor to get the next page. Keyset pagination on
+    (created_at, id) with the (status, created_at) / (order_type, created_at)
+    indexes from migrations/002_order_list_indexes.sql, so a page costs the
+    same no matter how large the table is. created_from is inclusive,
+    created_to exclusive.
+    """
+    paginated = limit is not None or cursor is not None
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
 
     base_query = "SELECT * FROM orders"
     filters = []
@@ -89,38 +292,106 @@ def list_orders(order_type: Optional[str] = None, status: Optional[str] = None):
     if status:
         filters.append("status = %s")
         params.append(status)
+    if created_from:
+        filters.append("created_at >= %s")
+        params.append(created_from)
+    if created_to:
+        filters.append("created_at < %s")
+        params.append(created_to)
+    if cursor:
+        # (created_at, id) < (last_created_at, last_id), written so the index range can be used
+        last_created_at, last_id = decode_cursor(cursor)
+        filters.append("created_at <= %s AND (created_at < %s OR id < %s)")
+        params.extend([last_created_at, last_created_at, last_id])
 
     if filters:
         base_query += " WHERE " + " AND ".join(filters)
 
-    base_query += " ORDER BY created_at DESC"
+    base_query += " ORDER BY created_at DESC, id DESC"
+    if paginated:
+        base_query += " LIMIT %s"
+        params.append(limit + 1)  # One extra row tells whether there is a next page
+
+    conn = get_db()
+    try:
+        db_cursor = conn.cursor()
+        db_cursor.execute(base_query, tuple(params))
+        orders = db_cursor.fetchall()
+        columns = db_cursor.column_names
+        db_cursor.close()
+    finally:
+        conn.close()
+
+    if not paginated:
+        return rows_response(columns, orders)
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        last = dict(zip(columns, orders[-1]))
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return page_response(columns, orders, next_cursor)
+
+class StatusChange(BaseModel):
+    order_id: int
+    status: str
 
-    cursor.execute(base_query, tuple(params))
-    orders = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return orders
+class StatusBatchUpdate(BaseModel):
+    updates: List[StatusChange]
+
+MAX_STATUS_BATCH = 500
+
+def publish_status_changes(changes):
+    for change in changes:
+        if change is not None:
+            order_id, order_type, from_status, status = change
+            kitchen_stats.status_changed(order_id, from_status, status)
+            order_events.publish("order_status_changed", {"id": order_id, "order_type": order_type, "status": status})
+
+@router.patch("/status")
+def update_order_statuses(batch: StatusBatchUpdate, user=Depends(require_role("admin", "waiter"))):
+    """
+    Applies many {order_id, status} changes in one transaction, in the given
+    order (an order may move more than one step). Each change gets its own
+    result: updated, unchanged, not_found or invalid_transition.
+    """
+    if not 1 <= len(batch.updates) <= MAX_STATUS_BATCH:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {MAX_STATUS_BATCH} updates")
+    for update in batch.updates:
+        if update.status not in STATUSES:
+            raise HTTPException(status_code=400, detail=f"Invalid status: {update.status}")
+
+    results, changes = apply_status_updates([(update.order_id, update.status) for update in batch.updates])
+    publish_status_changes(changes)
+    return JSONResponse({"results": results})
 
 @router.patch("/{order_id}")
-def update_order_status(order_id: int, update: OrderStatusUpdate):
+def update_order_status(order_id: int, update: OrderStatusUpdate, user=Depends(require_role("admin", "waiter"))):
     """
-    Update the status of an order by its ID. Authentication is not required.
-    Allowed statuses: 'pending', 'kitchen', 'in_delivery', 'completed', 'cancelled'.
+    Update the status of an order by its ID. Requires an admin or waiter token.
+    Allowed statuses: 'pending', 'kitchen', 'in_delivery', 'completed', 'cancelled',
+    following ALLOWED_TRANSITIONS in status.py. With STATUS_BATCH_WINDOW_MS set,
+    concurrent updates are committed together in one transaction.
     Args:
         order_id (int): The ID of the order to update.
         update (OrderStatusUpdate): The new status for the order.
     Returns:
         dict: A message indicating the update result.
     Raises:
-        HTTPException: If the status is invalid.
+        HTTPException: If the status is invalid, the order does not exist
+        or the transition is not allowed.
     """
-    if update.status not in ["pending", "kitchen", "in_delivery", "completed", "cancelled"]:
+    if update.status not in STATUSES:
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE orders SET status = %s WHERE id = %s", (update.status, order_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return {"message": f"Order {order_id} status updated to {update.status}"}
+    if status_batcher is not None:
+        result, change = status_batcher.submit(order_id, update.status).result()
+    else:
+        results, changes = apply_status_updates([(order_id, update.status)])
+        result, change = results[0], changes[0]
+    if result["status"] == "not_found":
+        raise HTTPException(status_code=404, detail="Order not found")
+    if result["status"] == "invalid_transition":
+        raise HTTPException(status_code=409, detail=result["error"])
+    publish_status_changes([change])
+    return JSONResponse({"message": f"Order {order_id} status updated to {update.status}"})
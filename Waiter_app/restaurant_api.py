@@ -1,20 +1,12 @@
+import uuid
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import mysql.connector
+from typing import List
+from .auth import router as auth_router
+from .db import get_db
 
 app = FastAPI()
-
-def get_db():
-    return mysql.connector.connect(
-        host="localhost",
-        user="orderuser",
-        password="orderpass",
-        database="restaurant"
-    )
-
-class LoginRequest(BaseModel):
-    username: str
-    password: str
+app.include_router(auth_router)  # POST /login with hashed passwords and signed tokens
 
 class OrderRequest(BaseModel):
     order_type: str  # 'dine-in' or 'delivery'
@@ -22,42 +14,103 @@ class OrderRequest(BaseModel):
     address: str | None = None
     items: str
 
-@app.post("/login")
-def login(data: LoginRequest):
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE username=%s AND password=%s", (data.username, data.password))
-    user = cursor.fetchone()
-    conn.close()
+class PrintClaimRequest(BaseModel):
+    station: str
+    limit: int = 10
+    lease_seconds: int = 60  # Unacknowledged orders become claimable again after this
 
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    return {"user_id": user['id'], "role": user['role']}
+class PrintAckRequest(BaseModel):
+    claim: str
+    order_ids: List[int]
 
 @app.post("/orders")
 def create_order(order: OrderRequest):
     conn = get_db()
-    cursor = conn.cursor()
-
-    if order.order_type == "dine-in":
-        query = "INSERT INTO orders (order_type, table_number, items) VALUES (%s, %s, %s)"
-        cursor.execute(query, (order.order_type, order.table_number, order.items))
-    else:
-        query = "INSERT INTO orders (order_type, address, items) VALUES (%s, %s, %s)"
-        cursor.execute(query, (order.order_type, order.address, order.items))
-
-    conn.commit()
-    order_id = cursor.lastrowid
-    cursor.close()
-    conn.close()
+    try:
+        cursor = conn.cursor()
+
+        if order.order_type == "dine-in":
+            query = "INSERT INTO orders (order_type, table_number, items) VALUES (%s, %s, %s)"
+            cursor.execute(query, (order.order_type, order.table_number, order.items))
+        else:
+            query = "INSERT INTO orders (order_type, address, items) VALUES (%s, %s, %s)"
+            cursor.execute(query, (order.order_type, order.address, order.items))
+
+        conn.commit()
+        order_id = cursor.lastrowid
+        cursor.close()
+    finally:
+        conn.close()
     return {"status": "ok", "order_id": order_id}
 
 @app.get("/orders/unprinted")
 def get_unprinted_orders():
     conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM orders WHERE printed = FALSE ORDER BY created_at ASC")
-    orders = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM orders WHERE printed = FALSE ORDER BY created_at ASC")
+        orders = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
     return orders
+
+# Print queue: several print stations can poll concurrently. A claim takes a
+# batch of unprinted orders under a lease (migrations/001_print_queue_lease.sql);
+# the station acknowledges what it printed, anything else is handed out again
+# once the lease expires. SKIP LOCKED (MySQL 8.0+) lets concurrent claims pass
+# each other instead of waiting on, or double-claiming, the same rows.
+@app.post("/orders/print-queue/claim")
+def claim_print_jobs(request: PrintClaimRequest):
+    if not 1 <= request.limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    if not 1 <= request.lease_seconds <= 3600:
+        raise HTTPException(status_code=400, detail="lease_seconds must be between 1 and 3600")
+
+    claim = uuid.uuid4().hex
+    conn = get_db()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT id FROM orders WHERE printed = FALSE "
+            "AND (print_lease_until IS NULL OR print_lease_until < NOW()) "
+            "ORDER BY created_at ASC LIMIT %s FOR UPDATE SKIP LOCKED",
+            (request.limit,))
+        ids = [row["id"] for row in cursor.fetchall()]
+        orders = []
+        if ids:
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                "UPDATE orders SET print_claim = %s, print_station = %s, "
+                "print_lease_until = NOW() + INTERVAL %s SECOND, print_attempts = print_attempts + 1 "
+                f"WHERE id IN ({placeholders})",
+                [claim, request.station, request.lease_seconds] + ids)
+            # Read back after the UPDATE so the station sees its claim, lease and attempt count
+            cursor.execute(f"SELECT * FROM orders WHERE id IN ({placeholders}) ORDER BY created_at ASC", ids)
+            orders = cursor.fetchall()
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()  # Rolls back (and releases the row locks) if anything above failed
+    return {"claim": claim, "lease_seconds": request.lease_seconds, "orders": orders}
+
+@app.post("/orders/print-queue/ack")
+def ack_print_jobs(request: PrintAckRequest):
+    if not request.order_ids:
+        return {"acknowledged": 0}
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        placeholders = ", ".join(["%s"] * len(request.order_ids))
+        # Only the current claim holder can acknowledge: after a lease expired and
+        # another station re-claimed the order, the late ack is ignored
+        cursor.execute(
+            "UPDATE orders SET printed = TRUE, print_lease_until = NULL "
+            f"WHERE id IN ({placeholders}) AND print_claim = %s AND printed = FALSE",
+            list(request.order_ids) + [request.claim])
+        acknowledged = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    return {"acknowledged": acknowledged}
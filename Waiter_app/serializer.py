@@ -0,0 +1,26 @@
+# serializer.py
+# Fast JSON responses for the order routes. FastAPI runs every returned dict
+# through jsonable_encoder before encoding it; returning these responses skips
+# that step. Encoding is done by the shared codec (../json_codec.py, orjson
+# when it is installed), with FastAPI's output for dates and decimals.
+import os
+from fastapi.responses import Response
+from json_codec import JSONCodec
+
+codec = JSONCodec(os.getenv("WAITER_JSON_BACKEND", "auto"), date_format="iso", decimal_format="number")
+dumps = codec.dumps
+
+class JSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+def rows_response(columns, rows, status_code=200):
+    # Rows as tuples plus one column list, no dict per row from the cursor
+    return Response(codec.dump_rows(columns, rows), status_code=status_code, media_type="application/json")
+
+def page_response(columns, rows, next_cursor):
+    # {"data": [...], "next_cursor": ...} for paginated lists
+    body = b"".join([b'{"data":', codec.dump_rows(columns, rows), b',"next_cursor":', dumps(next_cursor), b"}"])
+    return Response(body, media_type="application/json")
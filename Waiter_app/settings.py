@@ -0,0 +1,83 @@
+# settings.py
+# The settings table (max_tables, ...) is read on hot paths like order creation,
+# so the whole table is cached in-process. Entries expire after SETTINGS_TTL
+# seconds (other workers' changes show up within that time) and are dropped
+# immediately when a setting is changed through this API.
+import os
+import threading
+import time
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from .auth import require_role
+from .db import get_db
+from .serializer import JSONResponse
+
+SETTINGS_TTL = float(os.getenv("SETTINGS_TTL", "60"))
+
+router = APIRouter()
+
+class SettingsCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._values = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, name, default=None, conn=None):
+        # conn: an already checked out connection to load with, so callers need only one
+        values = self._values
+        if values is None or time.monotonic() >= self._expires_at:
+            values = self.load(conn)
+        return values.get(name, default)
+
+    def load(self, conn=None):
+        with self._lock:
+            if self._values is not None and time.monotonic() < self._expires_at:
+                return self._values  # Loaded by another thread while we waited
+            own_conn = conn is None
+            if own_conn:
+                conn = get_db()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT name, value FROM settings")
+                values = dict(cursor.fetchall())
+                cursor.close()
+            finally:
+                if own_conn:
+                    conn.close()
+            self._values = values
+            self._expires_at = time.monotonic() + self.ttl
+            return values
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+
+settings_cache = SettingsCache(SETTINGS_TTL)
+
+def get_max_tables(conn=None):
+    value = settings_cache.get("max_tables", conn=conn)
+    return int(value) if value is not None else 20
+
+class SettingUpdate(BaseModel):
+    value: str
+
+@router.get("/settings")
+def list_settings():
+    return JSONResponse(settings_cache.load())
+
+@router.put("/settings/{name}")
+def update_setting(name: str, update: SettingUpdate, user=Depends(require_role("admin"))):
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE settings SET value = %s WHERE name = %s", (update.value, name))
+        conn.commit()
+        updated = cursor.rowcount
+        cursor.close()
+    finally:
+        conn.close()
+    if not updated:
+        raise HTTPException(status_code=404, detail="Setting not found")
+    settings_cache.invalidate()
+    return JSONResponse({"message": f"Setting {name} updated to {update.value}"})
@@ -0,0 +1,116 @@
+# status.py
+# Order status changes: allowed transitions, batched writes and history.
+# apply_status_updates() applies many (order_id, status) pairs in one
+# transaction: one locking SELECT, one UPDATE per target status and one
+# multi-row INSERT into order_status_history (migrations/005).
+# StatusBatcher merges single updates that arrive within a few milliseconds
+# of each other into one such transaction (STATUS_BATCH_WINDOW_MS, 0 = off).
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from .db import get_db
+
+STATUSES = ["pending", "kitchen", "in_delivery", "completed", "cancelled"]
+ALLOWED_TRANSITIONS = {
+    "pending": {"kitchen", "cancelled"},
+    "kitchen": {"in_delivery", "completed", "cancelled"},  # Dine-in and takeout skip delivery
+    "in_delivery": {"completed", "cancelled"},
+    "completed": set(),
+    "cancelled": set(),
+}
+
+STATUS_BATCH_WINDOW_MS = float(os.getenv("STATUS_BATCH_WINDOW_MS", "0"))
+STATUS_BATCH_MAX = int(os.getenv("STATUS_BATCH_MAX", "200"))
+
+def apply_status_updates(updates):
+    """
+    Applies [(order_id, status), ...] in order, in one transaction.
+    Returns (results, changes), both aligned with `updates`: a result dict per
+    update, and its (order_id, order_type, from_status, to_status) step or None.
+    """
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        ids = sorted({order_id for order_id, _ in updates})
+        placeholders = ", ".join(["%s"] * len(ids))
+        # Locked in id order so concurrent batches can't deadlock each other
+        cursor.execute(f"SELECT id, status, order_type FROM orders WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE",
+                       ids)
+        current = {order_id: [status, order_type] for order_id, status, order_type in cursor.fetchall()}
+
+        results, changes = [], []
+        for order_id, status in updates:
+            order = current.get(order_id)
+            change = None
+            if order is None:
+                results.append({"order_id": order_id, "status": "not_found"})
+            elif order[0] == status:
+                results.append({"order_id": order_id, "status": "unchanged", "order_status": status})
+            elif status not in ALLOWED_TRANSITIONS.get(order[0], ()):
+                results.append({"order_id": order_id, "status": "invalid_transition",
+                                "error": f"Cannot change status from {order[0]} to {status}"})
+            else:
+                change = (order_id, order[1], order[0], status)
+                order[0] = status
+                results.append({"order_id": order_id, "status": "updated", "order_status": status})
+            changes.append(change)
+
+        steps = [change for change in changes if change is not None]
+        if steps:
+            # Only the final status of each order is written, grouped by status
+            by_status = {}
+            for order_id in {step[0] for step in steps}:
+                by_status.setdefault(current[order_id][0], []).append(order_id)
+            for status, order_ids in by_status.items():
+                placeholders = ", ".join(["%s"] * len(order_ids))
+                cursor.execute(f"UPDATE orders SET status = %s WHERE id IN ({placeholders})",
+                               [status] + sorted(order_ids))
+            cursor.executemany(
+                "INSERT INTO order_status_history (order_id, from_status, to_status) VALUES (%s, %s, %s)",
+                [(order_id, from_status, to_status) for order_id, _, from_status, to_status in steps])
+        conn.commit()
+        cursor.close()
+        return results, changes
+    finally:
+        conn.close()
+
+class StatusBatcher:
+    """Collects single status updates from request threads and writes them in shared transactions."""
+
+    def __init__(self, window_seconds, max_batch):
+        self.window = window_seconds
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="status-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, order_id, status):
+        """Returns a Future resolving to (result, change) for this one update."""
+        future = Future()
+        self._queue.put((order_id, status, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results, changes = apply_status_updates([(order_id, status) for order_id, status, _ in batch])
+            except Exception as err:
+                for _, _, future in batch:
+                    future.set_exception(err)
+                continue
+            for (_, _, future), result, change in zip(batch, results, changes):
+                future.set_result((result, change))
+
+status_batcher = StatusBatcher(STATUS_BATCH_WINDOW_MS / 1000, STATUS_BATCH_MAX) if STATUS_BATCH_WINDOW_MS > 0 else None
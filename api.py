@@ -1,6 +1,18 @@
-from flask import Flask, jsonify, request
-import mysql.connector
+from flask import Flask, Response, g, jsonify, request
+from flask.json.provider import JSONProvider
 import os # For potentially using environment variables for credentials
+import base64
+import hashlib
+import json
+import threading
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+import time
+from response_cache import MemoryBackend, RedisBackend, ResponseCache, parse_table_ttls
+from metrics import BYTE_BUCKETS, registry
+from json_codec import JSONCodec
+from storage import ConnectionPool, DB_ROWS, execute, slow_queries
+import compression
 
 # --- Flask App Initialization ---
 app = Flask(__name__)
@@ -8,21 +20,147 @@ app = Flask(__name__)
 # --- Database Configuration ---
 # IMPORTANT: Replace placeholders with your actual database credentials.
 # Consider using environment variables for better security in production.
-db_config = {
-    'host': os.getenv('DB_HOST', 'localhost'),      # Replace 'localhost' if needed
-    'user': os.getenv('DB_USER', 'your_api_user'), # Replace with your specific API user
-    'password': os.getenv('DB_PASSWORD', 'your_api_password'), # Replace with the user's password
-    'database': os.getenv('DB_NAME', 'food_delivery_service') # Your database name
+# DB_BACKEND=sqlite runs the same API against a local SQLite file (DB_PATH),
+# e.g. for development or benchmarks without a MySQL server.
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+if DB_BACKEND == 'sqlite':
+    db_config = {'database': os.getenv('DB_PATH', 'food_delivery_service.db')}
+else:
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),      # Replace 'localhost' if needed
+        'user': os.getenv('DB_USER', 'your_api_user'), # Replace with your specific API user
+        'password': os.getenv('DB_PASSWORD', 'your_api_password'), # Replace with the user's password
+        'database': os.getenv('DB_NAME', 'food_delivery_service'), # Your database name
+    }
+
+# Connection pool settings. Sizes/timeouts can be tuned per deployment through
+# environment variables; keep DB_POOL_SIZE * number of worker processes below
+# MySQL's max_connections.
+pool_config = {
+    'size': int(os.getenv('DB_POOL_SIZE', '10')),                      # Max open connections per process
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),  # Seconds before a connection is recycled
+    'wait_timeout': float(os.getenv('DB_POOL_WAIT_TIMEOUT', '5')),     # Seconds to wait for a free connection
+    'ping_after': float(os.getenv('DB_POOL_PING_AFTER', '30')),        # Ping connections idle longer than this
 }
 
+# Pagination / streaming settings for list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv('API_DEFAULT_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '1000'))
+STREAM_BATCH_SIZE = int(os.getenv('API_STREAM_BATCH_SIZE', '500')) # Rows fetched per round trip when streaming
+
+# Server-side prepared statements for parameterized reads, cached per pooled connection
+USE_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', '1') == '1'
+STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '64'))
+# The free-form ?where=<sql> parameter is disabled unless explicitly enabled (legacy clients)
+ALLOW_RAW_WHERE = os.getenv('API_ALLOW_RAW_WHERE', '0') == '1'
+
+# Bulk endpoints: rows per executemany/IN (...) statement and rows per request
+BULK_CHUNK_SIZE = int(os.getenv('API_BULK_CHUNK_SIZE', '200'))
+BULK_MAX_ROWS = int(os.getenv('API_BULK_MAX_ROWS', '5000'))
+
+# Write endpoints: re-read the row after INSERT/UPDATE (exact server-side values)
+# or build the response from the write itself (one round trip instead of two),
+# and whether DELETE checks for the row first or just relies on rowcount.
+READ_AFTER_WRITE = os.getenv('API_READ_AFTER_WRITE', '1') == '1'
+DELETE_PRECHECK = os.getenv('API_DELETE_PRECHECK', '0') == '1'
+
+# Table schema cache (information_schema): reload interval, and retry delay after a failed load
+SCHEMA_REFRESH_SECONDS = float(os.getenv('API_SCHEMA_REFRESH_SECONDS', '300'))
+SCHEMA_RETRY_SECONDS = float(os.getenv('API_SCHEMA_RETRY_SECONDS', '10'))
+
+# Response cache for GET endpoints: 'memory' (per process), 'redis' (shared by all workers) or 'none'.
+# TTLs are per table in seconds; tables without a TTL (or TTL 0) are never cached.
+CACHE_BACKEND = os.getenv('API_CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.getenv('API_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_MAX_ENTRIES = int(os.getenv('API_CACHE_MAX_ENTRIES', '2048'))
+CACHE_DEFAULT_TTL = float(os.getenv('API_CACHE_TTL', '0'))
+CACHE_TABLE_TTLS = parse_table_ttls(os.getenv('API_CACHE_TABLE_TTLS', 'restaurants=60,menu_items=60,promotions=60'))
+
+# Relation expansion (?expand=order_items.menu_item): max nesting depth
+MAX_EXPAND_DEPTH = int(os.getenv('API_MAX_EXPAND_DEPTH', '3'))
+
+# Tables whose ETags come from the per-table write version, so a matching If-None-Match
+# is answered with 304 before touching MySQL. Only list tables that are written exclusively
+# through this API; the other tables get ETags from a hash of the response body. Versions
+# live in the cache backend, and a per-process memory backend would hand out stale ETags
+# after another worker's write, so the default list is empty unless the backend is redis.
+DEFAULT_ETAG_VERSION_TABLES = 'restaurants,menu_items,promotions' if CACHE_BACKEND == 'redis' else ''
+ETAG_VERSION_TABLES = {t for t in os.getenv('API_ETAG_VERSION_TABLES', DEFAULT_ETAG_VERSION_TABLES).split(',') if t}
+
+# Instrumentation: whether /metrics (Prometheus text format) is served, and the duration
+# in seconds from which statements go to the slow query log (0 turns the log off)
+METRICS_ENDPOINT = os.getenv('API_METRICS_ENDPOINT', '1') == '1'
+SLOW_QUERY_SECONDS = float(os.getenv('API_SLOW_QUERY_SECONDS', '0.5'))
+
+# JSON encoding of every response: 'orjson' (if installed), 'json' (standard library) or 'auto',
+# and how dates are written: 'http' (Flask's default, e.g. "Tue, 02 Jan 2024 10:00:00 GMT") or 'iso'
+JSON_BACKEND = os.getenv('API_JSON_BACKEND', 'auto')
+JSON_DATE_FORMAT = os.getenv('API_JSON_DATES', 'http')
+
+# Response compression (Accept-Encoding): encodings in order of preference (br and zstd are
+# only used when their packages are installed) and the smallest body worth compressing.
+# Streamed responses are always compressed when the client accepts it.
+COMPRESSION_ENCODINGS = [e for e in os.getenv('API_COMPRESSION', 'zstd,br,gzip').split(',')
+                         if e in compression.available_encodings()]
+COMPRESSION_MIN_BYTES = int(os.getenv('API_COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson'}
+
+# --- JSON Encoding ---
+
+json_codec = JSONCodec(JSON_BACKEND, JSON_DATE_FORMAT)
+
+class CodecJSONProvider(JSONProvider):
+    """Makes jsonify() and app.json use json_codec (datetime/Decimal/bytes aware)."""
+
+    def dumps(self, obj, **kwargs):
+        return json_codec.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(json_codec.dumps(obj) + b'\n', mimetype='application/json')
+
+app.json = CodecJSONProvider(app)
+
+# --- Metrics ---
+# Collected in-process; with several workers each one reports its own numbers.
+
+metrics = registry  # Also holds the api_db_* metrics recorded by the storage layer
+REQUEST_SECONDS = metrics.histogram(
+    'api_request_duration_seconds', 'Time to build the response (until the first byte for streams)',
+    ('method', 'route', 'status'))
+RESPONSE_BYTES = metrics.histogram(
+    'api_response_bytes', 'Size of non-streamed response bodies', ('method', 'route'), BYTE_BUCKETS)
+slow_queries.threshold = SLOW_QUERY_SECONDS
+
+# --- Connection Pool ---
+
+db_pool = ConnectionPool(DB_BACKEND, db_config, statement_cache_size=STATEMENT_CACHE_SIZE, name='api',
+                         **pool_config)
+DatabaseError = db_pool.dialect.Error  # DatabaseError or sqlite3.Error
+
+# --- Response Cache ---
+
+def make_response_cache():
+    if CACHE_BACKEND == 'redis':
+        return ResponseCache(RedisBackend(CACHE_REDIS_URL), CACHE_DEFAULT_TTL, CACHE_TABLE_TTLS)
+    if CACHE_BACKEND == 'memory':
+        return ResponseCache(MemoryBackend(CACHE_MAX_ENTRIES), CACHE_DEFAULT_TTL, CACHE_TABLE_TTLS)
+    # No response caching, but table versions are still tracked for ETags
+    return ResponseCache(MemoryBackend(0))
+
+response_cache = make_response_cache()
+
 # --- Database CRUD Helper Functions ---
 
 def db_connect():
-    """Establishes a database connection."""
+    """Checks out a database connection from the pool. Call close() to return it."""
     try:
-        cnx = mysql.connector.connect(**db_config)
+        cnx = db_pool.acquire()
         return cnx
-    except mysql.connector.Error as err:
+    except db_pool.errors as err:
         print(f"Database Connection Error: {err}")
         # In a real app, you'd likely log this error more formally
         return None
@@ -36,55 +174,186 @@ def create_record(table_name, data):
     cursor = None
     try:
         cursor = cnx.cursor()
-        columns = ', '.join(f"`{col}`" for col in data.keys())
-        placeholders = ', '.join(['%s'] * len(data))
-        query = f"INSERT INTO `{table_name}` ({columns}) VALUES ({placeholders})"
-        values = list(data.values())
-
-        cursor.execute(query, values)
+        query = build_insert(table_name, list(data))
+        execute(cursor, table_name, 'insert', query, list(data.values()))
         cnx.commit()
         return cursor.lastrowid, None # Return the ID of the new row
-    except mysql.connector.Error as err:
+    except DatabaseError as err:
         print(f"Error creating record in {table_name}: {err}")
         return None, str(err)
     finally:
         if cursor:
             cursor.close()
-        if cnx and cnx.is_connected():
-            cnx.close()
+        if cnx:
+            cnx.close() # Returns the connection to the pool
+
+def read_records(table_name, record_id=None, condition=None, after_id=None, limit=None, filters=None,
+                 columns=None):
+    """Reads records from the specified table based on ID, filters or condition.
+
+    `filters` is the (sql, params) pair produced by compile_filters() and
+    `columns` an optional projection (default: all columns). With
+    `after_id` and/or `limit` the results are ordered by `id` and only records
+    with an id greater than `after_id` are returned (keyset pagination).
+    """
+    result, err = read_rows(table_name, record_id, condition, after_id, limit, filters, columns)
+    if err:
+        return None, err
+    names, rows = result
+    return [dict(zip(names, row)) for row in rows], None
+
+def read_rows(table_name, record_id=None, condition=None, after_id=None, limit=None, filters=None,
+              columns=None):
+    """Same query as read_records(), returned as ((column names), [row tuples]).
 
-def read_records(table_name, record_id=None, condition=None):
-    """Reads records from the specified table based on ID or condition."""
+    Cheaper for large results that are only serialized (see json_codec.dump_rows).
+    """
     cnx = db_connect()
     if not cnx:
         return None, "Database connection failed"
 
     cursor = None
+    query = None
+    prepared = USE_PREPARED_STATEMENTS and condition is None
     try:
-        # dictionary=True returns results as dictionaries (JSON-friendly)
-        cursor = cnx.cursor(dictionary=True)
-        query = f"SELECT * FROM `{table_name}`"
-        params = []
-
-        if record_id is not None:
-            query += " WHERE `id` = %s"
-            params.append(record_id)
-        elif condition:
-            # WARNING: Directly using 'condition' can be risky.
-            # For production, implement safer filtering (e.g., parse specific fields).
-            query += f" WHERE {condition}" # Example: "role = 'customer'"
-
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        return results, None
-    except mysql.connector.Error as err:
+        query, params = build_select(table_name, record_id, condition, after_id, limit, filters, columns)
+        if prepared:
+            # Fully parameterized, so the statement can be prepared once per connection and reused
+            stmt = cnx.prepared_cursor(query)
+            execute(stmt, table_name, 'select', query, params)
+            rows = stmt.fetchall()
+            DB_ROWS.observe(len(rows), table_name)
+            return (tuple(stmt.column_names), rows), None
+
+        cursor = cnx.cursor()
+        execute(cursor, table_name, 'select', query, params)
+        rows = cursor.fetchall()
+        DB_ROWS.observe(len(rows), table_name)
+        return (tuple(cursor.column_names), rows), None
+    except DatabaseError as err:
         print(f"Error reading records from {table_name}: {err}")
+        if prepared and query:
+            cnx.drop_statement(query)
         return None, str(err)
     finally:
         if cursor:
             cursor.close()
-        if cnx and cnx.is_connected():
-            cnx.close()
+        if cnx:
+            cnx.close() # Returns the connection to the pool
+
+def build_select(table_name, record_id=None, condition=None, after_id=None, limit=None, filters=None,
+                 columns=None):
+    """Builds the SELECT statement and parameters used by read_records/open_record_stream."""
+    column_sql = ', '.join(f"`{col}`" for col in columns) if columns else '*'
+    query = f"SELECT {column_sql} FROM `{table_name}`"
+    where = []
+    params = []
+
+    if record_id is not None:
+        where.append("`id` = %s")
+        params.append(record_id)
+    elif condition:
+        # WARNING: Directly using 'condition' can be risky.
+        # For production, implement safer filtering (e.g., parse specific fields).
+        where.append(f"({condition})") # Example: "role = 'customer'"
+    elif filters and filters[0]:
+        where.append(filters[0])
+        params.extend(filters[1])
+
+    if after_id is not None:
+        where.append("`id` > %s")
+        params.append(after_id)
+
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    if after_id is not None or limit is not None:
+        query += " ORDER BY `id`"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+def build_insert(table_name, columns):
+    """INSERT statement taking one value per column."""
+    column_sql = ', '.join(f"`{col}`" for col in columns)
+    return f"INSERT INTO `{table_name}` ({column_sql}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+def build_update(table_name, columns):
+    """UPDATE statement by id, taking the column values followed by the id."""
+    set_clauses = ', '.join(f"`{col}` = %s" for col in columns)
+    return f"UPDATE `{table_name}` SET {set_clauses} WHERE `id` = %s"
+
+def build_delete(table_name, where="`id` = %s"):
+    return f"DELETE FROM `{table_name}` WHERE {where}"
+
+class RecordStream:
+    """Rows of an unbuffered SELECT, fetched in batches so memory stays flat.
+
+    The connection is held until the rows are exhausted or close() is called
+    (Flask calls it when the response is finished or the client disconnects).
+    """
+
+    def __init__(self, cnx, cursor, batch_size, table_name=None):
+        self.columns = tuple(cursor.column_names) # Rows are tuples in this order
+        self._cnx = cnx
+        self._cursor = cursor
+        self._batch_size = batch_size
+        self._table_name = table_name
+        self._exhausted = False
+        self._rows = 0
+
+    def batches(self):
+        try:
+            while self._cursor is not None:
+                rows = self._cursor.fetchmany(self._batch_size)
+                if not rows:
+                    self._exhausted = True
+                    break
+                self._rows += len(rows)
+                yield rows
+        except DatabaseError as err:
+            # Re-raised so the server aborts the response: a closed JSON array would
+            # look like a complete result
+            print(f"Error streaming records: {err}")
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        if self._cnx is None:
+            return
+        cnx, self._cnx = self._cnx, None
+        cursor, self._cursor = self._cursor, None
+        DB_ROWS.observe(self._rows, self._table_name)
+        if not self._exhausted:
+            # Unread rows are still pending on this connection, don't reuse it
+            cnx.discard()
+            return
+        cursor.close()
+        cnx.close()
+
+def open_record_stream(table_name, condition=None, after_id=None, filters=None, columns=None, limit=None,
+                       batch_size=STREAM_BATCH_SIZE):
+    """Runs the SELECT on an unbuffered cursor and returns a RecordStream over it."""
+    cnx = db_connect()
+    if not cnx:
+        return None, "Database connection failed"
+
+    cursor = None
+    try:
+        cursor = cnx.cursor(buffered=False)
+        query, params = build_select(table_name, condition=condition, after_id=after_id, limit=limit,
+                                     filters=filters, columns=columns)
+        if after_id is None and limit is None:
+            query += " ORDER BY `id`"
+        execute(cursor, table_name, 'select', query, params)
+        return RecordStream(cnx, cursor, batch_size, table_name), None
+    except DatabaseError as err:
+        print(f"Error streaming records from {table_name}: {err}")
+        if cursor:
+            cursor.close()
+        cnx.discard()
+        return None, str(err)
 
 def update_record(table_name, record_id, data):
     """Updates a record in the specified table based on its ID."""
@@ -95,21 +364,18 @@ def update_record(table_name, record_id, data):
     cursor = None
     try:
         cursor = cnx.cursor()
-        set_clauses = ', '.join(f"`{col}` = %s" for col in data.keys())
-        query = f"UPDATE `{table_name}` SET {set_clauses} WHERE `id` = %s"
-        values = list(data.values()) + [record_id]
-
-        cursor.execute(query, values)
+        query = build_update(table_name, list(data))
+        execute(cursor, table_name, 'update', query, list(data.values()) + [record_id])
         cnx.commit()
         return cursor.rowcount, None # Return number of affected rows
-    except mysql.connector.Error as err:
+    except DatabaseError as err:
         print(f"Error updating record in {table_name} (ID {record_id}): {err}")
         return None, str(err)
     finally:
         if cursor:
             cursor.close()
-        if cnx and cnx.is_connected():
-            cnx.close()
+        if cnx:
+            cnx.close() # Returns the connection to the pool
 
 def delete_record(table_name, record_id):
     """Deletes a record from the specified table based on its ID."""
@@ -120,33 +386,880 @@ def delete_record(table_name, record_id):
     cursor = None
     try:
         cursor = cnx.cursor()
-        query = f"DELETE FROM `{table_name}` WHERE `id` = %s"
-        cursor.execute(query, (record_id,))
+        execute(cursor, table_name, 'delete', build_delete(table_name), (record_id,))
         cnx.commit()
         return cursor.rowcount, None # Return number of affected rows
-    except mysql.connector.Error as err:
+    except DatabaseError as err:
         print(f"Error deleting record from {table_name} (ID {record_id}): {err}")
         return None, str(err)
     finally:
         if cursor:
             cursor.close()
-        if cnx and cnx.is_connected():
+        if cnx:
+            cnx.close() # Returns the connection to the pool
+
+# --- Bulk Helper Functions ---
+# All rows of a bulk call share one connection and one transaction. Each chunk
+# runs behind a savepoint; if it fails, its rows are retried one at a time so
+# the caller gets a status per row. With atomic=True any failed row rolls the
+# whole batch back, otherwise the successful rows are committed.
+#
+# The chunking, retries and per-row results live in plans (bulk_*_plan) that do
+# no I/O: they yield (operation, query, params, many) steps and are sent each
+# step's result. run_bulk_plan() drives them on a cursor here, and api_async
+# drives the same plans on an aiomysql cursor.
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class StepFailed(Exception):
+    """Thrown into a bulk plan when its last write failed; the message is the database error."""
+
+def id_filter(ids):
+    """(sql, params) filter matching the given ids, usable as build_select(filters=...)."""
+    return f"`id` IN ({', '.join(['%s'] * len(ids))})", list(ids)
+
+def padded_id_filter(ids):
+    """id_filter() with the IN list padded to a power of two by repeating the last id.
+
+    Keeps the number of distinct statements small enough for the per-connection
+    prepared statement cache; the duplicates don't change the result.
+    """
+    size = 1
+    while size < len(ids):
+        size *= 2
+    return id_filter(list(ids) + [ids[-1]] * (size - len(ids)))
+
+def select_ids_step(table_name, ids):
+    """Step returning the rows of `ids` that exist in the table (one query)."""
+    sql, params = id_filter(ids)
+    return 'select', f"SELECT `id` FROM `{table_name}` WHERE {sql}", params, False
+
+def group_by_columns(rows, indices, skip=()):
+    """Groups row indices by their column set so each group can share one statement."""
+    groups = {}
+    for i in indices:
+        columns = tuple(sorted(col for col in rows[i] if col not in skip))
+        groups.setdefault(columns, []).append(i)
+    return groups
+
+def bulk_create_plan(table_name, rows, chunk_size, consecutive_ids=True):
+    """Plan for bulk_create_records(): one multi-row INSERT (executemany) per chunk.
+
+    A write step's result is its lastrowid. The ids of a multi-row INSERT are
+    taken as first_id, first_id + 1, ... which the database must guarantee
+    (`consecutive_ids`, see insert_ids_are_consecutive()); without that
+    guarantee, rows without an explicit id are inserted one at a time.
+    Returns the per-row results.
+    """
+    results = [None] * len(rows)
+
+    def insert_each(query, columns, chunk, values):
+        for i, row_values in zip(chunk, values):
+            try:
+                row_id = yield 'insert', query, row_values, False
+                new_id = rows[i]['id'] if 'id' in columns else row_id
+                results[i] = {'index': i, 'status': 'created', 'id': new_id}
+            except StepFailed as err:
+                results[i] = {'index': i, 'status': 'error', 'error': str(err)}
+
+    for columns, indices in group_by_columns(rows, range(len(rows))).items():
+        query = build_insert(table_name, columns)
+        for chunk in chunked(indices, chunk_size):
+            values = [[rows[i][col] for col in columns] for i in chunk]
+            if not consecutive_ids and 'id' not in columns:
+                yield from insert_each(query, columns, chunk, values)
+                continue
+            try:
+                # A multi-row INSERT reports the first generated id; the rest follow it
+                first_id = yield 'insert', query, values, True
+                for offset, i in enumerate(chunk):
+                    new_id = rows[i]['id'] if 'id' in columns else first_id + offset
+                    results[i] = {'index': i, 'status': 'created', 'id': new_id}
+            except StepFailed:
+                yield from insert_each(query, columns, chunk, values)
+    return results
+
+def bulk_update_plan(table_name, rows, chunk_size):
+    """Plan for bulk_update_records(): one SELECT of the existing ids and one executemany per chunk."""
+    results = [None] * len(rows)
+    for columns, indices in group_by_columns(rows, range(len(rows)), skip=('id',)).items():
+        query = build_update(table_name, columns)
+        for chunk in chunked(indices, chunk_size):
+            existing = {row[0] for row in (yield select_ids_step(table_name, [rows[i]['id'] for i in chunk]))}
+            found = []
+            for i in chunk:
+                if rows[i]['id'] in existing:
+                    found.append(i)
+                else:
+                    results[i] = {'index': i, 'id': rows[i]['id'], 'status': 'not_found'}
+            if not found:
+                continue
+
+            values = [[rows[i][col] for col in columns] + [rows[i]['id']] for i in found]
+            try:
+                yield 'update', query, values, True
+                for i in found:
+                    results[i] = {'index': i, 'id': rows[i]['id'], 'status': 'updated'}
+            except StepFailed:
+                for i, row_values in zip(found, values):
+                    try:
+                        yield 'update', query, row_values, False
+                        results[i] = {'index': i, 'id': rows[i]['id'], 'status': 'updated'}
+                    except StepFailed as err:
+                        results[i] = {'index': i, 'id': rows[i]['id'], 'status': 'error', 'error': str(err)}
+    return results
+
+def bulk_delete_plan(table_name, ids, chunk_size):
+    """Plan for bulk_delete_records(): one DELETE ... WHERE id IN (...) per chunk."""
+    results = [None] * len(ids)
+    for chunk in chunked(list(range(len(ids))), chunk_size):
+        existing = {row[0] for row in (yield select_ids_step(table_name, [ids[i] for i in chunk]))}
+        found = []
+        for i in chunk:
+            if ids[i] in existing:
+                found.append(i)
+            else:
+                results[i] = {'index': i, 'id': ids[i], 'status': 'not_found'}
+        if not found:
+            continue
+
+        try:
+            sql, params = id_filter([ids[i] for i in found])
+            yield 'delete', build_delete(table_name, sql), params, False
+            for i in found:
+                results[i] = {'index': i, 'id': ids[i], 'status': 'deleted'}
+        except StepFailed:
+            # e.g. a foreign key blocks some of them: find out which
+            for i in found:
+                try:
+                    yield 'delete', build_delete(table_name), (ids[i],), False
+                    results[i] = {'index': i, 'id': ids[i], 'status': 'deleted'}
+                except StepFailed as err:
+                    results[i] = {'index': i, 'id': ids[i], 'status': 'error', 'error': str(err)}
+    return results
+
+def settle_bulk(results, atomic):
+    """True if the batch is to be committed; otherwise marks the rows that succeeded as rolled back."""
+    if atomic and any(r['status'] == 'error' for r in results):
+        for r in results:
+            if r['status'] not in ('error', 'not_found'):
+                r['status'] = 'rolled_back'
+        return False
+    return True
+
+def run_in_savepoint(cursor, action):
+    """Runs action(); if it raises a database error only its own changes are undone."""
+    cursor.execute("SAVEPOINT bulk_step")
+    try:
+        result = action()
+    except DatabaseError:
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_step")
+        raise
+    cursor.execute("RELEASE SAVEPOINT bulk_step")
+    return result
+
+def write_rows(cursor, table_name, operation, query, params, many):
+    """Runs a write and returns its lastrowid, read before RELEASE SAVEPOINT resets it."""
+    execute(cursor, table_name, operation, query, params, many=many)
+    return cursor.lastrowid
+
+def run_bulk_plan(cursor, table_name, plan):
+    """Runs a bulk plan on `cursor`, each write behind its own savepoint. Returns the plan's results."""
+    try:
+        step = next(plan)
+        while True:
+            operation, query, params, many = step
+            if operation == 'select':
+                execute(cursor, table_name, 'select', query, params)
+                step = plan.send(cursor.fetchall())
+                continue
+            try:
+                row_id = run_in_savepoint(cursor, lambda: write_rows(cursor, table_name, *step))
+            except DatabaseError as err:
+                step = plan.throw(StepFailed(str(err)))
+            else:
+                step = plan.send(row_id)
+    except StopIteration as done:
+        return done.value
+
+def fetch_where_in(cnx, table_name, column, values):
+    """Fetches rows whose `column` is one of `values`, one WHERE ... IN (...) query per chunk."""
+    records = []
+    cursor = cnx.cursor(dictionary=True)
+    try:
+        for chunk in chunked(list(values), BULK_CHUNK_SIZE):
+            sql = f"`{column}` IN ({', '.join(['%s'] * len(chunk))})"
+            query, params = build_select(table_name, filters=(sql, chunk))
+            execute(cursor, table_name, 'select', query, params)
+            records.extend(cursor.fetchall())
+    finally:
+        cursor.close()
+    DB_ROWS.observe(len(records), table_name)
+    return records
+
+def fetch_by_ids(cnx, table_name, ids):
+    """Fetches full rows for `ids` with one WHERE id IN (...) query per chunk."""
+    return fetch_where_in(cnx, table_name, 'id', ids)
+
+def run_bulk(table_name, verb, plan, atomic, read_back=None):
+    """Runs a bulk plan in one transaction and commits or rolls it back.
+
+    Returns ({'committed', 'results'}, err). With `read_back` (a result status)
+    the committed rows with that status are added as 'records', read back with
+    WHERE id IN (...).
+    """
+    cnx = db_connect()
+    if not cnx:
+        return None, "Database connection failed"
+
+    cursor = None
+    try:
+        cursor = cnx.cursor()
+        results = run_bulk_plan(cursor, table_name, plan)
+        committed = settle_bulk(results, atomic)
+        if committed:
+            cnx.commit()
+        else:
+            cnx.rollback()
+        report = {'committed': committed, 'results': results}
+        if read_back:
+            ids = [r['id'] for r in results if r['status'] == read_back]
+            report['records'] = fetch_by_ids(cnx, table_name, ids) if committed and ids else []
+        return report, None
+    except DatabaseError as err:
+        print(f"Error bulk {verb} records in {table_name}: {err}")
+        return None, str(err)
+    finally:
+        if cursor:
+            cursor.close()
+        if cnx:
+            cnx.close() # Returns the connection to the pool (rolls back if still open)
+
+insert_id_settings = {'consecutive': None}  # Cached result of insert_ids_are_consecutive()
+
+def insert_ids_are_consecutive():
+    """Whether a multi-row INSERT's ids can be derived from its first id (asked once per process).
+
+    With MySQL this needs innodb_autoinc_lock_mode 0 or 1 and
+    auto_increment_increment 1 (storage.consecutive_autoinc). If the settings
+    cannot be read, the answer is no until they can.
+    """
+    if insert_id_settings['consecutive'] is None:
+        cnx = db_connect()
+        if not cnx:
+            return False
+        cursor = None
+        try:
+            cursor = cnx.cursor()
+            insert_id_settings['consecutive'] = db_pool.dialect.consecutive_insert_ids(cursor)
+        except DatabaseError as err:
+            print(f"Error reading the auto-increment settings: {err}")
+            return False
+        finally:
+            if cursor:
+                cursor.close()
             cnx.close()
+        if not insert_id_settings['consecutive']:
+            print("Auto-increment ids of a multi-row INSERT may not be consecutive "
+                  "(innodb_autoinc_lock_mode 2?): bulk creates insert rows one at a time")
+    return insert_id_settings['consecutive']
+
+def bulk_create_records(table_name, rows, chunk_size=BULK_CHUNK_SIZE, atomic=True):
+    """Inserts many rows with one multi-row INSERT (executemany) per chunk.
+
+    Returns ({'committed', 'results', 'records'}, err). `records` holds the
+    committed rows, read back with WHERE id IN (...).
+    """
+    plan = bulk_create_plan(table_name, rows, chunk_size, insert_ids_are_consecutive())
+    return run_bulk(table_name, 'creating', plan, atomic, 'created')
+
+def bulk_update_records(table_name, rows, chunk_size=BULK_CHUNK_SIZE, atomic=True):
+    """Updates many rows (each carrying its `id`) with executemany per chunk.
+
+    Ids that do not exist are reported as 'not_found' (checked with one
+    SELECT per chunk). Returns ({'committed', 'results', 'records'}, err).
+    """
+    return run_bulk(table_name, 'updating', bulk_update_plan(table_name, rows, chunk_size), atomic, 'updated')
+
+def bulk_delete_records(table_name, ids, chunk_size=BULK_CHUNK_SIZE, atomic=True):
+    """Deletes many rows with one DELETE ... WHERE id IN (...) per chunk.
+
+    Returns ({'committed', 'results'}, err) with one entry per requested id.
+    """
+    return run_bulk(table_name, 'deleting', bulk_delete_plan(table_name, ids, chunk_size), atomic)
 
 # --- API Endpoints ---
 
-# List of tables allowed for API operations (for basic security)
+# Tables allowed for API operations (for basic security). Which columns may be
+# filtered on (?column=op:value) or selected (?fields=) comes from the schema cache.
 ALLOWED_TABLES = {
     'users', 'restaurants', 'menu_items', 'orders',
     'order_items', 'delivery_addresses', 'promotions'
     # Add 'order_promotions' if needed
 }
 
+# Query parameters with a meaning of their own; everything else is a column filter
+RESERVED_QUERY_PARAMS = {'where', 'limit', 'after', 'cursor', 'stream', 'fields', 'ids', 'expand'}
+
+FILTER_OPERATORS = {
+    'eq': '= %s', 'ne': '<> %s',
+    'gt': '> %s', 'gte': '>= %s',
+    'lt': '< %s', 'lte': '<= %s',
+    'like': 'LIKE %s',
+    'in': None,      # comma-separated values
+    'isnull': None,  # true / false
+}
+
 def validate_table_name(table_name):
     if table_name not in ALLOWED_TABLES:
-        return False, jsonify({'error': f'Access to table "{table_name}" is forbidden'}), 403
+        return False, (jsonify({'error': f'Access to table "{table_name}" is forbidden'}), 403)
     return True, None
 
+def compile_filters(table_name, args):
+    """Compiles ?column=op:value query parameters into parameterized SQL.
+
+    Returns (sql, params, columns). A value without a known operator prefix
+    means equality (?status=pending). Clauses are emitted in column order so
+    the same filter shape always yields the same statement text.
+    Raises ValueError for unknown columns or malformed values.
+    """
+    schema = schema_cache.get(table_name)
+    allowed_columns = schema.columns if schema is not None else {}
+    clauses = []
+    params = []
+    columns = []
+    for column in sorted(args.keys()):
+        if column in RESERVED_QUERY_PARAMS:
+            continue
+        if column not in allowed_columns:
+            raise ValueError(f'Cannot filter {table_name} by "{column}"')
+        columns.append(column)
+        for raw_value in args.getlist(column):
+            op, sep, value = raw_value.partition(':')
+            if not sep or op not in FILTER_OPERATORS:
+                op, value = 'eq', raw_value
+            if op == 'in':
+                values = [v for v in value.split(',') if v != '']
+                if not values:
+                    raise ValueError(f'"in" filter on "{column}" needs at least one value')
+                clauses.append(f"`{column}` IN ({', '.join(['%s'] * len(values))})")
+                params.extend(values)
+            elif op == 'isnull':
+                if value.lower() not in ('true', 'false', '1', '0'):
+                    raise ValueError(f'"isnull" filter on "{column}" must be true or false')
+                is_null = value.lower() in ('true', '1')
+                clauses.append(f"`{column}` IS {'' if is_null else 'NOT '}NULL")
+            else:
+                clauses.append(f"`{column}` {FILTER_OPERATORS[op]}")
+                params.append(value)
+    return ' AND '.join(clauses), params, columns
+
+# --- Schema Cache ---
+# Columns, types, primary keys, indexes and defaults of ALLOWED_TABLES, read from
+# information_schema on startup and refreshed every SCHEMA_REFRESH_SECONDS. Used
+# to validate/coerce payloads before any DB work and to project ?fields=.
+
+INT_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'bigint'}
+FLOAT_TYPES = {'float', 'double'}
+TEXT_TYPES = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext'}
+
+def parse_column_default(value, data_type):
+    """Converts an information_schema COLUMN_DEFAULT string to a Python value."""
+    if value is None:
+        return None
+    if value.startswith("'") and value.endswith("'"):  # MariaDB quotes string literals
+        value = value[1:-1]
+    try:
+        if data_type in INT_TYPES:
+            return int(value)
+        if data_type in FLOAT_TYPES:
+            return float(value)
+        if data_type == 'decimal':
+            return Decimal(value)
+    except (ValueError, InvalidOperation):
+        pass
+    return value
+
+class TableSchema:
+    """Columns (in table order), primary key, leading index columns and constant defaults of a table."""
+
+    def __init__(self, name):
+        self.name = name
+        self.columns = {}      # column -> {'data_type', 'nullable', 'max_length', 'enum_values', 'required'}
+        self.primary_key = []
+        self.indexed = set()   # Columns that lead at least one index
+        self.defaults = {}     # Column -> constant default (server-generated values are left out)
+        self.relations = {}    # ?expand name -> ('one' | 'many', other table, foreign key column)
+
+    def add_column(self, name, data_type, column_type, nullable, default, max_length, column_key, extra):
+        extra = (extra or '').lower()
+        generated = 'auto_increment' in extra or 'generated' in extra
+        enum_values = None
+        if data_type in ('enum', 'set'):
+            enum_values = {v.strip("'") for v in column_type[column_type.index('(') + 1:-1].split("','")}
+
+        self.columns[name] = {
+            'data_type': data_type,
+            'nullable': nullable,
+            'max_length': max_length,
+            'enum_values': enum_values,
+            'required': not nullable and default is None and not generated,
+        }
+        if column_key == 'PRI':
+            self.primary_key.append(name)
+        if generated:
+            return
+        if default is None:
+            if nullable:
+                self.defaults[name] = None
+        elif not (default.upper().startswith('CURRENT_TIMESTAMP') or default.endswith(')')):
+            self.defaults[name] = parse_column_default(default, data_type)
+
+def load_schemas(tables):
+    """Reads TableSchema objects for `tables` through the database dialect (information_schema on MySQL)."""
+    cnx = db_connect()
+    if not cnx:
+        return None
+    cursor = None
+    try:
+        cursor = cnx.cursor()
+        columns, indexed, foreign_keys = db_pool.dialect.describe_tables(cursor, tables)
+        schemas = {}
+        for table, column, data_type, column_type, nullable, default, max_length, column_key, extra in columns:
+            schema = schemas.setdefault(table, TableSchema(table))
+            schema.add_column(column, data_type.lower(), column_type, nullable, default,
+                              max_length, column_key, extra)
+
+        for table, column in indexed:
+            if table in schemas:
+                schemas[table].indexed.add(column)
+
+        # Foreign keys between allowed tables become ?expand relations on both sides:
+        # order_items.order_id -> orders gives order_items "order" and orders "order_items"
+        for table, column, referenced in foreign_keys:
+            if table not in schemas or referenced not in schemas:
+                continue
+            one_name = column[:-3] if column.endswith('_id') else column
+            schemas[table].relations.setdefault(one_name, ('one', referenced, column))
+            many_name = table
+            if many_name in schemas[referenced].relations:
+                many_name = f"{table}_by_{column}"  # Second foreign key to the same table
+            schemas[referenced].relations[many_name] = ('many', table, column)
+        return schemas
+    except DatabaseError as err:
+        print(f"Error loading table schemas: {err}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+        cnx.close()
+
+class SchemaCache:
+    """Holds the TableSchema of every allowed table and reloads it when it gets old.
+
+    Only one request reloads at a time; the others keep using the previous copy.
+    If loading fails it is retried after SCHEMA_RETRY_SECONDS, and until then
+    get() returns None (callers then skip in-process validation).
+    Set auto_refresh to False to never load from inside get() and call
+    refresh() yourself instead (api_async.py does it from a worker thread).
+    """
+
+    def __init__(self, tables, refresh_seconds, retry_seconds):
+        self.tables = sorted(tables)
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self.auto_refresh = True
+        self._schemas = {}
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def seconds_until_refresh(self):
+        return max(0.0, self._next_refresh - time.monotonic())
+
+    def get(self, table_name):
+        if self.auto_refresh and time.monotonic() >= self._next_refresh:
+            # Block only if nothing has been loaded yet
+            self.refresh(blocking=not self._schemas)
+        return self._schemas.get(table_name)
+
+    def refresh(self, blocking=True):
+        if not self._lock.acquire(blocking=blocking):
+            return
+        try:
+            if time.monotonic() < self._next_refresh:
+                return  # Someone else refreshed while we waited for the lock
+            schemas = load_schemas(self.tables)
+            if schemas is not None:
+                self._schemas = schemas
+                self._next_refresh = time.monotonic() + self.refresh_seconds
+            else:
+                self._next_refresh = time.monotonic() + self.retry_seconds
+        finally:
+            self._lock.release()
+
+schema_cache = SchemaCache(ALLOWED_TABLES, SCHEMA_REFRESH_SECONDS, SCHEMA_RETRY_SECONDS)
+
+def coerce_value(info, value):
+    """Converts a JSON value to what the column expects. Raises ValueError with a reason."""
+    if value is None:
+        if not info['nullable']:
+            raise ValueError('may not be null')
+        return None
+    data_type = info['data_type']
+    if isinstance(value, (dict, list)) and data_type != 'json':
+        raise ValueError('expected a scalar value')
+
+    try:
+        if data_type in INT_TYPES:
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError
+            return int(value)
+        if data_type in FLOAT_TYPES:
+            return float(value)
+        if data_type == 'decimal':
+            return Decimal(str(value))
+        if data_type == 'date':
+            return date.fromisoformat(str(value))
+        if data_type in ('datetime', 'timestamp'):
+            return datetime.fromisoformat(str(value))
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValueError(f'expected a valid {data_type}')
+
+    if data_type == 'json':
+        return value if isinstance(value, str) else json.dumps(value)
+    if info['enum_values'] is not None:
+        if data_type == 'enum' and value not in info['enum_values']:
+            raise ValueError(f"must be one of {', '.join(sorted(info['enum_values']))}")
+        return value
+    if data_type in TEXT_TYPES:
+        value = str(value)
+        if info['max_length'] is not None and len(value) > info['max_length']:
+            raise ValueError(f"longer than {info['max_length']} characters")
+    return value
+
+def validate_record(table_name, data, partial=False):
+    """Checks a create (partial=False) or update (partial=True) payload against the schema.
+
+    Returns (coerced_data, errors), errors being {column: reason}. Without a
+    loaded schema the payload is passed through unchanged.
+    """
+    schema = schema_cache.get(table_name)
+    if schema is None:
+        return data, {}
+
+    clean = {}
+    errors = {}
+    for column, value in data.items():
+        info = schema.columns.get(column)
+        if info is None:
+            errors[column] = 'unknown column'
+            continue
+        try:
+            clean[column] = coerce_value(info, value)
+        except ValueError as e:
+            errors[column] = str(e)
+    if not partial:
+        for column, info in schema.columns.items():
+            if info['required'] and column not in data:
+                errors[column] = 'is required'
+    return clean, errors
+
+def parse_fields(table_name, args):
+    """Reads ?fields=a,b into a column list for build_select (always including `id`)."""
+    raw = args.get('fields')
+    if not raw:
+        return None, None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    schema = schema_cache.get(table_name)
+    known = schema.columns if schema is not None else {}
+    unknown = [f for f in fields if f not in known]
+    if unknown:
+        return None, f'Unknown field(s) for {table_name}: {", ".join(unknown)}'
+    if 'id' not in fields:
+        fields.insert(0, 'id')  # Needed for pagination cursors
+    return fields, None
+
+def parse_expand(table_name, args):
+    """Parses ?expand=order_items.menu_item,delivery_addresses into a tree of relation names.
+
+    Returns (tree, error), tree being {'order_items': {'menu_item': {}}, 'delivery_addresses': {}}.
+    Relations come from the foreign keys in the schema cache.
+    """
+    raw = args.get('expand')
+    if not raw:
+        return None, None
+    tree = {}
+    for path in raw.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        names = path.split('.')
+        if len(names) > MAX_EXPAND_DEPTH:
+            return None, f'"{path}" is nested deeper than {MAX_EXPAND_DEPTH} levels'
+        table = table_name
+        node = tree
+        for name in names:
+            schema = schema_cache.get(table)
+            if schema is None or name not in schema.relations:
+                return None, f'Unknown relation "{name}" for {table}'
+            table = schema.relations[name][1]
+            node = node.setdefault(name, {})
+    return tree, None
+
+def expand_columns(table_name, columns, tree):
+    """Adds the foreign key columns that the requested 'one' relations need to a ?fields projection."""
+    if columns is None or not tree:
+        return columns
+    relations = schema_cache.get(table_name).relations
+    for name in tree:
+        kind, _, fk_column = relations[name]
+        if kind == 'one' and fk_column not in columns:
+            columns = columns + [fk_column]
+    return columns
+
+def expand_plan(table_name, records, tree):
+    """Embeds related rows into `records` in place, without doing the I/O itself.
+
+    Yields (table, column, keys) lookups, one per relation and level, and is
+    sent the rows (dicts) whose `column` is one of `keys`.
+    """
+    relations = schema_cache.get(table_name).relations
+    for name, subtree in tree.items():
+        kind, other_table, fk_column = relations[name]
+        if kind == 'one':
+            # records[fk_column] -> other_table.id
+            keys = {r[fk_column] for r in records if r.get(fk_column) is not None}
+            related = (yield other_table, 'id', keys) if keys else []
+            by_id = {row['id']: row for row in related}
+            for record in records:
+                record[name] = by_id.get(record.get(fk_column))
+        else:
+            # other_table.fk_column -> records.id
+            keys = {r['id'] for r in records}
+            related = (yield other_table, fk_column, keys) if keys else []
+            grouped = {}
+            for row in related:
+                grouped.setdefault(row[fk_column], []).append(row)
+            for record in records:
+                record[name] = grouped.get(record['id'], [])
+        if subtree and related:
+            yield from expand_plan(other_table, related, subtree)
+
+def expand_records(cnx, table_name, records, tree):
+    """Runs expand_plan() with one batched query per relation and level."""
+    plan = expand_plan(table_name, records, tree)
+    try:
+        lookup = next(plan)
+        while True:
+            lookup = plan.send(fetch_where_in(cnx, *lookup))
+    except StopIteration:
+        pass
+
+def apply_expand(table_name, records, tree):
+    """Runs expand_records() on one pooled connection. Returns an error message or None."""
+    if not tree or not records:
+        return None
+    cnx = db_connect()
+    if not cnx:
+        return "Database connection failed"
+    try:
+        expand_records(cnx, table_name, records, tree)
+        return None
+    except DatabaseError as err:
+        print(f"Error expanding relations of {table_name}: {err}")
+        return str(err)
+    finally:
+        cnx.close()
+
+def build_created_record(table_name, new_id, data):
+    """The row as it was inserted: column defaults, then the submitted values, then the new id."""
+    schema = schema_cache.get(table_name)
+    record = dict(schema.defaults) if schema is not None else {}
+    record.update(data)
+    record['id'] = data.get('id', new_id)
+    return record
+
+def unindexed_filter_columns(table_name, columns):
+    """Filter columns that cannot use an index (only reported if none of them can)."""
+    schema = schema_cache.get(table_name)
+    if schema is None or not columns or schema.indexed.intersection(columns):
+        return []
+    return columns
+
+unindexed_filters_logged = set()  # (table, columns) already reported
+
+def log_unindexed_filter(table_name, columns):
+    """Reports a filter shape that cannot use an index, once per table and column set."""
+    key = (table_name, tuple(columns))
+    if key not in unindexed_filters_logged:
+        unindexed_filters_logged.add(key)
+        print(f"Filter on {table_name} uses no index: {', '.join(columns)}")
+
+def parse_ids(raw):
+    """Parses ?ids=1,2,3 into a list of unique ids in the requested order."""
+    ids = []
+    seen = set()
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        record_id = int(part) # ValueError for non-integers
+        if record_id not in seen:
+            seen.add(record_id)
+            ids.append(record_id)
+    if not ids:
+        raise ValueError('no ids given')
+    if len(ids) > MAX_PAGE_SIZE:
+        raise ValueError(f'at most {MAX_PAGE_SIZE} ids per request')
+    return ids
+
+def encode_cursor(last_id):
+    """Opaque next-page token for keyset pagination."""
+    raw = json.dumps({'after': last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    padded = token + '=' * (-len(token) % 4)
+    return int(json.loads(base64.urlsafe_b64decode(padded))['after'])
+
+def parse_page_args(args):
+    """Reads limit/after/cursor query parameters. Returns (after_id, limit, error)."""
+    after_id = None
+    limit = None
+    try:
+        if args.get('cursor'):
+            after_id = decode_cursor(args['cursor'])
+        elif args.get('after') is not None:
+            after_id = int(args['after'])
+    except (ValueError, KeyError, TypeError):
+        return None, None, 'Invalid "cursor" or "after" parameter'
+
+    if args.get('limit') is not None:
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            return None, None, '"limit" must be an integer'
+        if limit < 1:
+            return None, None, '"limit" must be positive'
+        limit = min(limit, MAX_PAGE_SIZE)
+    elif after_id is not None:
+        limit = DEFAULT_PAGE_SIZE
+    return after_id, limit, None
+
+def add_filter_warning(response, unindexed):
+    """Tells the client which filter columns forced a full table scan."""
+    if unindexed:
+        response.headers['X-Filter-Unindexed'] = ','.join(unindexed)
+    return response
+
+def request_cache_key(table_name, record_id=None):
+    """Cache key for the current GET: table, record id and the normalized query string."""
+    args = tuple(sorted(request.args.items(multi=True)))
+    return response_cache.make_key(table_name, record_id, args)
+
+def cached_response(body):
+    response = Response(body, mimetype='application/json')
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+def store_response(table_name, cache_key, response):
+    """Stores a successful JSON response under `cache_key` (computed before the DB read)."""
+    if cache_key is not None and response.status_code == 200:
+        response_cache.set(table_name, cache_key, response.get_data())
+        response.headers['X-Cache'] = 'MISS'
+    return response
+
+def version_etag(table_name, record_id=None):
+    """ETag from the table's write version and the request, or None for content-hash tables."""
+    if table_name not in ETAG_VERSION_TABLES:
+        return None
+    args = tuple(sorted(request.args.items(multi=True)))
+    token = f"{table_name}|{response_cache.version(table_name)}|{record_id}|{args}"
+    return hashlib.sha1(token.encode()).hexdigest()
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def conditional(response, etag=None):
+    """Sets the ETag (the version one, or a hash of the body) and answers 304 if the client has it."""
+    if response.status_code != 200:
+        return response
+    if etag:
+        response.set_etag(etag)
+    else:
+        response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache' # Clients may keep it but must revalidate
+    return response.make_conditional(request)
+
+def rows_body(names, rows, limit=None):
+    """JSON body for row tuples: a plain list, or a page if `limit` is set.
+
+    `rows` may hold one extra row past `limit`; it only signals that a next page exists.
+    """
+    if limit is None:
+        body = json_codec.dump_rows(names, rows)
+    else:
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][names.index('id')])
+        body = b''.join([b'{"data":', json_codec.dump_rows(names, rows),
+                         b',"next_cursor":', json_codec.dumps(next_cursor), b'}'])
+    return body + b'\n'
+
+def rows_response(names, rows, limit=None):
+    return Response(rows_body(names, rows, limit), mimetype='application/json')
+
+def split_page(records, limit):
+    """(records, next_cursor) for records read with limit + 1: the extra one only marks a next page."""
+    if limit is not None and len(records) > limit:
+        records = records[:limit]
+        return records, encode_cursor(records[-1]['id'])
+    return records, None
+
+def multi_get_content(records, ids):
+    """?ids= response: the records in the requested order, and the ids that were not found."""
+    by_id = {record['id']: record for record in records}
+    return {
+        'data': [by_id[record_id] for record_id in ids if record_id in by_id],
+        'missing': [record_id for record_id in ids if record_id not in by_id],
+    }
+
+def encode_stream_batch(columns, rows, fmt, first):
+    """One batch of a streamed body: NDJSON lines, or array elements (the caller adds the brackets)."""
+    if fmt == 'ndjson':
+        return json_codec.dump_row_lines(columns, rows)
+    chunk = json_codec.dump_rows(columns, rows)[1:-1] # Batch without its brackets
+    return chunk if first else b',' + chunk
+
+def stream_response(stream, fmt):
+    """Wraps a RecordStream in a chunked response: NDJSON lines or one JSON array."""
+    columns = stream.columns
+
+    def ndjson():
+        for rows in stream.batches():
+            yield encode_stream_batch(columns, rows, 'ndjson', False)
+
+    def json_array():
+        yield b'['
+        first = True
+        for rows in stream.batches():
+            yield encode_stream_batch(columns, rows, 'json', first)
+            first = False
+        yield b']'
+
+    if fmt == 'ndjson':
+        response = Response(ndjson(), mimetype='application/x-ndjson')
+    else:
+        response = Response(json_array(), mimetype='application/json')
+    response.call_on_close(stream.close) # Releases the connection even if the body is never read
+    return response
+
 @app.route('/api/<string:table_name>', methods=['POST'])
 def api_create(table_name):
     """API Endpoint: Create a new record."""
@@ -157,13 +1270,24 @@ def api_create(table_name):
     data = request.get_json()
     if not data:
         return jsonify({'error': 'Invalid or missing JSON data in request body'}), 400
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object in request body (lists go to the bulk endpoint)'}), 400
+
+    # Reject bad payloads before opening a connection
+    data, invalid = validate_record(table_name, data)
+    if invalid:
+        return jsonify({'error': 'Invalid record', 'fields': invalid}), 400
 
     new_id, err = create_record(table_name, data)
 
     if err:
         # Check for specific errors if needed (e.g., duplicate entry)
         return jsonify({'error': f'Database error creating record: {err}'}), 500
+    response_cache.invalidate(table_name)
     if new_id is not None:
+        if not READ_AFTER_WRITE:
+            return jsonify(build_created_record(table_name, new_id, data)), 201 # Return 201 Created
+
         # Fetch the newly created record to return it
         created_record, fetch_err = read_records(table_name, record_id=new_id)
         if fetch_err:
@@ -178,19 +1302,132 @@ def api_create(table_name):
 
 @app.route('/api/<string:table_name>', methods=['GET'])
 def api_read_all(table_name):
-    """API Endpoint: Read all records (with optional filter)."""
+    """API Endpoint: Read all records (with optional filter).
+
+    Optional query parameters:
+        <column> -- structured filter, e.g. ?status=eq:pending&created_at=gte:2024-01-01
+                    (operators: eq, ne, gt, gte, lt, lte, like, in, isnull)
+        limit  -- page size; the response becomes {"data": [...], "next_cursor": ...}
+        after  -- only records with an id greater than this (keyset pagination)
+        cursor -- the next_cursor token returned by the previous page
+        stream -- 'ndjson' or 'json' to stream every matching row with flat memory use
+        fields -- comma-separated columns to return instead of all of them
+        ids    -- comma-separated ids to fetch in one query; the response becomes
+                  {"data": [...in the requested order...], "missing": [...]}
+        expand -- related rows to embed, e.g. order_items.menu_item,delivery_addresses
+    """
     allowed, error_response = validate_table_name(table_name)
     if not allowed:
         return error_response
 
-    # Basic filtering example (use with caution)
+    # Legacy free-form filter (use with caution, disabled by default)
     condition = request.args.get('where')
-    records, err = read_records(table_name, condition=condition)
+    if condition and not ALLOW_RAW_WHERE:
+        return jsonify({'error': 'The "where" parameter is disabled; filter with ?column=op:value instead'}), 400
+
+    after_id, limit, page_err = parse_page_args(request.args)
+    if page_err:
+        return jsonify({'error': page_err}), 400
+
+    try:
+        filter_sql, filter_params, filter_columns = compile_filters(table_name, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    filters = (filter_sql, filter_params)
+    columns, fields_err = parse_fields(table_name, request.args)
+    if fields_err:
+        return jsonify({'error': fields_err}), 400
+    expand, expand_err = parse_expand(table_name, request.args)
+    if expand_err:
+        return jsonify({'error': expand_err}), 400
+    columns = expand_columns(table_name, columns, expand)
+    unindexed = unindexed_filter_columns(table_name, filter_columns)
+    if unindexed:
+        log_unindexed_filter(table_name, unindexed)
+
+    ids = None
+    if request.args.get('ids') is not None:
+        try:
+            ids = parse_ids(request.args['ids'])
+        except ValueError as e:
+            return jsonify({'error': f'Invalid "ids" parameter: {e}'}), 400
+        if any(request.args.get(arg) for arg in ('limit', 'after', 'cursor', 'stream')):
+            return jsonify({'error': '"ids" cannot be combined with pagination or streaming'}), 400
+
+    stream_format = request.args.get('stream')
+    if stream_format:
+        if stream_format not in ('ndjson', 'json'):
+            return jsonify({'error': '"stream" must be "ndjson" or "json"'}), 400
+        if expand:
+            return jsonify({'error': '"expand" cannot be combined with streaming'}), 400
+        # An explicit ?limit caps the stream (uncapped by MAX_PAGE_SIZE); ?after alone streams to the end
+        stream_limit = int(request.args['limit']) if request.args.get('limit') is not None else None
+        stream, err = open_record_stream(table_name, condition=condition, after_id=after_id, filters=filters,
+                                         columns=columns, limit=stream_limit)
+        if err:
+            return jsonify({'error': f'Database error reading records: {err}'}), 500
+        return add_filter_warning(stream_response(stream, stream_format), unindexed)
+
+    # Version ETags are computed before reading, so a write racing this request
+    # can only make the next conditional request miss, never return stale data
+    # Expanded responses also depend on other tables' versions, so they skip the
+    # version ETag and the response cache (they still get a content ETag)
+    etag = version_etag(table_name) if not expand else None
+    if etag and request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    cache_key = None
+    if response_cache.enabled_for(table_name) and not expand:
+        cache_key = request_cache_key(table_name)
+        body = response_cache.get(table_name, cache_key)
+        if body is not None:
+            return add_filter_warning(conditional(cached_response(body), etag), unindexed)
+
+    if ids is not None:
+        # Multi-get: one IN (...) query instead of one request per id
+        id_sql, id_params = padded_id_filter(ids)
+        if filter_sql:
+            id_sql = f"{id_sql} AND {filter_sql}"
+        records, err = read_records(table_name, filters=(id_sql, id_params + filter_params), columns=columns)
+        if err:
+            return jsonify({'error': f'Database error reading records: {err}'}), 500
+        err = apply_expand(table_name, records, expand)
+        if err:
+            return jsonify({'error': f'Database error expanding records: {err}'}), 500
+        response = jsonify(multi_get_content(records, ids))
+        response = store_response(table_name, cache_key, response)
+        return add_filter_warning(conditional(response, etag), unindexed)
+
+    if not expand:
+        # Plain listing: serialize the row tuples directly, no dict per record
+        result, err = read_rows(table_name, condition=condition, after_id=after_id,
+                                limit=limit + 1 if limit is not None else None, filters=filters,
+                                columns=columns)
+        if err:
+            return jsonify({'error': f'Database error reading records: {err}'}), 500
+        names, rows = result
+        response = rows_response(names, rows, limit)
+        response = store_response(table_name, cache_key, response)
+        return add_filter_warning(conditional(response, etag), unindexed)
+
+    # Fetch one extra row to know whether there is a next page
+    records, err = read_records(table_name, condition=condition, after_id=after_id,
+                                limit=limit + 1 if limit is not None else None, filters=filters,
+                                columns=columns)
 
     if err:
         return jsonify({'error': f'Database error reading records: {err}'}), 500
     if records is not None:
-        return jsonify(records)
+        records, next_cursor = split_page(records, limit)
+        err = apply_expand(table_name, records, expand)
+        if err:
+            return jsonify({'error': f'Database error expanding records: {err}'}), 500
+
+        if limit is None:
+            response = store_response(table_name, cache_key, jsonify(records))
+            return add_filter_warning(conditional(response, etag), unindexed)
+        response = store_response(table_name, cache_key, jsonify({'data': records, 'next_cursor': next_cursor}))
+        return add_filter_warning(conditional(response, etag), unindexed)
     else:
          # This case might indicate the db connection failed initially in read_records
         return jsonify({'error': 'Failed to retrieve records'}), 500
@@ -198,19 +1435,46 @@ def api_read_all(table_name):
 
 @app.route('/api/<string:table_name>/<int:record_id>', methods=['GET'])
 def api_read_one(table_name, record_id):
-    """API Endpoint: Read a specific record by ID."""
+    """API Endpoint: Read a specific record by ID.
+
+    Optional query parameters: fields (columns to return) and expand (related
+    rows to embed, e.g. ?expand=order_items.menu_item,delivery_addresses).
+    """
     allowed, error_response = validate_table_name(table_name)
     if not allowed:
         return error_response
 
-    records, err = read_records(table_name, record_id=record_id)
+    columns, fields_err = parse_fields(table_name, request.args)
+    if fields_err:
+        return jsonify({'error': fields_err}), 400
+    expand, expand_err = parse_expand(table_name, request.args)
+    if expand_err:
+        return jsonify({'error': expand_err}), 400
+    columns = expand_columns(table_name, columns, expand)
+
+    etag = version_etag(table_name, record_id) if not expand else None
+    if etag and request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    cache_key = None
+    if response_cache.enabled_for(table_name) and not expand:
+        cache_key = request_cache_key(table_name, record_id)
+        body = response_cache.get(table_name, cache_key)
+        if body is not None:
+            return conditional(cached_response(body), etag)
+
+    records, err = read_records(table_name, record_id=record_id, columns=columns)
 
     if err:
         return jsonify({'error': f'Database error reading record: {err}'}), 500
 
     if records is not None:
         if records:
-            return jsonify(records[0]) # Return the single record found
+            err = apply_expand(table_name, records, expand)
+            if err:
+                return jsonify({'error': f'Database error expanding record: {err}'}), 500
+            response = store_response(table_name, cache_key, jsonify(records[0]))
+            return conditional(response, etag) # Return the single record found
         else:
             return jsonify({'error': f'Record with ID {record_id} not found in {table_name}'}), 404
     else:
@@ -227,14 +1491,24 @@ def api_update(table_name, record_id):
     data = request.get_json()
     if not data:
         return jsonify({'error': 'Invalid or missing JSON data in request body'}), 400
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object in request body (lists go to the bulk endpoint)'}), 400
+
+    data, invalid = validate_record(table_name, data, partial=True)
+    if invalid:
+        return jsonify({'error': 'Invalid record', 'fields': invalid}), 400
 
     rows_affected, err = update_record(table_name, record_id, data)
 
     if err:
         return jsonify({'error': f'Database error updating record: {err}'}), 500
+    response_cache.invalidate(table_name)
 
     if rows_affected is not None:
         if rows_affected > 0:
+            if not READ_AFTER_WRITE:
+                return jsonify({**data, 'id': record_id}), 200 # OK, only the submitted fields
+
              # Fetch the updated record to return it
             updated_record, fetch_err = read_records(table_name, record_id=record_id)
             if fetch_err:
@@ -245,13 +1519,9 @@ def api_update(table_name, record_id):
                  # Should not happen if rows_affected > 0 but record now missing
                  return jsonify({'message': f'Record {record_id} updated, but could not be found immediately.'}), 200
         else:
-            # Check if the record actually exists before saying "not found"
-            existing_record, _ = read_records(table_name, record_id=record_id)
-            if not existing_record:
-                 return jsonify({'error': f'Record with ID {record_id} not found in {table_name}'}), 404
-            else:
-                 # Record exists, but nothing was changed (e.g., same data sent)
-                 return jsonify(existing_record[0]), 200 # Or maybe 304 Not Modified? 200 is simpler.
+            # The connection uses FOUND_ROWS, so 0 means no row matched the id
+            # (sending the same data again still counts as 1)
+            return jsonify({'error': f'Record with ID {record_id} not found in {table_name}'}), 404
     else:
         return jsonify({'error': 'Failed to update record'}), 500
 
@@ -263,16 +1533,18 @@ def api_delete(table_name, record_id):
     if not allowed:
         return error_response
 
-    # Optional: Check if record exists before deleting
-    existing_record, _ = read_records(table_name, record_id=record_id)
-    if not existing_record:
-        return jsonify({'error': f'Record with ID {record_id} not found in {table_name}'}), 404
+    # Optional: Check if record exists before deleting (rowcount below already tells us)
+    if DELETE_PRECHECK:
+        existing_record, _ = read_records(table_name, record_id=record_id)
+        if not existing_record:
+            return jsonify({'error': f'Record with ID {record_id} not found in {table_name}'}), 404
 
     rows_affected, err = delete_record(table_name, record_id)
 
     if err:
          # Check for foreign key constraints if needed
         return jsonify({'error': f'Database error deleting record: {err}'}), 500
+    response_cache.invalidate(table_name)
 
     if rows_affected is not None:
         if rows_affected > 0:
@@ -280,15 +1552,223 @@ def api_delete(table_name, record_id):
             # return '', 204 # No Content is common for DELETE
             return jsonify({'message': f'Record {record_id} from {table_name} deleted successfully.'}), 200 # OK
         else:
-            # Should have been caught by the check above, but handle just in case
-             return jsonify({'error': f'Record with ID {record_id} not found in {table_name} (delete failed)'}), 404
+            # Nothing was deleted: the record does not exist
+            return jsonify({'error': f'Record with ID {record_id} not found in {table_name}'}), 404
     else:
         return jsonify({'error': 'Failed to delete record'}), 500
 
 
+# --- Bulk API Endpoints ---
+
+def parse_bulk_args(args):
+    """Reads chunk_size/atomic query parameters. Returns (chunk_size, atomic, error)."""
+    try:
+        chunk_size = int(args.get('chunk_size', BULK_CHUNK_SIZE))
+    except ValueError:
+        return None, None, '"chunk_size" must be an integer'
+    if chunk_size < 1:
+        return None, None, '"chunk_size" must be positive'
+    atomic = args.get('atomic', 'true').lower() not in ('false', '0', 'no')
+    return chunk_size, atomic, None
+
+def get_bulk_rows(data, key):
+    """Accepts either a JSON list or an object like {"records": [...]}."""
+    if isinstance(data, dict):
+        data = data.get(key)
+    if not isinstance(data, list) or not data:
+        return None, f'Expected a non-empty JSON list (or {{"{key}": [...]}}) in request body'
+    if len(data) > BULK_MAX_ROWS:
+        return None, f'At most {BULK_MAX_ROWS} rows per request'
+    return data, None
+
+def validate_rows(table_name, rows, partial=False):
+    """validate_record() for every row. Returns (coerced_rows, per-row errors)."""
+    clean_rows = []
+    invalid = []
+    for index, row in enumerate(rows):
+        clean, errors = validate_record(table_name, row, partial=partial)
+        clean_rows.append(clean)
+        if errors:
+            invalid.append({'index': index, 'status': 'error', 'fields': errors})
+    return clean_rows, invalid
+
+def bulk_response(report, success_status):
+    """200/201 if every row succeeded, 207 if some failed but the rest were committed,
+    400 if a failure rolled back the whole batch."""
+    failed = any(r['status'] != success_status for r in report['results'])
+    if not report['committed']:
+        return jsonify(report), 400
+    if failed:
+        return jsonify(report), 207
+    return jsonify(report), 201 if success_status == 'created' else 200
+
+@app.route('/api/<string:table_name>/bulk', methods=['POST'])
+def api_bulk_create(table_name):
+    """API Endpoint: Create many records in one transaction."""
+    allowed, error_response = validate_table_name(table_name)
+    if not allowed:
+        return error_response
+
+    chunk_size, atomic, arg_err = parse_bulk_args(request.args)
+    if arg_err:
+        return jsonify({'error': arg_err}), 400
+    rows, body_err = get_bulk_rows(request.get_json(silent=True), 'records')
+    if body_err:
+        return jsonify({'error': body_err}), 400
+    if not all(isinstance(row, dict) and row for row in rows):
+        return jsonify({'error': 'Every record must be a non-empty JSON object'}), 400
+    rows, invalid = validate_rows(table_name, rows)
+    if invalid:
+        return jsonify({'error': 'Invalid records', 'results': invalid}), 400
+
+    report, err = bulk_create_records(table_name, rows, chunk_size=chunk_size, atomic=atomic)
+    if err:
+        return jsonify({'error': f'Database error creating records: {err}'}), 500
+    if report['committed']:
+        response_cache.invalidate(table_name)
+    return bulk_response(report, 'created')
+
+@app.route('/api/<string:table_name>/bulk', methods=['PUT', 'PATCH'])
+def api_bulk_update(table_name):
+    """API Endpoint: Update many records (each object must contain its "id")."""
+    allowed, error_response = validate_table_name(table_name)
+    if not allowed:
+        return error_response
+
+    chunk_size, atomic, arg_err = parse_bulk_args(request.args)
+    if arg_err:
+        return jsonify({'error': arg_err}), 400
+    rows, body_err = get_bulk_rows(request.get_json(silent=True), 'records')
+    if body_err:
+        return jsonify({'error': body_err}), 400
+    if not all(isinstance(row, dict) and isinstance(row.get('id'), int) and len(row) > 1 for row in rows):
+        return jsonify({'error': 'Every record must be a JSON object with an integer "id" and at least one field'}), 400
+    rows, invalid = validate_rows(table_name, rows, partial=True)
+    if invalid:
+        return jsonify({'error': 'Invalid records', 'results': invalid}), 400
+
+    report, err = bulk_update_records(table_name, rows, chunk_size=chunk_size, atomic=atomic)
+    if err:
+        return jsonify({'error': f'Database error updating records: {err}'}), 500
+    if report['committed']:
+        response_cache.invalidate(table_name)
+    return bulk_response(report, 'updated')
+
+@app.route('/api/<string:table_name>/bulk', methods=['DELETE'])
+def api_bulk_delete(table_name):
+    """API Endpoint: Delete many records, body: {"ids": [1, 2, 3]}."""
+    allowed, error_response = validate_table_name(table_name)
+    if not allowed:
+        return error_response
+
+    chunk_size, atomic, arg_err = parse_bulk_args(request.args)
+    if arg_err:
+        return jsonify({'error': arg_err}), 400
+    ids, body_err = get_bulk_rows(request.get_json(silent=True), 'ids')
+    if body_err:
+        return jsonify({'error': body_err}), 400
+    if not all(isinstance(record_id, int) for record_id in ids):
+        return jsonify({'error': 'Ids must be integers'}), 400
+
+    report, err = bulk_delete_records(table_name, ids, chunk_size=chunk_size, atomic=atomic)
+    if err:
+        return jsonify({'error': f'Database error deleting records: {err}'}), 500
+    if report['committed']:
+        response_cache.invalidate(table_name)
+    return bulk_response(report, 'deleted')
+
+
+# --- Cache Statistics ---
+
+@app.route('/api/_cache/stats', methods=['GET'])
+def api_cache_stats():
+    """API Endpoint: Response cache hit/miss/invalidation (= table version) counters per table."""
+    return jsonify({
+        'backend': CACHE_BACKEND,
+        'ttls': {table: response_cache.ttl(table) for table in sorted(ALLOWED_TABLES)},
+        'tables': response_cache.stats(),
+    })
+
+
+# --- Instrumentation ---
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Per-route latency and payload size; routes are labelled by their rule, not the raw path."""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+        size = response.calculate_content_length() # None for streamed bodies
+        if size is not None:
+            RESPONSE_BYTES.observe(size, request.method, route)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def api_metrics():
+    """Prometheus scrape endpoint."""
+    if not METRICS_ENDPOINT:
+        return jsonify({'error': 'Not found'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/_metrics/slow_queries', methods=['GET'])
+def api_slow_queries():
+    """API Endpoint: Most recent slow statements (shape and parameter types only, no values)."""
+    if not METRICS_ENDPOINT:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify({'threshold_seconds': SLOW_QUERY_SECONDS, 'queries': slow_queries.recent()})
+
+
+# --- Response Compression ---
+# Registered after the metrics hook so it runs first (Flask runs after_request
+# hooks in reverse order) and api_response_bytes reports the compressed size.
+
+def weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+@app.after_request
+def compress_response(response):
+    """Compresses JSON bodies with the best encoding the client accepts."""
+    if COMPRESSION_ENCODINGS and response.status_code == 304:
+        # 304s only come from the JSON read endpoints: same Vary and validator as their 200
+        response.vary.add('Accept-Encoding')
+        if compression.negotiate(request.headers.get('Accept-Encoding'), COMPRESSION_ENCODINGS):
+            weaken_etag(response)
+        return response
+    if (not COMPRESSION_ENCODINGS or response.status_code != 200
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = compression.negotiate(request.headers.get('Accept-Encoding'), COMPRESSION_ENCODINGS)
+    if encoding is None:
+        return response
+
+    # The compressed bytes differ from the identity ones, so the validator becomes weak;
+    # If-None-Match still matches it (the read endpoints compare weakly). Small bodies get
+    # the weak one too, so a 304 (which has no body to measure) can send the same validator.
+    weaken_etag(response)
+    if response.is_streamed:
+        response.response = compression.compress_chunks(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESSION_MIN_BYTES:
+            return response
+        response.set_data(compression.compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
 # --- Main Execution ---
 if __name__ == '__main__':
     # Set debug=False for production!
     # host='0.0.0.0' makes the server accessible from your network, not just localhost.
     print("Starting Flask API server...")
+    schema_cache.refresh() # Load table schemas up front instead of on the first request
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,885 @@
+"""Async (ASGI) version of the generic table API in api.py.
+
+Same /api/<table_name> routes, ALLOWED_TABLES contract and response bodies as
+the Flask app, but built on FastAPI + aiomysql so one worker process can keep
+hundreds of slow queries in flight without a thread per request.
+
+Run with:  uvicorn api_async:app --host 0.0.0.0 --port 5000 --workers 4
+
+Everything that is not I/O comes from api.py: SQL building, filters,
+pagination tokens, schema validation, the bulk and expand plans, body
+encoding, the response cache, ETags and the metrics registry. This module
+only runs the statements (with the same query metrics) and speaks ASGI,
+including the response compression and request metrics api.py does in its
+after_request hooks. Both apps can run side by side against the same cache
+backend.
+"""
+import asyncio
+import contextlib
+import hashlib
+import time
+
+import aiomysql
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from pymysql.constants import CLIENT
+from starlette.background import BackgroundTask
+from starlette.datastructures import MutableHeaders
+
+import api
+import compression
+from api import (
+    ALLOWED_TABLES, ALLOW_RAW_WHERE, BULK_CHUNK_SIZE, CACHE_BACKEND, COMPRESSIBLE_MIMETYPES,
+    COMPRESSION_ENCODINGS, COMPRESSION_MIN_BYTES, DELETE_PRECHECK, ETAG_VERSION_TABLES, METRICS_ENDPOINT,
+    READ_AFTER_WRITE, REQUEST_SECONDS, RESPONSE_BYTES, SLOW_QUERY_SECONDS, STREAM_BATCH_SIZE, StepFailed,
+    build_created_record, build_delete, build_insert, build_select, build_update, bulk_create_plan,
+    bulk_delete_plan, bulk_update_plan, chunked, compile_filters, encode_stream_batch, expand_columns,
+    expand_plan, get_bulk_rows, log_unindexed_filter, metrics, multi_get_content, padded_id_filter,
+    parse_bulk_args, parse_expand, parse_fields, parse_ids, parse_page_args, response_cache, rows_body,
+    schema_cache, settle_bulk, split_page, unindexed_filter_columns, validate_record, validate_rows,
+)
+from storage import (
+    AUTOINC_SETTINGS_QUERY, DB_ERRORS, DB_POOL_WAIT_SECONDS, DB_ROWS, consecutive_autoinc, record_statement,
+    register_pool, slow_queries,
+)
+
+# --- Database Pool ---
+# Same credentials and pool settings as api.py (MySQL only: the storage layer's
+# SQLite dialect is synchronous). Connections run in autocommit
+# mode (aiomysql closes pooled connections that are returned mid-transaction);
+# the bulk endpoints open explicit transactions.
+
+class AsyncDatabase:
+    """aiomysql pool with a wait timeout on checkout, reported in api_db_pool_connections."""
+
+    def __init__(self, config, pool_settings, name='api_async'):
+        self.config = config
+        self.pool_settings = pool_settings
+        self.name = name
+        self.pool = None
+        register_pool(self)
+
+    async def start(self):
+        self.pool = await aiomysql.create_pool(
+            minsize=1,
+            maxsize=self.pool_settings['size'],
+            pool_recycle=int(self.pool_settings['max_lifetime']),
+            autocommit=True,
+            client_flag=CLIENT.FOUND_ROWS,  # UPDATE rowcount = matched rows, like api.py
+            host=self.config['host'],
+            user=self.config['user'],
+            password=self.config['password'],
+            db=self.config['database'],
+        )
+
+    async def stop(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+
+    async def acquire(self):
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(self.pool.acquire(), self.pool_settings['wait_timeout'])
+        except asyncio.TimeoutError:
+            raise aiomysql.OperationalError(
+                f"No database connection available after {self.pool_settings['wait_timeout']}s "
+                f"(pool size {self.pool_settings['size']})")
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.monotonic() - started)
+
+    def occupancy(self):
+        if self.pool is None:
+            return {}
+        return {('open',): self.pool.size, ('idle',): self.pool.freesize}
+
+    def release(self, conn, reusable=True):
+        if not reusable:
+            conn.close()  # e.g. unread streamed rows; the pool drops closed connections
+        self.pool.release(conn)
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+if api.DB_BACKEND != 'mysql':
+    raise RuntimeError(f"api_async requires DB_BACKEND=mysql, not {api.DB_BACKEND!r}")
+db = AsyncDatabase(api.db_config, api.pool_config)
+
+async def schema_refresher():
+    """Keeps the shared schema cache fresh from a worker thread (its loader is synchronous)."""
+    while True:
+        await asyncio.sleep(max(1.0, schema_cache.seconds_until_refresh()))
+        await asyncio.to_thread(schema_cache.refresh)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await db.start()
+    schema_cache.auto_refresh = False  # Never load schemas on the event loop
+    await asyncio.to_thread(schema_cache.refresh)
+    refresher = asyncio.create_task(schema_refresher())
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        await db.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# --- Database CRUD Helper Functions ---
+# Same (result, error) convention and statements as api.py.
+
+async def execute(cursor, table_name, operation, query, params=None, many=False):
+    """Async twin of storage.execute(): records the query time, errors and slow statements."""
+    started = time.perf_counter()
+    try:
+        if many:
+            await cursor.executemany(query, params)
+        else:
+            await cursor.execute(query, params)
+    except Exception:
+        DB_ERRORS.inc(table_name, operation)
+        raise
+    finally:
+        record_statement(table_name, operation, query, params, time.perf_counter() - started, many)
+
+def column_names(cursor):
+    return tuple(column[0] for column in cursor.description or ())
+
+async def create_record(table_name, data):
+    try:
+        async with db.connection() as conn, conn.cursor() as cursor:
+            await execute(cursor, table_name, 'insert', build_insert(table_name, list(data)), list(data.values()))
+            return cursor.lastrowid, None
+    except aiomysql.MySQLError as err:
+        print(f"Error creating record in {table_name}: {err}")
+        return None, str(err)
+
+async def read_rows(table_name, record_id=None, condition=None, after_id=None, limit=None, filters=None,
+                    columns=None):
+    """Same query as api.read_rows(), returned as ((column names), [row tuples])."""
+    try:
+        async with db.connection() as conn, conn.cursor() as cursor:
+            query, params = build_select(table_name, record_id, condition, after_id, limit, filters, columns)
+            await execute(cursor, table_name, 'select', query, params)
+            rows = await cursor.fetchall()
+            DB_ROWS.observe(len(rows), table_name)
+            return (column_names(cursor), rows), None
+    except aiomysql.MySQLError as err:
+        print(f"Error reading records from {table_name}: {err}")
+        return None, str(err)
+
+async def read_records(table_name, record_id=None, condition=None, after_id=None, limit=None, filters=None,
+                       columns=None):
+    result, err = await read_rows(table_name, record_id, condition, after_id, limit, filters, columns)
+    if err:
+        return None, err
+    names, rows = result
+    return [dict(zip(names, row)) for row in rows], None
+
+async def update_record(table_name, record_id, data):
+    try:
+        async with db.connection() as conn, conn.cursor() as cursor:
+            await execute(cursor, table_name, 'update', build_update(table_name, list(data)),
+                          list(data.values()) + [record_id])
+            return cursor.rowcount, None
+    except aiomysql.MySQLError as err:
+        print(f"Error updating record in {table_name} (ID {record_id}): {err}")
+        return None, str(err)
+
+async def delete_record(table_name, record_id):
+    try:
+        async with db.connection() as conn, conn.cursor() as cursor:
+            await execute(cursor, table_name, 'delete', build_delete(table_name), (record_id,))
+            return cursor.rowcount, None
+    except aiomysql.MySQLError as err:
+        print(f"Error deleting record from {table_name} (ID {record_id}): {err}")
+        return None, str(err)
+
+async def fetch_where_in(conn, table_name, column, values):
+    records = []
+    async with conn.cursor(aiomysql.DictCursor) as cursor:
+        for chunk in chunked(list(values), BULK_CHUNK_SIZE):
+            sql = f"`{column}` IN ({', '.join(['%s'] * len(chunk))})"
+            query, params = build_select(table_name, filters=(sql, chunk))
+            await execute(cursor, table_name, 'select', query, params)
+            records.extend(await cursor.fetchall())
+    DB_ROWS.observe(len(records), table_name)
+    return records
+
+async def expand_records(conn, table_name, records, tree):
+    """Runs api.expand_plan() with one batched query per relation and level."""
+    plan = expand_plan(table_name, records, tree)
+    try:
+        lookup = next(plan)
+        while True:
+            lookup = plan.send(await fetch_where_in(conn, *lookup))
+    except StopIteration:
+        pass
+
+async def apply_expand(table_name, records, tree):
+    if not tree or not records:
+        return None
+    try:
+        async with db.connection() as conn:
+            await expand_records(conn, table_name, records, tree)
+        return None
+    except aiomysql.MySQLError as err:
+        print(f"Error expanding relations of {table_name}: {err}")
+        return str(err)
+
+# --- Bulk Helper Functions ---
+# Runs api.py's bulk plans: one connection, one explicit transaction, a
+# savepoint per write step; failed writes are thrown back into the plan.
+
+async def run_in_savepoint(cursor, action):
+    await cursor.execute("SAVEPOINT bulk_step")
+    try:
+        result = await action()
+    except aiomysql.MySQLError:
+        await cursor.execute("ROLLBACK TO SAVEPOINT bulk_step")
+        raise
+    await cursor.execute("RELEASE SAVEPOINT bulk_step")
+    return result
+
+async def write_rows(cursor, table_name, operation, query, params, many):
+    """Runs a write and returns its lastrowid, read before RELEASE SAVEPOINT resets it."""
+    await execute(cursor, table_name, operation, query, params, many=many)
+    return cursor.lastrowid
+
+async def run_bulk_plan(cursor, table_name, plan):
+    """Async twin of api.run_bulk_plan()."""
+    try:
+        step = next(plan)
+        while True:
+            operation, query, params, many = step
+            if operation == 'select':
+                await execute(cursor, table_name, 'select', query, params)
+                step = plan.send(await cursor.fetchall())
+                continue
+            try:
+                row_id = await run_in_savepoint(cursor, lambda: write_rows(cursor, table_name, *step))
+            except aiomysql.MySQLError as err:
+                step = plan.throw(StepFailed(str(err)))
+            else:
+                step = plan.send(row_id)
+    except StopIteration as done:
+        return done.value
+
+async def run_bulk(table_name, verb, plan, atomic, read_back=None):
+    """Async twin of api.run_bulk(): returns ({'committed', 'results'[, 'records']}, err)."""
+    try:
+        async with db.connection() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cursor:
+                    results = await run_bulk_plan(cursor, table_name, plan)
+                committed = settle_bulk(results, atomic)
+                if committed:
+                    await conn.commit()
+                else:
+                    await conn.rollback()
+                report = {'committed': committed, 'results': results}
+                if read_back:
+                    ids = [r['id'] for r in results if r['status'] == read_back]
+                    report['records'] = await fetch_where_in(conn, table_name, 'id', ids) if committed and ids else []
+                return report, None
+            finally:
+                if conn.get_transaction_status():
+                    await conn.rollback()
+    except aiomysql.MySQLError as err:
+        print(f"Error bulk {verb} records in {table_name}: {err}")
+        return None, str(err)
+
+insert_id_settings = {'consecutive': None}
+
+async def insert_ids_are_consecutive():
+    """Async twin of api.insert_ids_are_consecutive()."""
+    if insert_id_settings['consecutive'] is None:
+        try:
+            async with db.connection() as conn, conn.cursor() as cursor:
+                await cursor.execute(AUTOINC_SETTINGS_QUERY)
+                insert_id_settings['consecutive'] = consecutive_autoinc(*await cursor.fetchone())
+        except aiomysql.MySQLError as err:
+            print(f"Error reading the auto-increment settings: {err}")
+            return False
+        if not insert_id_settings['consecutive']:
+            print("Auto-increment ids of a multi-row INSERT may not be consecutive "
+                  "(innodb_autoinc_lock_mode 2?): bulk creates insert rows one at a time")
+    return insert_id_settings['consecutive']
+
+async def bulk_create_records(table_name, rows, chunk_size=BULK_CHUNK_SIZE, atomic=True):
+    plan = bulk_create_plan(table_name, rows, chunk_size, await insert_ids_are_consecutive())
+    return await run_bulk(table_name, 'creating', plan, atomic, 'created')
+
+async def bulk_update_records(table_name, rows, chunk_size=BULK_CHUNK_SIZE, atomic=True):
+    return await run_bulk(table_name, 'updating', bulk_update_plan(table_name, rows, chunk_size), atomic, 'updated')
+
+async def bulk_delete_records(table_name, ids, chunk_size=BULK_CHUNK_SIZE, atomic=True):
+    return await run_bulk(table_name, 'deleting', bulk_delete_plan(table_name, ids, chunk_size), atomic)
+
+# --- Responses ---
+# Bodies are encoded exactly like Flask's jsonify (same JSON provider, compact
+# separators, trailing newline), so clients see identical bytes and ETags.
+
+def json_body(content):
+    return (api.app.json.dumps(content, separators=(',', ':')) + '\n').encode()
+
+def json_response(content, status_code=200, headers=None):
+    return Response(json_body(content), status_code=status_code, media_type='application/json', headers=headers)
+
+def error(message, status_code):
+    return json_response({'error': message}, status_code)
+
+def forbidden_table(table_name):
+    if table_name not in ALLOWED_TABLES:
+        return error(f'Access to table "{table_name}" is forbidden', 403)
+    return None
+
+async def get_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def normalized_args(request):
+    return tuple(sorted(request.query_params.multi_items()))
+
+def version_etag(request, table_name, record_id=None):
+    """Same ETag as api.version_etag() for the same table version and query string."""
+    if table_name not in ETAG_VERSION_TABLES:
+        return None
+    token = f"{table_name}|{response_cache.version(table_name)}|{record_id}|{normalized_args(request)}"
+    return hashlib.sha1(token.encode()).hexdigest()
+
+def etag_matches(request, etag):
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/').strip('"') == etag:
+            return True
+    return False
+
+def not_modified(etag):
+    return Response(status_code=304, headers={'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'})
+
+def conditional(request, body, etag=None, headers=None):
+    """200 with ETag (version or body hash), or 304 if the client already has it."""
+    etag = etag or hashlib.sha1(body).hexdigest()
+    headers = dict(headers or {})
+    headers['ETag'] = f'"{etag}"'
+    headers['Cache-Control'] = 'no-cache'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+def read_headers(unindexed, cache_status=None):
+    headers = {}
+    if unindexed:
+        headers['X-Filter-Unindexed'] = ','.join(unindexed)
+    if cache_status:
+        headers['X-Cache'] = cache_status
+    return headers
+
+def finish_read(request, table_name, cache_key, content, etag, unindexed):
+    return finish_body(request, table_name, cache_key, json_body(content), etag, unindexed)
+
+def finish_body(request, table_name, cache_key, body, etag, unindexed):
+    cache_status = None
+    if cache_key is not None:
+        response_cache.set(table_name, cache_key, body)
+        cache_status = 'MISS'
+    return conditional(request, body, etag, read_headers(unindexed, cache_status))
+
+async def stream_records(table_name, fmt, condition, after_id, filters, columns, limit=None):
+    """Streams rows from an unbuffered cursor; returns (response, error)."""
+    try:
+        conn = await db.acquire()
+    except aiomysql.MySQLError as err:
+        return None, str(err)
+
+    state = {'exhausted': False, 'released': False}
+
+    def release():
+        if not state['released']:
+            state['released'] = True
+            db.release(conn, reusable=state['exhausted'])
+
+    try:
+        cursor = await conn.cursor(aiomysql.SSCursor)
+        query, params = build_select(table_name, condition=condition, after_id=after_id, limit=limit,
+                                     filters=filters, columns=columns)
+        if after_id is None and limit is None:
+            query += " ORDER BY `id`"
+        await execute(cursor, table_name, 'select', query, params)
+    except aiomysql.MySQLError as err:
+        print(f"Error streaming records from {table_name}: {err}")
+        release()
+        return None, str(err)
+
+    names = column_names(cursor)
+
+    async def batches():
+        count = 0
+        try:
+            while True:
+                rows = await cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    await cursor.close()
+                    state['exhausted'] = True
+                    return
+                count += len(rows)
+                yield rows
+        except aiomysql.MySQLError as err:
+            print(f"Error streaming records: {err}")
+            raise  # Aborts the response instead of closing the array over missing rows
+        finally:
+            DB_ROWS.observe(count, table_name)
+            release()
+
+    async def ndjson():
+        async for rows in batches():
+            yield encode_stream_batch(names, rows, 'ndjson', False)
+
+    async def json_array():
+        yield b'['
+        first = True
+        async for rows in batches():
+            yield encode_stream_batch(names, rows, 'json', first)
+            first = False
+        yield b']'
+
+    body, media_type = (ndjson(), 'application/x-ndjson') if fmt == 'ndjson' else (json_array(), 'application/json')
+    # The background task releases the connection even if the body is never read
+    return StreamingResponse(body, media_type=media_type, background=BackgroundTask(release)), None
+
+# --- API Endpoints ---
+# Bulk routes are registered first so "bulk" is never parsed as a record id.
+
+def bulk_response(report, success_status):
+    failed = any(r['status'] != success_status for r in report['results'])
+    if not report['committed']:
+        return json_response(report, 400)
+    if failed:
+        return json_response(report, 207)
+    return json_response(report, 201 if success_status == 'created' else 200)
+
+@app.post('/api/{table_name}/bulk')
+async def api_bulk_create(table_name: str, request: Request):
+    """API Endpoint: Create many records in one transaction."""
+    if (denied := forbidden_table(table_name)) is not None:
+        return denied
+    chunk_size, atomic, arg_err = parse_bulk_args(request.query_params)
+    if arg_err:
+        return error(arg_err, 400)
+    rows, body_err = get_bulk_rows(await get_json(request), 'records')
+    if body_err:
+        return error(body_err, 400)
+    if not all(isinstance(row, dict) and row for row in rows):
+        return error('Every record must be a non-empty JSON object', 400)
+    rows, invalid = validate_rows(table_name, rows)
+    if invalid:
+        return json_response({'error': 'Invalid records', 'results': invalid}, 400)
+
+    report, err = await bulk_create_records(table_name, rows, chunk_size=chunk_size, atomic=atomic)
+    if err:
+        return error(f'Database error creating records: {err}', 500)
+    if report['committed']:
+        response_cache.invalidate(table_name)
+    return bulk_response(report, 'created')
+
+@app.api_route('/api/{table_name}/bulk', methods=['PUT', 'PATCH'])
+async def api_bulk_update(table_name: str, request: Request):
+    """API Endpoint: Update many records (each object must contain its "id")."""
+    if (denied := forbidden_table(table_name)) is not None:
+        return denied
+    chunk_size, atomic, arg_err = parse_bulk_args(request.query_params)
+    if arg_err:
+        return error(arg_err, 400)
+    rows, body_err = get_bulk_rows(await get_json(request), 'records')
+    if body_err:
+        return error(body_err, 400)
+    if not all(isinstance(row, dict) and isinstance(row.get('id'), int) and len(row) > 1 for row in rows):
+        return error('Every record must be a JSON object with an integer "id" and at least one field', 400)
+    rows, invalid = validate_rows(table_name, rows, partial=True)
+    if invalid:
+        return json_response({'error': 'Invalid records', 'results': invalid}, 400)
+
+    report, err = await bulk_update_records(table_name, rows, chunk_size=chunk_size, atomic=atomic)
+    if err:
+        return error(f'Database error updating records: {err}', 500)
+    if report['committed']:
+        response_cache.invalidate(table_name)
+    return bulk_response(report, 'updated')
+
+@app.delete('/api/{table_name}/bulk')
+async def api_bulk_delete(table_name: str, request: Request):
+    """API Endpoint: Delete many records, body: {"ids": [1, 2, 3]}."""
+    if (denied := forbidden_table(table_name)) is not None:
+        return denied
+    chunk_size, atomic, arg_err = parse_bulk_args(request.query_params)
+    if arg_err:
+        return error(arg_err, 400)
+    ids, body_err = get_bulk_rows(await get_json(request), 'ids')
+    if body_err:
+        return error(body_err, 400)
+    if not all(isinstance(record_id, int) for record_id in ids):
+        return error('Ids must be integers', 400)
+
+    report, err = await bulk_delete_records(table_name, ids, chunk_size=chunk_size, atomic=atomic)
+    if err:
+        return error(f'Database error deleting records: {err}', 500)
+    if report['committed']:
+        response_cache.invalidate(table_name)
+    return bulk_response(report, 'deleted')
+
+@app.get('/api/_cache/stats')
+async def api_cache_stats():
+    """API Endpoint: Response cache hit/miss/invalidation (= table version) counters per table."""
+    return json_response({
+        'backend': CACHE_BACKEND,
+        'ttls': {table: response_cache.ttl(table) for table in sorted(ALLOWED_TABLES)},
+        'tables': response_cache.stats(),
+    })
+
+@app.get('/metrics')
+async def api_metrics():
+    """Prometheus scrape endpoint (same registry and metrics as api.py)."""
+    if not METRICS_ENDPOINT:
+        return error('Not found', 404)
+    return Response(metrics.render(), media_type='text/plain; version=0.0.4')
+
+@app.get('/api/_metrics/slow_queries')
+async def api_slow_queries():
+    """API Endpoint: Most recent slow statements (shape and parameter types only, no values)."""
+    if not METRICS_ENDPOINT:
+        return error('Not found', 404)
+    return json_response({'threshold_seconds': SLOW_QUERY_SECONDS, 'queries': slow_queries.recent()})
+
+@app.post('/api/{table_name}')
+async def api_create(table_name: str, request: Request):
+    """API Endpoint: Create a new record."""
+    if (denied := forbidden_table(table_name)) is not None:
+        return denied
+    data = await get_json(request)
+    if not data:
+        return error('Invalid or missing JSON data in request body', 400)
+    if not isinstance(data, dict):
+        return error('Expected a JSON object in request body (lists go to the bulk endpoint)', 400)
+    data, invalid = validate_record(table_name, data)
+    if invalid:
+        return json_response({'error': 'Invalid record', 'fields': invalid}, 400)
+
+    new_id, err = await create_record(table_name, data)
+    if err:
+        return error(f'Database error creating record: {err}', 500)
+    response_cache.invalidate(table_name)
+    if new_id is None:
+        return error('Failed to create record for an unknown reason', 500)
+    if not READ_AFTER_WRITE:
+        return json_response(build_created_record(table_name, new_id, data), 201)
+
+    created_record, fetch_err = await read_records(table_name, record_id=new_id)
+    if fetch_err:
+        return json_response({'id': new_id, 'message': 'Record created, but failed to fetch details.'}, 201)
+    if created_record:
+        return json_response(created_record[0], 201)
+    return json_response({'id': new_id, 'message': 'Record created, but could not be found immediately.'}, 201)
+
+@app.get('/api/{table_name}')
+async def api_read_all(table_name: str, request: Request):
+    """API Endpoint: Read all records. Same query parameters as api.api_read_all()."""
+    if (denied := forbidden_table(table_name)) is not None:
+        return denied
+    args = request.query_params
+
+    condition = args.get('where')
+    if condition and not ALLOW_RAW_WHERE:
+        return error('The "where" parameter is disabled; filter with ?column=op:value instead', 400)
+    after_id, limit, page_err = parse_page_args(args)
+    if page_err:
+        return error(page_err, 400)
+    try:
+        filter_sql, filter_params, filter_columns = compile_filters(table_name, args)
+    except ValueError as e:
+        return error(str(e), 400)
+    filters = (filter_sql, filter_params)
+    columns, fields_err = parse_fields(table_name, args)
+    if fields_err:
+        return error(fields_err, 400)
+    expand, expand_err = parse_expand(table_name, args)
+    if expand_err:
+        return error(expand_err, 400)
+    columns = expand_columns(table_name, columns, expand)
+    unindexed = unindexed_filter_columns(table_name, filter_columns)
+    if unindexed:
+        log_unindexed_filter(table_name, unindexed)
+
+    ids = None
+    if args.get('ids') is not None:
+        try:
+            ids = parse_ids(args['ids'])
+        except ValueError as e:
+            return error(f'Invalid "ids" parameter: {e}', 400)
+        if any(args.get(arg) for arg in ('limit', 'after', 'cursor', 'stream')):
+            return error('"ids" cannot be combined with pagination or streaming', 400)
+
+    stream_format = args.get('stream')
+    if stream_format:
+        if stream_format not in ('ndjson', 'json'):
+            return error('"stream" must be "ndjson" or "json"', 400)
+        if expand:
+            return error('"expand" cannot be combined with streaming', 400)
+        stream_limit = int(args['limit']) if args.get('limit') is not None else None
+        response, err = await stream_records(table_name, stream_format, condition, after_id, filters, columns,
+                                             stream_limit)
+        if err:
+            return error(f'Database error reading records: {err}', 500)
+        response.headers.update(read_headers(unindexed))
+        return response
+
+    etag = version_etag(request, table_name) if not expand else None
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+
+    cache_key = None
+    if response_cache.enabled_for(table_name) and not expand:
+        cache_key = response_cache.make_key(table_name, None, normalized_args(request))
+        body = response_cache.get(table_name, cache_key)
+        if body is not None:
+            return conditional(request, body, etag, read_headers(unindexed, 'HIT'))
+
+    if ids is not None:
+        id_sql, id_params = padded_id_filter(ids)
+        if filter_sql:
+            id_sql = f"{id_sql} AND {filter_sql}"
+        records, err = await read_records(table_name, filters=(id_sql, id_params + filter_params), columns=columns)
+        if err:
+            return error(f'Database error reading records: {err}', 500)
+        err = await apply_expand(table_name, records, expand)
+        if err:
+            return error(f'Database error expanding records: {err}', 500)
+        return finish_read(request, table_name, cache_key, multi_get_content(records, ids), etag, unindexed)
+
+    if not expand:
+        # Plain listing: serialize the row tuples directly, no dict per record
+        result, err = await read_rows(table_name, condition=condition, after_id=after_id,
+                                      limit=limit + 1 if limit is not None else None, filters=filters,
+                                      columns=columns)
+        if err:
+            return error(f'Database error reading records: {err}', 500)
+        names, rows = result
+        return finish_body(request, table_name, cache_key, rows_body(names, rows, limit), etag, unindexed)
+
+    records, err = await read_records(table_name, condition=condition, after_id=after_id,
+                                      limit=limit + 1 if limit is not None else None, filters=filters,
+                                      columns=columns)
+    if err:
+        return error(f'Database error reading records: {err}', 500)
+
+    records, next_cursor = split_page(records, limit)
+    err = await apply_expand(table_name, records, expand)
+    if err:
+        return error(f'Database error expanding records: {err}', 500)
+
+    content = records if limit is None else {'data': records, 'next_cursor': next_cursor}
+    return finish_read(request, table_name, cache_key, content, etag, unindexed)
+
+@app.get('/api/{table_name}/{record_id}')
+async def api_read_one(table_name: str, record_id: int, request: Request):
+    """API Endpoint: Read a specific record by ID (supports fields and expand)."""
+    if (denied := forbidden_table(table_name)) is not None:
+        return denied
+    columns, fields_err = parse_fields(table_name, request.query_params)
+    if fields_err:
+        return error(fields_err, 400)
+    expand, expand_err = parse_expand(table_name, request.query_params)
+    if expand_err:
+        return error(expand_err, 400)
+    columns = expand_columns(table_name, columns, expand)
+
+    etag = version_etag(request, table_name, record_id) if not expand else None
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+
+    cache_key = None
+    if response_cache.enabled_for(table_name) and not expand:
+        cache_key = response_cache.make_key(table_name, record_id, normalized_args(request))
+        body = response_cache.get(table_name, cache_key)
+        if body is not None:
+            return conditional(request, body, etag, read_headers(None, 'HIT'))
+
+    records, err = await read_records(table_name, record_id=record_id, columns=columns)
+    if err:
+        return error(f'Database error reading record: {err}', 500)
+    if not records:
+        return error(f'Record with ID {record_id} not found in {table_name}', 404)
+    err = await apply_expand(table_name, records, expand)
+    if err:
+        return error(f'Database error expanding record: {err}', 500)
+    return finish_read(request, table_name, cache_key, records[0], etag, None)
+
+@app.api_route('/api/{table_name}/{record_id}', methods=['PUT', 'PATCH'])
+async def api_update(table_name: str, record_id: int, request: Request):
+    """API Endpoint: Update an existing record by ID."""
+    if (denied := forbidden_table(table_name)) is not None:
+        return denied
+    data = await get_json(request)
+    if not data:
+        return error('Invalid or missing JSON data in request body', 400)
+    if not isinstance(data, dict):
+        return error('Expected a JSON object in request body (lists go to the bulk endpoint)', 400)
+    data, invalid = validate_record(table_name, data, partial=True)
+    if invalid:
+        return json_response({'error': 'Invalid record', 'fields': invalid}, 400)
+
+    rows_affected, err = await update_record(table_name, record_id, data)
+    if err:
+        return error(f'Database error updating record: {err}', 500)
+    response_cache.invalidate(table_name)
+    if not rows_affected:
+        return error(f'Record with ID {record_id} not found in {table_name}', 404)
+    if not READ_AFTER_WRITE:
+        return json_response({**data, 'id': record_id})
+
+    updated_record, fetch_err = await read_records(table_name, record_id=record_id)
+    if fetch_err:
+        return json_response({'message': f'Record {record_id} updated, but failed to fetch details.'})
+    if updated_record:
+        return json_response(updated_record[0])
+    return json_response({'message': f'Record {record_id} updated, but could not be found immediately.'})
+
+@app.delete('/api/{table_name}/{record_id}')
+async def api_delete(table_name: str, record_id: int):
+    """API Endpoint: Delete a record by ID."""
+    if (denied := forbidden_table(table_name)) is not None:
+        return denied
+    if DELETE_PRECHECK:
+        existing_record, _ = await read_records(table_name, record_id=record_id)
+        if not existing_record:
+            return error(f'Record with ID {record_id} not found in {table_name}', 404)
+
+    rows_affected, err = await delete_record(table_name, record_id)
+    if err:
+        return error(f'Database error deleting record: {err}', 500)
+    response_cache.invalidate(table_name)
+    if not rows_affected:
+        return error(f'Record with ID {record_id} not found in {table_name}', 404)
+    return json_response({'message': f'Record {record_id} from {table_name} deleted successfully.'})
+
+
+# --- Middleware ---
+# ASGI versions of api.py's after_request hooks. Metrics is the outer one, so
+# api_response_bytes reports the compressed size, as in api.py.
+
+def header_value(headers, name):
+    for key, value in headers:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+def weaken_etag(headers):
+    etag = headers.get('etag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+
+class CompressionMiddleware:
+    """Compresses JSON bodies with the best encoding the client accepts (see api.compress_response)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not COMPRESSION_ENCODINGS:
+            return await self.app(scope, receive, send)
+        encoding = compression.negotiate(header_value(scope['headers'], b'accept-encoding'), COMPRESSION_ENCODINGS)
+        state = {}
+
+        async def send_compressed(message):
+            if message['type'] == 'http.response.start':
+                state['start'] = message  # Held until the first body chunk shows whether it is streamed
+                return
+            start = state.pop('start', None)
+            if start is not None:
+                headers = MutableHeaders(raw=start['headers'])
+                mimetype = headers.get('content-type', '').split(';')[0].strip()
+                if start['status'] == 304:
+                    # 304s only come from the JSON read endpoints: same Vary and validator as their 200
+                    headers.add_vary_header('Accept-Encoding')
+                    if encoding:
+                        weaken_etag(headers)
+                    encoding_used = None
+                elif start['status'] != 200 or mimetype not in COMPRESSIBLE_MIMETYPES or 'content-encoding' in headers:
+                    encoding_used = None
+                else:
+                    headers.add_vary_header('Accept-Encoding')
+                    encoding_used = encoding
+                    if encoding_used:
+                        weaken_etag(headers)  # Weak, as in api.py, whatever the body size (see api.compress_response)
+                streamed = message.get('more_body', False)
+                if encoding_used is None or (not streamed and len(message.get('body', b'')) < COMPRESSION_MIN_BYTES):
+                    await send(start)
+                    await send(message)
+                    return
+                headers['Content-Encoding'] = encoding_used
+                if not streamed:
+                    body = compression.compress(message.get('body', b''), encoding_used)
+                    headers['Content-Length'] = str(len(body))
+                    await send(start)
+                    await send({'type': 'http.response.body', 'body': body})
+                    return
+                if 'content-length' in headers:
+                    del headers['Content-Length']
+                state['compressor'] = compression.StreamCompressor(encoding_used)
+                await send(start)
+
+            compressor = state.get('compressor')
+            if compressor is None:
+                await send(message)
+                return
+            more_body = message.get('more_body', False)
+            body = compressor.compress(message['body']) if message.get('body') else b''
+            if not more_body:
+                body += compressor.finish()
+            await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+class MetricsMiddleware:
+    """Per-route latency and payload size; routes are labelled by their path template, not the raw path."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+
+        async def send_timed(message):
+            if message['type'] == 'http.response.start':
+                route = scope.get('route')  # Set by the router once it matched
+                label = route.path if route is not None else 'unmatched'
+                REQUEST_SECONDS.observe(time.perf_counter() - started, scope['method'], label, str(message['status']))
+                size = header_value(message['headers'], b'content-length')  # None for streamed bodies
+                if size is not None:
+                    RESPONSE_BYTES.observe(int(size), scope['method'], label)
+            await send(message)
+
+        await self.app(scope, receive, send_timed)
+
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)  # Added last, so it wraps the compression
+
+
+# --- Main Execution ---
+if __name__ == '__main__':
+    import uvicorn
+    print("Starting async API server...")
+    uvicorn.run(app, host='0.0.0.0', port=5000)
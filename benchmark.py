@@ -0,0 +1,553 @@
+"""Load test / benchmark harness for the table API (api.py).
+
+Seeds a local MySQL (or SQLite) database with synthetic users, restaurants, menu items,
+orders and order items, boots api.py against it, drives a mixed read/write
+workload at fixed concurrency and writes the results (p50/p95/p99 latency,
+throughput, DB round trips per request) to a JSON file. Everything runs on
+one machine with only the API's own dependencies; no network access needed.
+
+    python benchmark.py seed --scale 2            # (re)create and fill the bench database
+    python benchmark.py run --concurrency 16 --duration 30
+    python benchmark.py compare before.json after.json
+
+The bench database (default "api_bench") is dropped and recreated by "seed",
+never point --db-name at real data. With --backend sqlite the database is the
+file given by --db-path and api.py runs with DB_BACKEND=sqlite.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+import storage
+
+# --- Settings ---
+
+DEFAULT_DB_NAME = 'api_bench'
+DEFAULT_DB_PATH = 'api_bench.db'
+RESULTS_DIR = 'benchmark_results'
+
+# Rows per table at --scale 1
+BASE_ROWS = {
+    'users': 1000,
+    'restaurants': 50,
+    'orders': 5000,
+}
+MENU_ITEMS_PER_RESTAURANT = 20
+ITEMS_PER_ORDER = 3
+
+# Operation -> weight of the default mixed workload (reads dominate, like production)
+DEFAULT_MIX = {
+    'read_order': 30,
+    'list_orders_page': 15,
+    'list_restaurants': 10,
+    'multi_get_menu_items': 10,
+    'expand_order': 10,
+    'create_order': 10,
+    'update_order_status': 10,
+    'bulk_create_order_items': 5,
+}
+
+STATUSES = ['pending', 'kitchen', 'ready', 'in_delivery', 'completed', 'cancelled']
+ORDER_TYPES = ['dine-in', 'delivery', 'takeout']
+CUISINES = ['italian', 'mexican', 'japanese', 'indian', 'thai', 'burgers', 'vegan', 'greek']
+CITIES = ['Lisbon', 'Porto', 'Madrid', 'Berlin', 'Paris', 'Rome']
+
+SCHEMA = [
+    """CREATE TABLE users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(64) NOT NULL,
+        email VARCHAR(128) NOT NULL,
+        role VARCHAR(16) NOT NULL DEFAULT 'customer',
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY (username)
+    )""",
+    """CREATE TABLE restaurants (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(128) NOT NULL,
+        cuisine VARCHAR(32),
+        city VARCHAR(64),
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY (city)
+    )""",
+    """CREATE TABLE menu_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        restaurant_id INT NOT NULL,
+        category_id INT,
+        name VARCHAR(128) NOT NULL,
+        price DECIMAL(8, 2) NOT NULL,
+        FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
+    )""",
+    """CREATE TABLE orders (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        restaurant_id INT NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'pending',
+        order_type VARCHAR(16) NOT NULL,
+        total DECIMAL(10, 2) NOT NULL DEFAULT 0,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY (status),
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
+    )""",
+    """CREATE TABLE order_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        order_id INT NOT NULL,
+        menu_item_id INT NOT NULL,
+        quantity INT NOT NULL DEFAULT 1,
+        FOREIGN KEY (order_id) REFERENCES orders (id),
+        FOREIGN KEY (menu_item_id) REFERENCES menu_items (id)
+    )""",
+    """CREATE TABLE delivery_addresses (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        order_id INT,
+        city VARCHAR(64),
+        postal_code VARCHAR(16),
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (order_id) REFERENCES orders (id)
+    )""",
+    """CREATE TABLE promotions (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        restaurant_id INT NOT NULL,
+        code VARCHAR(32) NOT NULL,
+        start_date DATE,
+        end_date DATE,
+        FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
+    )""",
+]
+TABLES_IN_DROP_ORDER = ['promotions', 'delivery_addresses', 'order_items', 'orders', 'menu_items',
+                        'restaurants', 'users']
+
+# --- Seeding ---
+
+def db_settings(args, with_database=True):
+    if args.backend == 'sqlite':
+        return {'database': args.db_path}
+    settings = {'host': args.db_host, 'user': args.db_user, 'password': args.db_password}
+    if with_database:
+        settings['database'] = args.db_name
+    return settings
+
+def db_open(args, with_database=True):
+    """Raw connection + cursor through the storage dialect (the cursor takes %s placeholders on both)."""
+    dialect = storage.DIALECTS[args.backend]()
+    cnx = dialect.connect(db_settings(args, with_database))
+    return cnx, dialect.cursor(cnx)
+
+def sqlite_schema(statement):
+    """Rewrites a SCHEMA statement for SQLite: rowid primary keys, KEY lines as CREATE INDEX."""
+    table = re.search(r"CREATE TABLE (\w+)", statement).group(1)
+    indexes = [f"CREATE INDEX ix_{table}_{column} ON {table} ({column})"
+               for column in re.findall(r"^\s*KEY \((\w+)\),?$", statement, re.M)]
+    statement = re.sub(r"^\s*KEY \(\w+\),?\n", '', statement, flags=re.M)
+    statement = statement.replace('INT AUTO_INCREMENT PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+    statement = statement.replace('UNIQUE KEY', 'UNIQUE')
+    statement = re.sub(r",(\s*\))$", r"\1", statement)  # Trailing comma left by a removed KEY line
+    return [statement] + indexes
+
+def insert_many(cursor, table, columns, rows, chunk_size=1000):
+    query = f"INSERT INTO `{table}` ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for start in range(0, len(rows), chunk_size):
+        cursor.executemany(query, rows[start:start + chunk_size])
+
+def seed(args):
+    """Drops and recreates the bench tables and fills them with deterministic synthetic data."""
+    rng = random.Random(args.seed)
+    counts = {table: int(rows * args.scale) for table, rows in BASE_ROWS.items()}
+    counts['menu_items'] = counts['restaurants'] * MENU_ITEMS_PER_RESTAURANT
+    counts['order_items'] = counts['orders'] * ITEMS_PER_ORDER
+    now = datetime(2024, 1, 1)
+
+    cnx, cursor = db_open(args, with_database=False)
+    try:
+        if args.backend == 'mysql':
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.db_name}`")
+            cursor.execute(f"USE `{args.db_name}`")
+        for table in TABLES_IN_DROP_ORDER:
+            cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+        for statement in SCHEMA:
+            for ddl in (sqlite_schema(statement) if args.backend == 'sqlite' else [statement]):
+                cursor.execute(ddl)
+
+        insert_many(cursor, 'users', ['username', 'email', 'role', 'created_at'], [
+            (f"user{i}", f"user{i}@example.com", rng.choice(['customer'] * 8 + ['waiter', 'admin']),
+             now - timedelta(minutes=rng.randrange(525600)))
+            for i in range(1, counts['users'] + 1)])
+        insert_many(cursor, 'restaurants', ['name', 'cuisine', 'city', 'created_at'], [
+            (f"Restaurant {i}", rng.choice(CUISINES), rng.choice(CITIES), now - timedelta(days=rng.randrange(1000)))
+            for i in range(1, counts['restaurants'] + 1)])
+        insert_many(cursor, 'menu_items', ['restaurant_id', 'category_id', 'name', 'price'], [
+            ((i - 1) // MENU_ITEMS_PER_RESTAURANT + 1, rng.randint(1, 10), f"Dish {i}",
+             Decimal(rng.randrange(300, 3000)) / 100)
+            for i in range(1, counts['menu_items'] + 1)])
+        insert_many(cursor, 'orders', ['user_id', 'restaurant_id', 'status', 'order_type', 'total', 'created_at'], [
+            (rng.randint(1, counts['users']), rng.randint(1, counts['restaurants']), rng.choice(STATUSES),
+             rng.choice(ORDER_TYPES), Decimal(rng.randrange(500, 15000)) / 100,
+             now - timedelta(minutes=rng.randrange(525600)))
+            for _ in range(counts['orders'])])
+        insert_many(cursor, 'order_items', ['order_id', 'menu_item_id', 'quantity'], [
+            (i // ITEMS_PER_ORDER + 1, rng.randint(1, counts['menu_items']), rng.randint(1, 4))
+            for i in range(counts['order_items'])])
+        insert_many(cursor, 'delivery_addresses', ['user_id', 'order_id', 'city', 'postal_code'], [
+            (rng.randint(1, counts['users']), order_id, rng.choice(CITIES), f"{rng.randrange(10000, 99999)}")
+            for order_id in range(1, counts['orders'] + 1, 3)])
+        insert_many(cursor, 'promotions', ['restaurant_id', 'code', 'start_date', 'end_date'], [
+            (rng.randint(1, counts['restaurants']), f"PROMO{i}", now.date(), (now + timedelta(days=30)).date())
+            for i in range(1, counts['restaurants'] + 1)])
+        cnx.commit()
+        cursor.close()
+    finally:
+        cnx.close()
+    print(f"Seeded {args.db_path if args.backend == 'sqlite' else args.db_name}: " + ', '.join(f"{table}={n}" for table, n in counts.items()))
+    return counts
+
+def table_sizes(args):
+    """Highest id per table, used to pick random existing rows."""
+    cnx, cursor = db_open(args)
+    try:
+        sizes = {}
+        for table in ('users', 'restaurants', 'menu_items', 'orders', 'order_items'):
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM `{table}`")
+            sizes[table] = cursor.fetchone()[0]
+        cursor.close()
+        return sizes
+    finally:
+        cnx.close()
+
+# --- Server ---
+
+def start_server(args):
+    """Boots api.py in a child process (threaded Werkzeug server) against the bench database."""
+    env = dict(os.environ)
+    env.update({'DB_BACKEND': args.backend, 'DB_HOST': args.db_host, 'DB_USER': args.db_user,
+                'DB_PASSWORD': args.db_password, 'DB_NAME': args.db_name, 'DB_PATH': os.path.abspath(args.db_path),
+                'API_METRICS_ENDPOINT': '1'})
+    code = ("import api; api.schema_cache.refresh(); "
+            f"api.app.run(host='127.0.0.1', port={args.port}, threaded=True, debug=False)")
+    process = subprocess.Popen([sys.executable, '-c', code], env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL if not args.server_output else None,
+                               stderr=subprocess.DEVNULL if not args.server_output else None)
+    base_url = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"api.py exited with code {process.returncode} (run with --server-output)")
+        try:
+            status, _ = Client(base_url).request('GET', '/metrics')
+            if status == 200:
+                return process, base_url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("api.py did not start within 30s")
+
+class Client:
+    """One keep-alive HTTP connection (reopened automatically when the server closes it)."""
+
+    def __init__(self, base_url, accept_encoding='identity'):
+        parts = urlsplit(base_url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.headers = {'Accept-Encoding': accept_encoding}
+
+    def request(self, method, path, body=None):
+        headers = dict(self.headers)
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            raise
+
+def scrape_counters(base_url):
+    """Sums the DB statement and connect counters exposed at /metrics (None if unavailable)."""
+    try:
+        status, body = Client(base_url).request('GET', '/metrics')
+    except OSError:
+        return None
+    if status != 200:
+        return None
+    totals = {'queries': 0.0, 'connects': 0.0}
+    for line in body.decode().splitlines():
+        name, _, value = line.rpartition(' ')
+        if name.startswith('api_db_query_duration_seconds_count'):
+            totals['queries'] += float(value)
+        elif name.startswith('api_db_connect_seconds_count'):
+            totals['connects'] += float(value)
+    return totals
+
+# --- Workload ---
+
+class Workload:
+    """Builds random requests for each operation of the mix."""
+
+    def __init__(self, sizes, rng):
+        self.sizes = sizes
+        self.rng = rng
+
+    def pick(self, table):
+        return self.rng.randint(1, max(1, self.sizes[table]))
+
+    def read_order(self):
+        return 'GET', f"/api/orders/{self.pick('orders')}", None
+
+    def list_orders_page(self):
+        return 'GET', f"/api/orders?status=eq:{self.rng.choice(STATUSES)}&limit=50", None
+
+    def list_restaurants(self):
+        return 'GET', "/api/restaurants", None
+
+    def multi_get_menu_items(self):
+        ids = ','.join(str(self.pick('menu_items')) for _ in range(10))
+        return 'GET', f"/api/menu_items?ids={ids}", None
+
+    def expand_order(self):
+        return 'GET', f"/api/orders/{self.pick('orders')}?expand=order_items.menu_item", None
+
+    def create_order(self):
+        return 'POST', "/api/orders", {
+            'user_id': self.pick('users'), 'restaurant_id': self.pick('restaurants'), 'status': 'pending',
+            'order_type': self.rng.choice(ORDER_TYPES), 'total': f"{self.rng.randrange(500, 15000) / 100:.2f}",
+        }
+
+    def update_order_status(self):
+        return 'PATCH', f"/api/orders/{self.pick('orders')}", {'status': self.rng.choice(STATUSES)}
+
+    def bulk_create_order_items(self):
+        order_id = self.pick('orders')
+        return 'POST', "/api/order_items/bulk", [
+            {'order_id': order_id, 'menu_item_id': self.pick('menu_items'), 'quantity': self.rng.randint(1, 4)}
+            for _ in range(20)]
+
+def parse_mix(spec):
+    """Parses "read_order=50,create_order=10" into {'read_order': 50, 'create_order': 10}."""
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if not hasattr(Workload, name) or name.startswith('_') or name == 'pick':
+            raise ValueError(f"Unknown operation in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def summarize(samples, elapsed):
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, status in samples if status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+            'p95': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+            'max': round(latencies[-1] * 1000, 3) if latencies else None,
+        },
+    }
+
+def drive(base_url, sizes, mix, concurrency, duration, seed_value, accept_encoding):
+    """Runs `concurrency` closed-loop workers for `duration` seconds. Returns ({operation: samples}, elapsed)."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(seed_value * 1000 + index)
+        workload = Workload(sizes, rng)
+        client = Client(base_url, accept_encoding)
+        local = {name: [] for name in names}
+        while time.monotonic() < stop_at:
+            name = rng.choices(names, weights)[0]
+            method, path, body = getattr(workload, name)()
+            started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+            except (http.client.HTTPException, OSError):
+                status = 599  # Connection level failure
+            local[name].append((time.perf_counter() - started, status))
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.monotonic() - started
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    if args.seed_first:
+        seed(args)
+    sizes = table_sizes(args)
+    if not sizes['orders']:
+        raise SystemExit(f"{args.db_name} is empty, run: python benchmark.py seed")
+    mix = parse_mix(args.mix)
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_server(args)
+    try:
+        if args.warmup:
+            drive(base_url, sizes, mix, args.concurrency, args.warmup, args.seed + 1, args.accept_encoding)
+        before = scrape_counters(base_url)
+        samples, elapsed = drive(base_url, sizes, mix, args.concurrency, args.duration, args.seed,
+                                 args.accept_encoding)
+        after = scrape_counters(base_url)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    all_samples = [sample for values in samples.values() for sample in values]
+    overall = summarize(all_samples, elapsed)
+    if before is not None and after is not None and all_samples:
+        # /metrics counts its own statements too, but it runs none
+        overall['db_round_trips_per_request'] = round((after['queries'] - before['queries']) / len(all_samples), 3)
+        overall['db_connects'] = int(after['connects'] - before['connects'])
+    else:
+        overall['db_round_trips_per_request'] = None
+
+    result = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'label': args.label,
+        'config': {
+            'concurrency': args.concurrency, 'duration_s': args.duration, 'warmup_s': args.warmup,
+            'mix': mix, 'seed': args.seed, 'accept_encoding': args.accept_encoding, 'table_sizes': sizes,
+            'backend': args.backend,
+            'server': args.url or 'api.py (werkzeug, threaded)',
+            'env': {key: value for key, value in sorted(os.environ.items())
+                    if key.startswith(('API_', 'DB_')) and key != 'DB_PASSWORD'},
+        },
+        'overall': overall,
+        'operations': {name: summarize(values, elapsed) for name, values in samples.items()},
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{result['commit'] or 'nogit'}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print_summary(result)
+    print(f"Results written to {output}")
+
+# --- Reports ---
+
+def print_summary(result):
+    overall = result['overall']
+    print(f"{overall['requests']} requests, {overall['errors']} errors, {overall['throughput_rps']} req/s, "
+          f"{overall['db_round_trips_per_request']} DB round trips/request")
+    print(f"{'operation':<26}{'req':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in [('overall', overall)] + sorted(result['operations'].items()):
+        latency = stats['latency_ms']
+        print(f"{name:<26}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput_rps'] or 0:>10}"
+              f"{latency['p50'] or 0:>10}{latency['p95'] or 0:>10}{latency['p99'] or 0:>10}")
+
+def compare(args):
+    """Prints the change in throughput and latency percentiles between two result files."""
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        if not old or new is None:
+            return 'n/a'
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"before: {args.before} ({before.get('commit')})  after: {args.after} ({after.get('commit')})")
+    print(f"{'operation':<26}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'trips/req':>11}")
+    operations = sorted(set(before['operations']) & set(after['operations']))
+    for name in ['overall'] + operations:
+        old = before['overall'] if name == 'overall' else before['operations'][name]
+        new = after['overall'] if name == 'overall' else after['operations'][name]
+        trips = change(old.get('db_round_trips_per_request'), new.get('db_round_trips_per_request')) \
+            if name == 'overall' else ''
+        print(f"{name:<26}{change(old['throughput_rps'], new['throughput_rps']):>10}"
+              + ''.join(f"{change(old['latency_ms'][p], new['latency_ms'][p]):>10}" for p in ('p50', 'p95', 'p99'))
+              + f"{trips:>11}")
+
+# --- Main Execution ---
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_db_args(command):
+        command.add_argument('--backend', choices=sorted(storage.DIALECTS), default=os.getenv('DB_BACKEND', 'mysql'))
+        command.add_argument('--db-path', default=os.getenv('BENCH_DB_PATH', DEFAULT_DB_PATH),
+                             help='SQLite bench database file (--backend sqlite)')
+        command.add_argument('--db-host', default=os.getenv('DB_HOST', 'localhost'))
+        command.add_argument('--db-user', default=os.getenv('DB_USER', 'your_api_user'))
+        command.add_argument('--db-password', default=os.getenv('DB_PASSWORD', 'your_api_password'))
+        command.add_argument('--db-name', default=os.getenv('BENCH_DB_NAME', DEFAULT_DB_NAME),
+                             help='Bench database (dropped and recreated by seed)')
+        command.add_argument('--scale', type=float, default=1.0, help='Multiplier for the seeded row counts')
+        command.add_argument('--seed', type=int, default=42, help='Random seed for data and workload')
+
+    seed_command = commands.add_parser('seed', help='Create and fill the bench database')
+    add_db_args(seed_command)
+
+    run_command = commands.add_parser('run', help='Boot api.py and run the workload')
+    add_db_args(run_command)
+    run_command.add_argument('--seed-first', action='store_true', help='Reseed the database before running')
+    run_command.add_argument('--concurrency', type=int, default=8)
+    run_command.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    run_command.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before the run')
+    run_command.add_argument('--mix', help='Operation weights, e.g. read_order=50,create_order=10')
+    run_command.add_argument('--accept-encoding', default='identity', help='Accept-Encoding sent by the clients')
+    run_command.add_argument('--port', type=int, default=5055, help='Port for the api.py child process')
+    run_command.add_argument('--url', help='Benchmark an already running server instead of booting api.py')
+    run_command.add_argument('--label', help='Free text stored with the results')
+    run_command.add_argument('--output', help=f'Result file (default: {RESULTS_DIR}/<time>-<commit>.json)')
+    run_command.add_argument('--server-output', action='store_true', help="Show api.py's own output")
+
+    compare_command = commands.add_parser('compare', help='Compare two result files')
+    compare_command.add_argument('before')
+    compare_command.add_argument('after')
+
+    args = parser.parse_args()
+    {'seed': seed, 'run': run, 'compare': compare}[args.command](args)
+
+if __name__ == '__main__':
+    main()
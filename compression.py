@@ -0,0 +1,116 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: pip install zstandard
+    zstandard = None
+
+# --- Content-Encoding Negotiation ---
+# gzip is always available; br and zstd are offered when their packages are
+# installed. Levels favour speed: the responses are compressed on every request.
+
+LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+
+def available_encodings():
+    encodings = ['gzip']
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    return encodings
+
+
+def parse_accept_encoding(header):
+    """Parses "gzip;q=0.8, br" into {'gzip': 0.8, 'br': 1.0}."""
+    weights = {}
+    for item in (header or '').split(','):
+        parts = [part.strip() for part in item.split(';')]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        weights[parts[0].lower()] = quality
+    return weights
+
+
+def negotiate(header, preferred):
+    """Picks the encoding for an Accept-Encoding header, or None for identity.
+
+    The client's q-values win; on a tie the first entry of `preferred` does.
+    """
+    weights = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in preferred:
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+# --- Compressors ---
+
+class StreamCompressor:
+    """Compresses a body chunk by chunk, flushing after each one so clients can decode as it arrives."""
+
+    def __init__(self, encoding, level=None):
+        level = LEVELS[encoding] if level is None else level
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+        elif encoding == 'br':
+            self._obj = brotli.Compressor(quality=level)
+        elif encoding == 'zstd':
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, chunk):
+        if self.encoding == 'gzip':
+            return self._obj.compress(chunk) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return self._obj.process(chunk) + self._obj.flush()
+        return self._obj.compress(chunk) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def compress(data, encoding, level=None):
+    """One-shot compression of a complete body."""
+    level = LEVELS[encoding] if level is None else level
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def compress_chunks(chunks, encoding, level=None):
+    """Generator compressing an iterable of str/bytes chunks (streamed responses)."""
+    compressor = StreamCompressor(encoding, level)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()  # Lets the wrapped generator clean up if the client went away
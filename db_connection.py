@@ -1,7 +1,9 @@
-import sqlite3
+from storage import ConnectionPool
+
+# Replace with your actual database path
+db_path = 'your_database.db'  # Make sure this exists
+pool = ConnectionPool('sqlite', {'database': db_path}, size=5, name='server')
 
 def get_db_connection():
-    # Replace with your actual database credentials
-    db_path = 'your_database.db'  # Make sure this exists
-    conn = sqlite3.connect(db_path)
-    return conn
\ No newline at end of file
+    # Pooled connection from the shared storage layer; conn.close() returns it to the pool
+    return pool.acquire()
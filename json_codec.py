@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from email.utils import format_datetime
+
+try:
+    import orjson
+except ImportError:  # Optional, the standard library encoder is used instead
+    orjson = None
+
+# --- JSON Codec ---
+# One place that turns query results into JSON bytes. Column types MySQL hands
+# back that JSON has no type for are converted explicitly:
+#   DATETIME/DATE/TIMESTAMP -> HTTP date (Flask's format) or ISO 8601
+#   TIME (timedelta)        -> "HH:MM:SS"
+#   DECIMAL                 -> string (no float rounding), or a number if asked for
+#   BLOB/BINARY (bytes)     -> base64 string
+
+
+def http_date(value):
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # Naive values are stored as UTC
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def format_timedelta(value):
+    seconds = int(value.total_seconds())
+    sign = '-' if seconds < 0 else ''
+    hours, rest = divmod(abs(seconds), 3600)
+    return f"{sign}{hours:02d}:{rest // 60:02d}:{rest % 60:02d}"
+
+
+class JSONCodec:
+    """Compact JSON encoder with a pluggable backend: 'orjson', 'json' or 'auto'.
+
+    `date_format` is 'http' (what Flask's jsonify emits) or 'iso'.
+    `decimal_format` is 'string' or 'number' (what FastAPI's encoder emits).
+    Object keys keep their insertion (column) order.
+    """
+
+    def __init__(self, backend='auto', date_format='http', decimal_format='string'):
+        if backend == 'auto':
+            backend = 'orjson' if orjson is not None else 'json'
+        if backend == 'orjson' and orjson is None:
+            raise RuntimeError("The orjson JSON backend needs the 'orjson' package (pip install orjson)")
+        if backend not in ('orjson', 'json'):
+            raise ValueError(f"Unknown JSON backend: {backend}")
+        if date_format not in ('http', 'iso'):
+            raise ValueError(f"Unknown JSON date format: {date_format}")
+        if decimal_format not in ('string', 'number'):
+            raise ValueError(f"Unknown JSON decimal format: {decimal_format}")
+        self.backend = backend
+        self.date_format = date_format
+        self.decimal_format = decimal_format
+
+        if backend == 'orjson':
+            options = orjson.OPT_NON_STR_KEYS
+            if date_format == 'http':
+                options |= orjson.OPT_PASSTHROUGH_DATETIME  # Send dates to default() instead
+            self._options = options
+        else:
+            self._encoder = json.JSONEncoder(default=self.default, separators=(',', ':'), ensure_ascii=False)
+
+    def default(self, value):
+        if isinstance(value, (datetime, date)):
+            return http_date(value) if self.date_format == 'http' else value.isoformat()
+        if isinstance(value, time):
+            return value.isoformat()
+        if isinstance(value, timedelta):
+            return format_timedelta(value)
+        if isinstance(value, Decimal):
+            if self.decimal_format == 'number':
+                return int(value) if value.as_tuple().exponent >= 0 else float(value)
+            return str(value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return base64.b64encode(value).decode('ascii')
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    def dumps(self, obj):
+        """Encodes `obj` to UTF-8 JSON bytes."""
+        if self.backend == 'orjson':
+            return orjson.dumps(obj, default=self.default, option=self._options)
+        return self._encoder.encode(obj).encode()
+
+    def loads(self, data):
+        if self.backend == 'orjson':
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def dump_rows(self, columns, rows):
+        """JSON array of objects from row tuples and one shared column list.
+
+        Rows are encoded one at a time, so only one row dict exists at once
+        (not one per row for the whole result).
+        """
+        dumps = self.dumps
+        return b'[' + b','.join(dumps(dict(zip(columns, row))) for row in rows) + b']'
+
+    def dump_row_lines(self, columns, rows):
+        """Newline-delimited JSON (one object per row) from row tuples."""
+        dumps = self.dumps
+        return b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in rows)
@@ -0,0 +1,185 @@
+import re
+import threading
+import time
+from collections import deque
+
+# --- Metric Types ---
+# Minimal thread-safe counters/histograms rendered in the Prometheus text
+# format (version 0.0.4), so /metrics can be scraped without extra packages.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        # Samples carry the _total suffix, and HELP/TYPE must name the same metric
+        self.name = name if name.endswith('_total') else name + '_total'
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.kind = 'counter'
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.kind = 'histogram'
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1  # Stored per bucket, made cumulative when rendered
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = ('le', format_number(bound) if bound == float('inf') else str(bound))
+                yield f"{self.name}_bucket{format_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, label_values)} {format_number(series[-2])}"
+            yield f"{self.name}_count{format_labels(self.labels, label_values)} {series[-1]}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time (e.g. pool occupancy)."""
+
+    def __init__(self, name, help_text, labels, callback):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.kind = 'gauge'
+        self.callback = callback  # Returns {label values tuple: value}
+
+    def samples(self):
+        for label_values, value in sorted(self.callback().items()):
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, labels, callback):
+        return self._register(Gauge(name, help_text, labels, callback))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# --- Slow Query Log ---
+
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(query):
+    """The statement with literals replaced and IN (...) lists collapsed, so equal shapes group together."""
+    shape = _STRING_LITERAL.sub('?', query)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _IN_LIST.sub('(%s, ...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def param_types(params, many=False):
+    """Type names of the parameters (never their values); executemany reports its first row and row count."""
+    if many:
+        rows = list(params or [])
+        first = param_types(rows[0]) if rows else []
+        return {'rows': len(rows), 'types': first}
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in (params or ())]
+
+
+class SlowQueryLog:
+    """Prints and keeps the most recent statements that took at least `threshold` seconds."""
+
+    def __init__(self, threshold, max_entries=100):
+        self.threshold = threshold
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def record(self, table, operation, query, params, duration, many=False):
+        if self.threshold <= 0 or duration < self.threshold:
+            return
+        entry = {
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'table': table,
+            'operation': operation,
+            'seconds': round(duration, 6),
+            'statement': statement_shape(query),
+            'param_types': param_types(params, many),
+        }
+        with self._lock:
+            self._entries.append(entry)
+        print(f"Slow query ({duration:.3f}s) on {table} [{operation}]: {entry['statement']} "
+              f"params={entry['param_types']}")
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self._entries))
+
+
+# Shared by the storage layer and the apps that serve /metrics
+registry = Registry()
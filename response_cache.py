@@ -0,0 +1,142 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# --- Cache Backends ---
+# A backend stores opaque bytes under string keys with a TTL, plus one integer
+# "generation" per table. Bumping the generation invalidates every cached
+# response of that table at once (old keys simply stop being asked for).
+# `epoch` distinguishes generation counters that may restart from zero.
+
+class MemoryBackend:
+    """In-process LRU cache with a TTL per entry. Thread-safe."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.epoch = uuid.uuid4().hex[:8]  # Counters restart with the process
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, name):
+        with self._lock:
+            return self._generations.get(name, 0)
+
+    def bump(self, name):
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+
+
+class RedisBackend:
+    """Cache shared by all worker processes, stored in Redis (needs the `redis` package).
+
+    Anything with the same get/set/incr interface (e.g. a local stand-in
+    server for development) can be passed as `client`.
+    """
+
+    def __init__(self, url=None, prefix='api_cache:', client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("The redis cache backend needs the 'redis' package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.epoch = 'shared'
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def generation(self, name):
+        value = self.client.get(self.prefix + 'gen:' + name)
+        return int(value) if value is not None else 0
+
+    def bump(self, name):
+        self.client.incr(self.prefix + 'gen:' + name)
+
+
+# --- Response Cache ---
+
+class ResponseCache:
+    """Read-through cache of serialized API responses, invalidated per table.
+
+    `table_ttls` maps table -> seconds; tables without an entry use
+    `default_ttl`, and a TTL of 0 disables caching for that table.
+    """
+
+    def __init__(self, backend, default_ttl=0, table_ttls=None):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.table_ttls = table_ttls or {}
+        self._stats = {}  # table -> {'hits': n, 'misses': n, 'invalidations': n}
+        self._lock = threading.Lock()
+
+    def ttl(self, table):
+        return self.table_ttls.get(table, self.default_ttl)
+
+    def enabled_for(self, table):
+        return self.ttl(table) > 0
+
+    def make_key(self, table, *parts):
+        """Key for `table` and any request details (record id, normalized query args, ...)."""
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+        return f"{table}:{self.backend.generation(table)}:{digest}"
+
+    def get(self, table, key):
+        value = self.backend.get(key)
+        self._count(table, 'hits' if value is not None else 'misses')
+        return value
+
+    def set(self, table, key, value):
+        self.backend.set(key, value, self.ttl(table))
+
+    def version(self, table):
+        """Opaque token that changes whenever `table` is invalidated (used for ETags)."""
+        return f"{self.backend.epoch}.{self.backend.generation(table)}"
+
+    def invalidate(self, table):
+        self.backend.bump(table)
+        self._count(table, 'invalidations')
+
+    def stats(self):
+        with self._lock:
+            return {table: dict(counts) for table, counts in self._stats.items()}
+
+    def _count(self, table, what):
+        with self._lock:
+            counts = self._stats.setdefault(table, {'hits': 0, 'misses': 0, 'invalidations': 0})
+            counts[what] += 1
+
+
+def parse_table_ttls(spec):
+    """Parses "restaurants=300,menu_items=120" into {'restaurants': 300.0, 'menu_items': 120.0}."""
+    ttls = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            table, seconds = item.split('=', 1)
+            ttls[table.strip()] = float(seconds)
+    return ttls
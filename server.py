@@ -1,23 +1,28 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 import sqlite3
+from db_connection import get_db_connection
+from storage import PoolTimeout
 
 app = Flask(__name__)
 
 @app.route('/get_categories')
 def get_categories():
+    conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT id, name FROM categories")
         categories = [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
         return jsonify(categories)
-    except sqlite3.Error as e:
+    except (sqlite3.Error, PoolTimeout) as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        conn.close()
+        if conn is not None:  # acquire() itself can fail
+            conn.close()
 
 @app.route('/get_menu_items')
 def get_menu_items():
+    conn = None
     try:
         category_id = request.args.get('id', '')
         conn = get_db_connection()
@@ -29,10 +34,11 @@ def get_menu_items():
         cursor.execute("SELECT * FROM menu_items WHERE category_id = ?", (category_id,))
         items = [{'name': row[1], 'price': row[2]} for row in cursor.fetchall()]
         return jsonify(items)
-    except sqlite3.Error as e:
+    except (sqlite3.Error, PoolTimeout) as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        conn.close()
+        if conn is not None:  # acquire() itself can fail
+            conn.close()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
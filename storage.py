@@ -0,0 +1,440 @@
+"""Shared storage layer: dialect adapters, connection pooling and query instrumentation.
+
+Every entry point (api.py, api_async.py's schema loading, server.py and
+Waiter_app) gets its connections from a ConnectionPool, so pooling, statement
+caching and metrics behave the same everywhere. Two dialects are supported:
+
+    MySQLDialect   mysql.connector, server-side prepared statements
+    SQLiteDialect  sqlite3 (standard library), e.g. for local benchmarks
+
+Queries are written once in the MySQL style (%s placeholders, `backtick`
+identifiers, SAVEPOINT ...); the SQLite adapter translates the placeholders
+and emulates the few connector features the code relies on.
+"""
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from metrics import ROW_BUCKETS, SlowQueryLog, registry
+
+# --- Metrics ---
+# Registered on the shared registry, so any app serving /metrics reports them.
+
+DB_CONNECT_SECONDS = registry.histogram('api_db_connect_seconds', 'Time to open a new database connection')
+DB_POOL_WAIT_SECONDS = registry.histogram(
+    'api_db_pool_wait_seconds', 'Time spent waiting for a free pooled connection')
+DB_QUERY_SECONDS = registry.histogram(
+    'api_db_query_duration_seconds', 'Statement execution time (until the first row for streams)',
+    ('table', 'operation'))
+DB_ROWS = registry.histogram('api_db_rows_returned', 'Rows returned per read', ('table',), ROW_BUCKETS)
+DB_ERRORS = registry.counter('api_db_errors', 'Statements that failed with a database error', ('table', 'operation'))
+slow_queries = SlowQueryLog(0)  # Threshold set by the app (API_SLOW_QUERY_SECONDS in api.py)
+
+_pools = []
+
+def register_pool(pool):
+    """Reports `pool` (anything with .name and .occupancy()) in api_db_pool_connections."""
+    _pools.append(pool)
+
+def _pool_occupancy():
+    counts = {}
+    for pool in list(_pools):
+        for state, value in pool.occupancy().items():
+            counts[(pool.name,) + state] = value
+    return counts
+
+registry.gauge('api_db_pool_connections', 'Pooled connections by pool and state', ('pool', 'state'),
+               _pool_occupancy)
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free within the pool's wait_timeout."""
+
+
+# --- Dialects ---
+# A dialect opens and checks raw connections, creates cursors and describes
+# tables (columns, leading index columns, foreign keys) for the schema cache.
+
+AUTOINC_SETTINGS_QUERY = "SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment"
+
+def consecutive_autoinc(lock_mode, increment):
+    """Whether InnoDB numbers the rows of one multi-row INSERT first_id, first_id + 1, ...
+
+    It only promises that in the 'traditional' (0) and 'consecutive' (1) lock
+    modes with auto_increment_increment 1; MySQL 8 defaults to 'interleaved' (2).
+    """
+    return int(lock_mode) in (0, 1) and int(increment) == 1
+
+class MySQLDialect:
+    name = 'mysql'
+
+    def __init__(self):
+        import mysql.connector  # Only needed when MySQL is actually used
+        self.connector = mysql.connector
+        self.Error = mysql.connector.Error
+
+    def connect(self, config):
+        config = dict(config)
+        # rowcount of an UPDATE = rows matched, not rows changed, so 0 always means "not found"
+        config.setdefault('client_flags', [self.connector.ClientFlag.FOUND_ROWS])
+        return self.connector.connect(**config)
+
+    def ping(self, raw):
+        raw.ping(reconnect=False)
+
+    def cursor(self, raw, dictionary=False, buffered=None):
+        return raw.cursor(dictionary=dictionary or None, buffered=buffered)
+
+    def prepared_cursor(self, raw):
+        return raw.cursor(prepared=True)
+
+    def consecutive_insert_ids(self, cursor):
+        cursor.execute(AUTOINC_SETTINGS_QUERY)
+        return consecutive_autoinc(*cursor.fetchone())
+
+    def describe_tables(self, cursor, tables):
+        """Returns (columns, indexed, foreign_keys) rows for `tables` from information_schema.
+
+        columns:      (table, column, data_type, column_type, nullable, default, max_length, column_key, extra)
+        indexed:      (table, column) for the first column of every index
+        foreign_keys: (table, column, referenced_table) for keys that reference an `id` column
+        """
+        placeholders = ', '.join(['%s'] * len(tables))
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, COLUMN_TYPE, IS_NULLABLE, COLUMN_DEFAULT, "
+            "CHARACTER_MAXIMUM_LENGTH, COLUMN_KEY, EXTRA FROM information_schema.COLUMNS "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders}) "
+            "ORDER BY TABLE_NAME, ORDINAL_POSITION",
+            list(tables))
+        columns = [tuple(map(as_text, row)) for row in cursor.fetchall()]
+        columns = [row[:4] + (row[4] == 'YES',) + row[5:] for row in columns]
+
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders}) AND SEQ_IN_INDEX = 1",
+            list(tables))
+        indexed = [tuple(map(as_text, row)) for row in cursor.fetchall()]
+
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME FROM information_schema.KEY_COLUMN_USAGE "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders}) "
+            "AND REFERENCED_TABLE_NAME IS NOT NULL AND REFERENCED_COLUMN_NAME = 'id' "
+            "ORDER BY TABLE_NAME, COLUMN_NAME",
+            list(tables))
+        foreign_keys = [tuple(map(as_text, row)) for row in cursor.fetchall()]
+        return columns, indexed, foreign_keys
+
+
+_WRITE_VERBS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'SAVEPOINT')
+
+
+class SQLiteCursor(sqlite3.Cursor):
+    """sqlite3 cursor that accepts %s placeholders and mimics the mysql.connector cursor API."""
+
+    _many_first_id = None
+
+    def _begin(self, query):
+        # The connection runs in autocommit mode (isolation_level=None); open the transaction
+        # ourselves, as MySQL does, so a SAVEPOINT nests inside it instead of being the
+        # outermost one (whose RELEASE would commit).
+        if not self.connection.in_transaction and query.lstrip()[:9].upper().startswith(_WRITE_VERBS):
+            super().execute("BEGIN")
+
+    def execute(self, query, params=()):
+        self._many_first_id = None
+        self._begin(query)
+        return super().execute(query.replace('%s', '?'), params or ())
+
+    def executemany(self, query, rows):
+        rows = list(rows)
+        self._begin(query)
+        super().executemany(query.replace('%s', '?'), rows)
+        self._many_first_id = None
+        if rows and query.lstrip()[:6].upper() == 'INSERT':
+            # MySQL reports the first id of a multi-row INSERT; ids are consecutive within it
+            last_id = self.connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+            self._many_first_id = last_id - len(rows) + 1
+        return self
+
+    @property
+    def lastrowid(self):
+        if self._many_first_id is not None:
+            return self._many_first_id
+        return sqlite3.Cursor.lastrowid.__get__(self)
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self.description or ())
+
+
+def _dict_row(cursor, row):
+    return {d[0]: value for d, value in zip(cursor.description, row)}
+
+_TYPE_NAME = re.compile(r"^\s*([A-Za-z ]+?)\s*(?:\((\d+)(?:\s*,\s*\d+)?\))?\s*$")
+_SQLITE_TYPES = {'integer': 'int', 'real': 'double', 'numeric': 'decimal', 'boolean': 'tinyint'}
+
+
+class SQLiteDialect:
+    name = 'sqlite'
+    Error = sqlite3.Error
+
+    def __init__(self):
+        # Same Python types as mysql.connector accepts as parameters
+        sqlite3.register_adapter(Decimal, str)
+        sqlite3.register_adapter(date, date.isoformat)
+        sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+
+    def connect(self, config):
+        raw = sqlite3.connect(config['database'], timeout=config.get('timeout', 5),
+                              cached_statements=config.get('cached_statements', 128),
+                              isolation_level=None,  # SQLiteCursor issues BEGIN itself
+                              check_same_thread=False)  # The pool hands a connection to one thread at a time
+        raw.execute("PRAGMA foreign_keys = ON")
+        if config.get('journal_mode'):
+            raw.execute(f"PRAGMA journal_mode = {config['journal_mode']}")
+        return raw
+
+    def ping(self, raw):
+        raw.execute("SELECT 1")
+
+    def cursor(self, raw, dictionary=False, buffered=None):
+        cursor = raw.cursor(SQLiteCursor)  # Always streams; `buffered` has no equivalent
+        if dictionary:
+            cursor.row_factory = _dict_row
+        return cursor
+
+    def prepared_cursor(self, raw):
+        # sqlite3 keeps its own per-connection statement cache (cached_statements)
+        return raw.cursor(SQLiteCursor)
+
+    def consecutive_insert_ids(self, cursor):
+        return True  # One writer at a time: a statement's rowids are never interleaved
+
+    def describe_tables(self, cursor, tables):
+        columns, indexed, foreign_keys = [], [], []
+        for table in sorted(tables):
+            cursor.execute(f"PRAGMA table_info(`{table}`)")
+            for _, column, declared, notnull, default, pk in cursor.fetchall():
+                match = _TYPE_NAME.match(declared or 'text')
+                base = (match.group(1) if match else declared).strip().lower()
+                data_type = _SQLITE_TYPES.get(base, base)
+                max_length = int(match.group(2)) if match and match.group(2) and 'char' in base else None
+                generated = pk and base == 'integer'  # INTEGER PRIMARY KEY is the rowid
+                if isinstance(default, str) and len(default) > 1 and default[0] == default[-1] == "'":
+                    default = default[1:-1].replace("''", "'")  # information_schema reports it unquoted
+                columns.append((table, column, data_type, declared, not notnull and not pk, default, max_length,
+                                'PRI' if pk else '', 'auto_increment' if generated else ''))
+                if pk == 1:
+                    indexed.append((table, column))
+
+            cursor.execute(f"PRAGMA index_list(`{table}`)")
+            for index in cursor.fetchall():
+                cursor.execute(f"PRAGMA index_info(`{index[1]}`)")
+                for seqno, _, column in cursor.fetchall():
+                    if seqno == 0:
+                        indexed.append((table, column))
+
+            cursor.execute(f"PRAGMA foreign_key_list(`{table}`)")
+            for row in cursor.fetchall():
+                referenced, column, to = row[2], row[3], row[4]
+                if to == 'id' and referenced in tables:
+                    foreign_keys.append((table, column, referenced))
+        foreign_keys.sort()
+        return columns, indexed, foreign_keys
+
+
+DIALECTS = {'mysql': MySQLDialect, 'sqlite': SQLiteDialect}
+
+def as_text(value):
+    # Some connector/server combinations return information_schema strings as bytes
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode()
+    return value
+
+
+# --- Connection Pool ---
+
+class PooledConnection:
+    """Wraps a pooled connection. close() hands it back to the pool."""
+
+    def __init__(self, pool, raw, created_at, statements):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._statements = statements  # query -> prepared cursor, lives as long as the connection
+
+    def __getattr__(self, name):
+        # Everything else (commit, rollback, in_transaction, ...) goes to the real connection
+        return getattr(self._raw, name)
+
+    def cursor(self, dictionary=False, buffered=None):
+        return self._pool.dialect.cursor(self._raw, dictionary=dictionary, buffered=buffered)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw, self._created_at, self._statements)
+
+    def discard(self):
+        """Closes the underlying connection instead of returning it (e.g. unread results pending)."""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._discard(raw)
+
+    def prepared_cursor(self, query):
+        """Returns the prepared cursor for `query` on this connection, preparing it on first use."""
+        cursor = self._statements.get(query)
+        if cursor is not None:
+            self._statements.move_to_end(query)
+            return cursor
+        if len(self._statements) >= self._pool.statement_cache_size:
+            _, oldest = self._statements.popitem(last=False)
+            oldest.close()
+        cursor = self._pool.dialect.prepared_cursor(self._raw)
+        self._statements[query] = cursor
+        return cursor
+
+    def drop_statement(self, query):
+        cursor = self._statements.pop(query, None)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except self._pool.dialect.Error:
+                pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of connections for one dialect.
+
+    Connections are opened lazily up to `size`. Idle connections are pinged on
+    checkout if they have been unused for `ping_after` seconds, and connections
+    older than `max_lifetime` are closed instead of being reused. When all
+    connections are busy, acquire() waits up to `wait_timeout` seconds.
+    """
+
+    def __init__(self, dialect, config, size=10, max_lifetime=1800, wait_timeout=5, ping_after=30,
+                 statement_cache_size=64, name='default'):
+        self.dialect = DIALECTS[dialect]() if isinstance(dialect, str) else dialect
+        self.errors = (self.dialect.Error, PoolTimeout)  # What acquire() and queries can raise
+        self.config = config
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.wait_timeout = wait_timeout
+        self.ping_after = ping_after
+        self.statement_cache_size = statement_cache_size
+        self.name = name
+        self._cond = threading.Condition()
+        self._idle = []   # LIFO stack of (raw_connection, created_at, last_used, statements)
+        self._opened = 0  # Idle + checked out connections
+        register_pool(self)
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.wait_timeout
+        waited = 0.0
+        while True:
+            entry = None
+            with self._cond:
+                wait_started = time.monotonic()
+                while True:
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._opened < self.size:
+                        self._opened += 1  # Reserve the slot, connect outside the lock
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        DB_POOL_WAIT_SECONDS.observe(time.monotonic() - started)
+                        raise PoolTimeout(
+                            f"No database connection available after {self.wait_timeout}s "
+                            f"(pool size {self.size})")
+                    self._cond.wait(remaining)
+                waited += time.monotonic() - wait_started
+
+            if entry is None:
+                DB_POOL_WAIT_SECONDS.observe(waited)
+                return self._open()
+
+            raw, created_at, last_used, statements = entry
+            if self._is_usable(raw, created_at, last_used):
+                DB_POOL_WAIT_SECONDS.observe(waited)
+                return PooledConnection(self, raw, created_at, statements)
+            self._discard(raw)
+
+    def release(self, raw, created_at, statements):
+        try:
+            # Never hand out a connection with an open transaction (or a stale snapshot)
+            if raw.in_transaction:
+                raw.rollback()
+        except self.dialect.Error:
+            self._discard(raw)
+            return
+        if time.monotonic() - created_at > self.max_lifetime:
+            self._discard(raw)
+            return
+        with self._cond:
+            self._idle.append((raw, created_at, time.monotonic(), statements))
+            self._cond.notify()
+
+    def occupancy(self):
+        with self._cond:
+            return {('open',): self._opened, ('idle',): len(self._idle)}
+
+    def _open(self):
+        started = time.monotonic()
+        try:
+            raw = self.dialect.connect(self.config)
+            DB_CONNECT_SECONDS.observe(time.monotonic() - started)
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw, time.monotonic(), OrderedDict())
+
+    def _is_usable(self, raw, created_at, last_used):
+        now = time.monotonic()
+        if now - created_at > self.max_lifetime:
+            return False
+        if now - last_used > self.ping_after:
+            try:
+                self.dialect.ping(raw)
+            except self.dialect.Error:
+                return False
+        return True
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except self.dialect.Error:
+            pass
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+
+# --- Instrumented Execution ---
+
+def execute(cursor, table_name, operation, query, params=None, many=False):
+    """cursor.execute() (or executemany()) that records the query time, errors and slow statements."""
+    started = time.perf_counter()
+    try:
+        if many:
+            cursor.executemany(query, params)
+        else:
+            cursor.execute(query, params)
+    except Exception:
+        DB_ERRORS.inc(table_name, operation)
+        raise
+    finally:
+        record_statement(table_name, operation, query, params, time.perf_counter() - started, many)
+
+def record_statement(table_name, operation, query, params, duration, many=False):
+    """Query time and slow query log entry for one statement (also used by api_async's driver)."""
+    DB_QUERY_SECONDS.observe(duration, table_name, operation)
+    slow_queries.record(table_name, operation, query, params, duration, many)
@@ -0,0 +1,50 @@
+"""Shared fixtures: api.py runs against a throwaway SQLite database.
+
+The storage layer's SQLite dialect runs the same queries as MySQL, so these
+tests need neither a MySQL server nor network access. The bench schema from
+benchmark.py is reused as the test schema.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='api-tests-'), 'api.db')
+# api.py reads its settings at import time
+os.environ.update({'DB_BACKEND': 'sqlite', 'DB_PATH': DB_PATH, 'API_CACHE_BACKEND': 'memory'})
+# Waiter_app/auth.py: a fixed signing key and a cheap KDF keep the auth tests fast
+os.environ.update({'AUTH_SECRET': 'test-secret', 'AUTH_SCRYPT_N': '1024'})
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    """Fresh bench tables (empty) and a reloaded schema cache; yields a raw pooled connection."""
+    import api
+    import benchmark
+    cnx = api.db_pool.acquire()
+    cursor = cnx.cursor()
+    for table in benchmark.TABLES_IN_DROP_ORDER:
+        cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+    for statement in benchmark.SCHEMA:
+        for ddl in benchmark.sqlite_schema(statement):
+            cursor.execute(ddl)
+    cnx.commit()
+    cursor.close()
+    api.schema_cache._next_refresh = 0
+    api.schema_cache.refresh()
+    for table in api.ALLOWED_TABLES:
+        api.response_cache.invalidate(table)  # Cached bodies from the previous test's rows
+    try:
+        yield cnx
+    finally:
+        cnx.close()
+
+
+@pytest.fixture
+def client(db):
+    import api
+    return api.app.test_client()
@@ -0,0 +1,55 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from Waiter_app import auth, main
+
+
+def test_issued_token_verifies():
+    claims = auth.verify_token(auth.issue_token(7, 'waiter'))
+    assert claims['sub'] == 7
+    assert claims['role'] == 'waiter'
+
+
+def test_tampered_token_is_rejected():
+    payload, _, signature = auth.issue_token(7, 'waiter').partition('.')
+    forged = auth.b64encode(b'{"sub": 7, "role": "admin", "exp": 9999999999}')
+    assert auth.verify_token(f"{forged}.{signature}") is None
+    assert auth.verify_token(f"{payload}.") is None
+    assert auth.verify_token("not-a-token") is None
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    token = auth.issue_token(7, 'waiter')
+    monkeypatch.setattr(time, 'time', lambda: 10 ** 12)
+    assert auth.verify_token(token) is None
+
+
+def test_token_signed_with_another_secret_is_rejected(monkeypatch):
+    monkeypatch.setattr(auth, 'TOKEN_SECRET', b'other-secret')
+    token = auth.issue_token(7, 'admin')
+    monkeypatch.undo()
+    assert auth.verify_token(token) is None
+
+
+def test_non_ascii_token_is_rejected():
+    payload, _, signature = auth.issue_token(7, 'waiter').partition('.')
+    assert auth.verify_token(f"{payload}.{signature[:-1]}\xe9") is None
+    headers = {'Authorization': 'Bearer caf\xe9.\xe9t\xe9'.encode('latin-1')}
+    response = TestClient(main.app).patch('/1', json={'status': 'kitchen'}, headers=headers)
+    assert response.status_code == 401
+
+
+def test_verify_password_accepts_hashes_and_legacy_plaintext():
+    stored = auth.hash_password('s3cret')
+    assert auth.verify_password('s3cret', stored)
+    assert not auth.verify_password('wrong', stored)
+    assert auth.verify_password('s3cret', 's3cret')
+    assert not auth.verify_password('wrong', 's3cret')
+
+
+def test_verify_password_rejects_missing_or_malformed_values():
+    assert not auth.verify_password('x', None)
+    assert not auth.verify_password('x', '')
+    assert not auth.verify_password('x', 'scrypt$broken')
+    assert not auth.verify_password('x', 'scrypt$3$8$1$!!$!!')
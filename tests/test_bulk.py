@@ -0,0 +1,112 @@
+import pytest
+
+import api
+import storage
+
+
+def insert_user(cursor, username):
+    cursor.execute("INSERT INTO users (username, email) VALUES (%s, %s)", (username, f"{username}@example.com"))
+
+
+def test_bulk_create_reports_the_inserted_ids(db):
+    cursor = db.cursor()
+    for name in ('a', 'b', 'c', 'd', 'e'):
+        insert_user(cursor, name)
+    db.commit()
+
+    report, err = api.bulk_create_records('users', [
+        {'username': 'f', 'email': 'f@example.com'},
+        {'username': 'g', 'email': 'g@example.com'},
+        {'username': 'h', 'email': 'h@example.com'},
+    ])
+    assert err is None
+    assert [r['id'] for r in report['results']] == [6, 7, 8]
+    assert [r['username'] for r in report['records']] == ['f', 'g', 'h']
+
+
+def test_bulk_create_row_fallback_reports_each_id(db):
+    # The duplicate username fails the multi-row INSERT, so rows are retried one by one
+    report, err = api.bulk_create_records('users', [
+        {'username': 'a', 'email': 'a@example.com'},
+        {'username': 'a', 'email': 'dup@example.com'},
+        {'username': 'b', 'email': 'b@example.com'},
+    ], atomic=False)
+    assert err is None
+    assert [r['status'] for r in report['results']] == ['created', 'error', 'created']
+    assert [r['id'] for r in report['results'] if r['status'] == 'created'] == [1, 2]
+    assert [r['username'] for r in report['records']] == ['a', 'b']
+
+
+def test_atomic_bulk_create_rolls_everything_back(db):
+    report, err = api.bulk_create_records('users', [
+        {'username': 'a', 'email': 'a@example.com'},
+        {'username': 'b', 'email': 'b@example.com'},
+        {'username': 'a', 'email': 'dup@example.com'},
+    ], atomic=True)
+    assert err is None
+    assert report['committed'] is False
+    assert [r['status'] for r in report['results']] == ['rolled_back', 'rolled_back', 'error']
+
+    cursor = db.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users")
+    assert cursor.fetchone()[0] == 0
+
+
+def test_bulk_delete_reports_missing_ids(db):
+    cursor = db.cursor()
+    insert_user(cursor, 'a')
+    db.commit()
+    report, err = api.bulk_delete_records('users', [1, 99])
+    assert err is None
+    assert [r['status'] for r in report['results']] == ['deleted', 'not_found']
+
+
+def test_atomic_rollback_undoes_released_savepoints(db):
+    # chunk_size=1: each row gets its own savepoint, released before the failing row runs
+    report, err = api.bulk_create_records('users', [
+        {'username': 'a', 'email': 'a@example.com'},
+        {'username': 'a', 'email': 'dup@example.com'},
+    ], chunk_size=1, atomic=True)
+    assert err is None
+    assert report['committed'] is False
+
+    cursor = db.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users")
+    assert cursor.fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('body', [[{'username': 'a', 'email': 'a@example.com'}], 'a', 5])
+def test_single_create_and_update_reject_non_object_bodies(client, db, body):
+    for response in (client.post('/api/users', json=body), client.patch('/api/users/1', json=body)):
+        assert response.status_code == 400
+        assert 'JSON object' in response.get_json()['error']
+
+
+
+@pytest.mark.parametrize('lock_mode, increment, consecutive', [
+    (0, 1, True), (1, 1, True), (2, 1, False), (1, 2, False)])
+def test_multi_row_ids_need_a_consecutive_lock_mode(lock_mode, increment, consecutive):
+    assert storage.consecutive_autoinc(lock_mode, increment) is consecutive
+
+
+def test_bulk_create_without_consecutive_ids_inserts_row_by_row(db, monkeypatch):
+    monkeypatch.setitem(api.insert_id_settings, 'consecutive', False)
+    statements = []
+    write_rows = api.write_rows
+
+    def recording_write_rows(cursor, table_name, operation, query, params, many):
+        statements.append(many)
+        return write_rows(cursor, table_name, operation, query, params, many)
+
+    monkeypatch.setattr(api, 'write_rows', recording_write_rows)
+    insert_user(db.cursor(), 'a')
+    db.commit()
+
+    report, err = api.bulk_create_records('users', [
+        {'username': 'b', 'email': 'b@example.com'},
+        {'username': 'c', 'email': 'c@example.com'},
+    ])
+    assert err is None
+    assert statements == [False, False]
+    assert [(r['id'], r['username']) for r in report['records']] == [(2, 'b'), (3, 'c')]
+    assert [r['id'] for r in report['results']] == [2, 3]
@@ -0,0 +1,44 @@
+import pytest
+
+import api
+
+
+def insert_user(db, username):
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO users (username, email) VALUES (%s, %s)", (username, f"{username}@example.com"))
+    db.commit()
+    cursor.close()
+
+
+def test_memory_backend_defaults_to_body_hash_etags():
+    assert api.CACHE_BACKEND == 'memory'
+    assert api.ETAG_VERSION_TABLES == set()
+
+
+def test_write_from_another_worker_changes_the_etag(client, db):
+    insert_user(db, 'a')
+    first = client.get('/api/users')
+    assert client.get('/api/users', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    insert_user(db, 'b')  # Not seen by this process's table versions
+    second = client.get('/api/users', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+@pytest.mark.parametrize('version_etags', [False, True])
+def test_not_modified_carries_the_validator_and_vary_of_the_200(client, db, monkeypatch, version_etags):
+    if version_etags:  # 304 answered before the read, from the table version
+        monkeypatch.setattr(api, 'ETAG_VERSION_TABLES', {'users'})
+    insert_user(db, 'a')
+    gzip = {'Accept-Encoding': 'gzip'}
+    first = client.get('/api/users', headers=gzip)
+    assert first.headers['ETag'].startswith('W/')
+
+    again = client.get('/api/users', headers={**gzip, 'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert again.headers['Vary'] == first.headers['Vary'] == 'Accept-Encoding'
+
+    identity = client.get('/api/users', headers={'Accept-Encoding': 'identity'})
+    assert not identity.headers['ETag'].startswith('W/')
@@ -0,0 +1,36 @@
+import asyncio
+
+from Waiter_app.events import OrderEvents
+
+
+def subscribe(events, last_event_id):
+    async def run():
+        queue, backlog = events.subscribe(last_event_id)
+        events.unsubscribe(queue)
+        return backlog
+    return asyncio.run(run())
+
+
+def test_resume_replays_events_after_the_last_id():
+    events = OrderEvents(10)
+    for order_id in (1, 2, 3):
+        events.publish('order_created', {'id': order_id})
+    backlog = subscribe(events, f"{events.epoch}-1")
+    assert [event[2]['id'] for event in backlog] == [2, 3]
+    assert backlog[0][0] == f"{events.epoch}-2"
+
+
+def test_ids_from_another_process_reset():
+    before, after = OrderEvents(10), OrderEvents(10)  # e.g. before and after a restart
+    before.publish('order_created', {'id': 1})
+    after.publish('order_created', {'id': 2})
+    assert subscribe(after, f"{before.epoch}-1") is None
+    assert subscribe(after, '1') is None  # Ids from before epochs existed
+
+
+def test_too_far_behind_resets():
+    events = OrderEvents(2)
+    for order_id in (1, 2, 3, 4):
+        events.publish('order_created', {'id': order_id})
+    assert subscribe(events, f"{events.epoch}-1") is None
+    assert subscribe(events, f"{events.epoch}-4") == []
@@ -0,0 +1,33 @@
+import api
+
+
+def seed_orders(db):
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO users (username, email) VALUES (%s, %s)", ('a', 'a@example.com'))
+    cursor.execute("INSERT INTO restaurants (name, city) VALUES (%s, %s)", ('R', 'Lima'))
+    cursor.executemany("INSERT INTO orders (user_id, restaurant_id, order_type, total) VALUES (%s, %s, %s, %s)",
+                       [(1, 1, 'delivery', 5), (1, 1, 'dine-in', 25), (1, 1, 'takeout', 40)])
+    db.commit()
+
+
+def test_any_schema_column_can_be_filtered(client, db):
+    seed_orders(db)
+    response = client.get('/api/orders?total=gte:25')
+    assert response.status_code == 200
+    assert [row['order_type'] for row in response.get_json()] == ['dine-in', 'takeout']
+
+
+def test_unknown_filter_column_is_rejected(client, db):
+    response = client.get('/api/orders?nope=1')
+    assert response.status_code == 400
+    assert 'Cannot filter orders by "nope"' in response.get_json()['error']
+
+
+def test_unindexed_filter_is_logged_once_per_column_set(client, db, capsys):
+    api.unindexed_filters_logged.clear()
+    for _ in range(3):
+        assert client.get('/api/orders?order_type=delivery').status_code == 200
+    client.get('/api/orders?order_type=delivery&total=1')
+    logged = [line for line in capsys.readouterr().out.splitlines() if 'uses no index' in line]
+    assert logged == ['Filter on orders uses no index: order_type',
+                      'Filter on orders uses no index: order_type, total']
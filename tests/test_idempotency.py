@@ -0,0 +1,129 @@
+import pytest
+from fastapi.testclient import TestClient
+from mysql.connector import IntegrityError
+
+from Waiter_app import auth, main, orders
+from Waiter_app.idempotency import IdempotencyStore
+
+
+class FakeDatabase:
+    """Just enough of the orders and idempotency_keys tables for create_order."""
+
+    def __init__(self):
+        self.orders = {}  # id -> total
+        self.keys = {}  # key hash -> (request hash, order id)
+        self.inserts = 0
+        self.log = []  # Statement kinds and commits, in order
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+class FakeCursor:
+    def __init__(self, db, pending):
+        self.db = db
+        self.pending = pending
+        self.row = None
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        self.db.log.append(' '.join(query.split()[:3]))
+        if query.startswith('SELECT k.request_hash'):
+            stored = self.db.keys.get(params[0])
+            if stored is None:
+                self.row = None
+            else:
+                order_id = stored[1] if stored[1] in self.db.orders else None
+                self.row = (stored[0], order_id, self.db.orders.get(order_id))
+        elif 'INSERT INTO orders' in query:
+            self.db.inserts += 1
+            self.lastrowid = self.db.inserts  # AUTO_INCREMENT
+            self.pending['order'] = (self.lastrowid, params[5])
+        elif query.startswith('INSERT INTO idempotency_keys'):
+            if params[0] in self.db.keys:
+                raise IntegrityError(msg='Duplicate entry')
+            self.pending['key'] = (params[1], params[2])
+            self.pending['key_hash'] = params[0]
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.pending = {}
+
+    def cursor(self):
+        return FakeCursor(self.db, self.pending)
+
+    def commit(self):
+        self.db.log.append('COMMIT')
+        if 'order' in self.pending:
+            order_id, total = self.pending['order']
+            self.db.orders[order_id] = total
+        if 'key' in self.pending:
+            self.db.keys[self.pending['key_hash']] = self.pending['key']
+        self.pending.clear()
+
+    def rollback(self):
+        self.pending.clear()
+
+    def close(self):
+        self.pending.clear()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    monkeypatch.setattr(orders, 'get_db', db.connect)
+    monkeypatch.setattr(orders, 'idempotency_store', IdempotencyStore(60, 100))
+    monkeypatch.setattr(orders.order_events, 'publish', lambda *args: None)
+    return db
+
+
+def post(key, user_id=1, items='soup'):
+    headers = {'Authorization': f"Bearer {auth.issue_token(user_id, 'customer')}", 'Idempotency-Key': key}
+    return TestClient(main.app).post('/', json={'order_type': 'takeout', 'items': items}, headers=headers)
+
+
+def test_retry_replays_the_first_order(db):
+    first, retry = post('abc'), post('abc')
+    assert first.status_code == retry.status_code == 201
+    assert retry.json()['order_id'] == first.json()['order_id']
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert db.inserts == 1
+
+
+def test_retry_on_another_worker_replays_from_the_table(db, monkeypatch):
+    first = post('abc')
+    monkeypatch.setattr(orders, 'idempotency_store', IdempotencyStore(60, 100))  # Nothing in memory
+    retry = post('abc')
+    assert retry.json()['order_id'] == first.json()['order_id']
+    assert db.inserts == 1  # Found before inserting, not via the duplicate key
+
+
+def test_reused_key_with_another_body_is_rejected(db):
+    post('abc')
+    assert post('abc', items='salad').status_code == 422
+
+
+def test_keys_are_scoped_per_user(db):
+    first, other = post('abc', user_id=1), post('abc', user_id=2)
+    assert other.headers.get('Idempotent-Replayed') is None
+    assert other.json()['order_id'] != first.json()['order_id']
+
+
+def test_key_of_a_deleted_order_is_a_conflict(db, monkeypatch):
+    order_id = post('abc').json()['order_id']
+    del db.orders[order_id]
+    monkeypatch.setattr(orders, 'idempotency_store', IdempotencyStore(60, 100))
+    assert post('abc').status_code == 409
+
+
+def test_expired_keys_are_purged_after_the_order_commits(db):
+    post('abc')
+    assert db.log[-4:] == ['INSERT INTO idempotency_keys', 'COMMIT', 'DELETE FROM idempotency_keys', 'COMMIT']
@@ -0,0 +1,33 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from json_codec import JSONCodec, orjson
+
+BACKENDS = ['json'] + (['orjson'] if orjson is not None else [])
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_dump_rows_matches_a_list_of_dicts(backend):
+    codec = JSONCodec(backend, 'iso')
+    columns = ('id', 'price', 'created_at', 'photo')
+    rows = [(1, Decimal('9.50'), datetime(2024, 5, 1, 12, 30), b'\x00\x01'), (2, None, None, None)]
+    assert json.loads(codec.dump_rows(columns, rows)) == [
+        {'id': 1, 'price': '9.50', 'created_at': '2024-05-01T12:30:00', 'photo': 'AAE='},
+        {'id': 2, 'price': None, 'created_at': None, 'photo': None},
+    ]
+    assert codec.dump_rows(columns, []) == b'[]'
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_decimal_format_number(backend):
+    codec = JSONCodec(backend, 'iso', decimal_format='number')
+    assert codec.dumps([Decimal('12'), Decimal('9.50')]) == b'[12,9.5]'
+
+
+def test_waiter_page_response_uses_the_shared_codec():
+    from Waiter_app.serializer import page_response
+    response = page_response(('id', 'total'), [(1, Decimal('3.25'))], 'abc')
+    assert json.loads(response.body) == {'data': [{'id': 1, 'total': 3.25}], 'next_cursor': 'abc'}
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from Waiter_app import kitchen_stats as module
+from Waiter_app.kitchen_stats import KitchenStats
+
+
+class FakeCursor:
+    def __init__(self, rows, during_query):
+        self.rows = rows
+        self.during_query = during_query
+
+    def execute(self, query, params=()):
+        self.query = query
+
+    def fetchall(self):
+        self.during_query()  # What other requests do while the SELECT runs
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows, during_query):
+        self.rows = rows
+        self.during_query = during_query
+
+    def cursor(self):
+        return FakeCursor(self.rows, self.during_query)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stats():
+    return KitchenStats()
+
+
+def use_rows(monkeypatch, rows, during_query=lambda: None):
+    monkeypatch.setattr(module, 'get_db', lambda: FakeConnection(rows, during_query))
+
+
+def test_ages_come_from_the_database(stats, monkeypatch):
+    # Ages in microseconds, as TIMESTAMPDIFF returns them
+    use_rows(monkeypatch, [(1, 'pending', 30_000_000), (2, 'pending', 600_000_000), (3, 'kitchen', 5_000_000)])
+    stats.reconcile()
+    snapshot = stats.snapshot()
+    assert snapshot['queue_depth'] == {'pending': 2, 'kitchen': 1, 'in_delivery': 0}
+    assert snapshot['oldest_pending']['order_id'] == 2
+    assert snapshot['oldest_pending']['age_seconds'] == pytest.approx(600, abs=1)
+
+
+def test_changes_during_the_reload_are_kept(stats, monkeypatch):
+    def during_query():
+        stats.order_created(10)  # Committed after the SELECT read its rows
+        stats.status_changed(1, 'pending', 'kitchen')
+        stats.status_changed(2, 'pending', 'kitchen')  # Already visible to the SELECT
+
+    use_rows(monkeypatch, [(1, 'pending', 1_000_000), (2, 'kitchen', 1_000_000)], during_query)
+    stats.reconcile()
+    depth = stats.snapshot()['queue_depth']
+    assert depth == {'pending': 1, 'kitchen': 2, 'in_delivery': 0}
+    assert stats.snapshot()['oldest_pending']['order_id'] == 10
+
+
+def test_changes_after_the_reload_are_not_replayed(stats, monkeypatch):
+    use_rows(monkeypatch, [(1, 'pending', 1_000_000)])
+    stats.reconcile()
+    stats.status_changed(1, 'pending', 'kitchen', at=time.time())
+    use_rows(monkeypatch, [])  # The order has left the active statuses
+    stats.reconcile()
+    assert stats.snapshot()['queue_depth'] == {'pending': 0, 'kitchen': 0, 'in_delivery': 0}
@@ -0,0 +1,20 @@
+from metrics import Registry
+
+
+def test_counter_metadata_names_the_total_samples():
+    registry = Registry()
+    errors = registry.counter('api_db_errors', 'Failed statements', ('table',))
+    errors.inc('users')
+    assert registry.render().splitlines() == [
+        '# HELP api_db_errors_total Failed statements',
+        '# TYPE api_db_errors_total counter',
+        'api_db_errors_total{table="users"} 1',
+    ]
+
+
+def test_histogram_samples_keep_their_base_name():
+    registry = Registry()
+    registry.histogram('api_rows', 'Rows', buckets=(1,)).observe(1)
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP api_rows Rows', '# TYPE api_rows histogram']
+    assert lines[2:] == ['api_rows_bucket{le="1"} 1', 'api_rows_bucket{le="+Inf"} 1', 'api_rows_sum 1.0', 'api_rows_count 1']
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+import api
+
+
+def seed_users(db, count):
+    cursor = db.cursor()
+    cursor.executemany("INSERT INTO users (username, email) VALUES (%s, %s)",
+                       [(f"user{i}", f"user{i}@example.com") for i in range(count)])
+    db.commit()
+
+
+def test_cursor_pages_cover_every_row_once(client, db):
+    seed_users(db, 7)
+    seen, cursor = [], None
+    while True:
+        response = client.get('/api/users?limit=3' + (f'&cursor={cursor}' if cursor else ''))
+        page = response.get_json()
+        seen.extend(row['id'] for row in page['data'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == list(range(1, 8))
+
+
+def test_cursor_is_stable_when_earlier_rows_are_deleted(client, db):
+    seed_users(db, 4)
+    first = client.get('/api/users?limit=2').get_json()
+    cursor = db.cursor()
+    cursor.execute("DELETE FROM users WHERE id = %s", (1,))
+    db.commit()
+    second = client.get(f"/api/users?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [row['id'] for row in second['data']] == [3, 4]
+
+
+def test_invalid_cursor_is_rejected(client, db):
+    assert client.get('/api/users?cursor=not-base64!').status_code == 400
+
+
+def test_stream_honors_limit(client, db):
+    seed_users(db, 5)
+    response = client.get('/api/users?stream=json&limit=2')
+    assert [row['id'] for row in json.loads(response.data)] == [1, 2]
+    response = client.get('/api/users?stream=ndjson&after=3')
+    assert [json.loads(line)['id'] for line in response.data.splitlines()] == [4, 5]
+
+
+class FailingCursor:
+    column_names = ('id',)
+
+    def __init__(self):
+        self.calls = 0
+
+    def fetchmany(self, size):
+        self.calls += 1
+        if self.calls > 1:
+            raise api.DatabaseError('connection lost')
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class DiscardedConnection:
+    discarded = False
+
+    def discard(self):
+        self.discarded = True
+
+
+def test_stream_error_aborts_instead_of_closing_the_array():
+    cnx = DiscardedConnection()
+    body = api.stream_response(api.RecordStream(cnx, FailingCursor(), 10, 'users'), 'json').response
+    assert next(body) == b'['
+    assert next(body) == b'{"id":1}'
+    with pytest.raises(api.DatabaseError):
+        next(body)
+    assert cnx.discarded
+
+
+class OrdersCursor:
+    """Waiter list_orders: returns `rows` and records the query."""
+
+    column_names = ('id', 'created_at')
+
+    def __init__(self, rows, queries):
+        self.rows = rows
+        self.queries = queries
+
+    def execute(self, query, params=()):
+        self.queries.append((query, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class OrdersConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def cursor(self):
+        return OrdersCursor(self.rows, self.queries)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def waiter_orders(monkeypatch):
+    from datetime import datetime
+    from fastapi.testclient import TestClient
+    from Waiter_app import main, orders
+    conn = OrdersConnection([(3, datetime(2024, 5, 3)), (2, datetime(2024, 5, 2)), (1, datetime(2024, 5, 1))])
+    monkeypatch.setattr(orders, 'get_db', lambda: conn)
+    return TestClient(main.app), conn
+
+
+def test_waiter_list_without_paging_args_is_the_plain_array(waiter_orders):
+    client, conn = waiter_orders
+    response = client.get('/')
+    assert [order['id'] for order in response.json()] == [3, 2, 1]
+    assert 'LIMIT' not in conn.queries[0][0]
+
+
+def test_waiter_list_with_limit_is_paginated(waiter_orders):
+    client, conn = waiter_orders
+    body = client.get('/', params={'limit': 2}).json()
+    assert [order['id'] for order in body['data']] == [3, 2]
+    assert body['next_cursor'] is not None
+    assert conn.queries[0][1][-1] == 3  # limit + 1
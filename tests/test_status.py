@@ -0,0 +1,93 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from Waiter_app import auth, main, orders, status
+
+
+class FakeCursor:
+    """Serves the locking SELECT from `rows` and records every other statement."""
+
+    def __init__(self, rows, log):
+        self.rows = rows
+        self.log = log
+
+    def execute(self, query, params=()):
+        self.log.append((query, list(params)))
+
+    def executemany(self, query, rows):
+        self.log.append((query, list(rows)))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.log = []
+        self.committed = self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self.rows, self.log)
+
+    def commit(self):
+        self.committed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection([(1, 'pending', 'dine-in'), (2, 'kitchen', 'delivery'), (3, 'completed', 'takeout')])
+    monkeypatch.setattr(status, 'get_db', lambda: conn)
+    return conn
+
+
+def test_transitions_follow_the_allowed_graph(conn):
+    results, changes = status.apply_status_updates([
+        (1, 'completed'),   # pending cannot skip the kitchen
+        (2, 'in_delivery'),
+        (3, 'pending'),     # completed is final
+        (4, 'kitchen'),
+        (1, 'pending'),
+    ])
+    assert [r['status'] for r in results] == ['invalid_transition', 'updated', 'invalid_transition',
+                                              'not_found', 'unchanged']
+    assert changes == [None, (2, 'delivery', 'kitchen', 'in_delivery'), None, None, None]
+    assert conn.committed and conn.closed
+
+
+def test_an_order_can_move_several_steps_in_one_batch(conn):
+    results, changes = status.apply_status_updates([(1, 'kitchen'), (1, 'completed')])
+    assert [r['status'] for r in results] == ['updated', 'updated']
+    assert [change[2:] for change in changes] == [('pending', 'kitchen'), ('kitchen', 'completed')]
+    updates = [entry for entry in conn.log if entry[0].startswith('UPDATE')]
+    assert updates == [("UPDATE orders SET status = %s WHERE id IN (%s)", ['completed', 1])]
+    history = [entry for entry in conn.log if entry[0].startswith('INSERT')]
+    assert history[0][1] == [(1, 'pending', 'kitchen'), (1, 'kitchen', 'completed')]
+
+
+def test_every_status_has_its_transitions():
+    assert set(status.ALLOWED_TRANSITIONS) == set(status.STATUSES)
+    for targets in status.ALLOWED_TRANSITIONS.values():
+        assert targets <= set(status.STATUSES)
+
+
+def bearer(role):
+    return {'Authorization': f"Bearer {auth.issue_token(1, role)}"}
+
+
+@pytest.mark.parametrize('method, path, body', [
+    ('PATCH', '/1', {'status': 'kitchen'}),
+    ('PATCH', '/status', {'updates': [{'order_id': 1, 'status': 'kitchen'}]}),
+])
+def test_status_routes_require_staff(conn, monkeypatch, method, path, body):
+    monkeypatch.setattr(orders, 'publish_status_changes', lambda changes: None)
+    client = TestClient(main.app)
+    assert client.request(method, path, json=body).status_code == 401
+    assert client.request(method, path, json=body, headers=bearer('customer')).status_code == 403
+    assert client.request(method, path, json=body, headers=bearer('waiter')).status_code == 200
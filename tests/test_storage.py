@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import server
+import storage
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return storage.ConnectionPool('sqlite', {'database': os.path.join(tmp_path, 'pool.db')},
+                                  size=1, wait_timeout=0.05, name='test')
+
+
+def test_close_returns_the_connection_for_reuse(pool):
+    cnx = pool.acquire()
+    raw = cnx._raw
+    assert pool.occupancy() == {('open',): 1, ('idle',): 0}
+    cnx.close()
+    assert pool.occupancy() == {('open',): 1, ('idle',): 1}
+    again = pool.acquire()
+    assert again._raw is raw
+    again.close()
+
+
+def test_acquire_times_out_when_every_connection_is_checked_out(pool):
+    cnx = pool.acquire()
+    with pytest.raises(storage.PoolTimeout):
+        pool.acquire()
+    cnx.close()
+    pool.acquire().close()
+
+
+def test_release_rolls_back_an_open_transaction(pool):
+    cnx = pool.acquire()
+    cursor = cnx.cursor()
+    cursor.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    cursor.execute("INSERT INTO t (id) VALUES (%s)", (1,))
+    assert cnx.in_transaction
+    cnx.close()
+
+    cnx = pool.acquire()
+    cursor = cnx.cursor()
+    cursor.execute("SELECT COUNT(*) FROM t")
+    assert cursor.fetchone()[0] == 0
+    cnx.close()
+
+
+def test_failed_query_does_not_leak_the_connection(pool, monkeypatch):
+    monkeypatch.setattr(server, 'get_db_connection', pool.acquire)
+    client = server.app.test_client()
+    for _ in range(3):  # More requests than connections
+        response = client.get('/get_categories')  # No categories table: the query fails
+        assert response.status_code == 500
+    assert pool.occupancy() == {('open',): 1, ('idle',): 1}
+
+
+def test_pool_timeout_is_reported_not_raised(pool, monkeypatch):
+    monkeypatch.setattr(server, 'get_db_connection', pool.acquire)
+    held = pool.acquire()
+    response = server.app.test_client().get('/get_categories')
+    assert response.status_code == 500
+    assert 'No database connection available' in response.get_json()['error']
+    held.close()